@@ -1,15 +1,49 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
+from app.rag.warmup import startup_settings, warmup_state
+from app.session.engine_registry import engine_registry
 from app.routers.connect import router as connect_router
 from app.routers.ask import router as ask_router
+from app.routers.index_all import router as index_router
+from app.routers.metrics import router as metrics_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model and client initialization happens here (or on first use), never
+    # at import, so `import app.main` stays fast and works without API keys.
+    # Async engines are disposed on this loop when their last session goes.
+    engine_registry.bind_loop(asyncio.get_running_loop())
+    await asyncio.to_thread(warmup_state.start, startup_settings()["warmup"])
+    yield
 
-app = FastAPI(title="Universal RAG over MySQL")
+
+app = FastAPI(title="Universal RAG over MySQL", lifespan=lifespan)
 
 app.include_router(connect_router)
 app.include_router(ask_router)
+app.include_router(index_router)
+app.include_router(metrics_router)
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    # k8s readinessProbe: 503 until the startup warm-up has finished.
+    status = warmup_state.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 
 STATIC_DIR = Path(__file__).resolve().parent / "static"  # ✅ app/static
 
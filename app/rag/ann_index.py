@@ -0,0 +1,118 @@
+# app/rag/ann_index.py
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+
+
+def _nearest_centroid(x: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    """
+    argmax of cosine similarity to the (unit-norm) centroids, computed in
+    row blocks so the score matrix never exceeds block x nlist floats.
+    """
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for start in range(0, x.shape[0], block):
+        out[start:start + block] = np.argmax(x[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over a session matrix (pure NumPy).
+
+    Vectors are clustered with spherical k-means into `nlist` cells; a
+    query only rescores the rows of its `nprobe` closest cells exactly, so
+    `nprobe` trades recall for latency. Rows appended after training
+    (`built_size` onwards) are scanned exhaustively until the next rebuild.
+    Row ids refer to the owning `_Partition` matrix.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray, built_size: int):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.built_size = built_size
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(
+        cls,
+        matrix: np.ndarray,
+        alive: np.ndarray,
+        nlist: int = 0,
+        iters: int = 10,
+        sample: int = 50000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = matrix.shape[0]
+        live = np.flatnonzero(alive[:n])
+        rng = np.random.default_rng(seed)
+        if nlist <= 0:
+            nlist = int(4 * np.sqrt(max(1, len(live))))
+        nlist = max(1, min(nlist, len(live)))
+
+        train_ids = live if len(live) <= sample else rng.choice(live, sample, replace=False)
+        x = _normalize(np.asarray(matrix[train_ids], dtype=np.float32))
+        centroids = x[rng.choice(x.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(iters):
+            assign = _nearest_centroid(x, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty cells with random training points.
+                sums[empty] = x[rng.choice(x.shape[0], int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assign = np.full(n, -1, dtype=np.int32)
+        block = 65536
+        for start in range(0, n, block):
+            part = _normalize(np.asarray(matrix[start:start + block], dtype=np.float32))
+            assign[start:start + block] = _nearest_centroid(part, centroids)
+        assign[~alive[:n]] = nlist  # dead rows go to a sentinel list nobody probes
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=nlist + 1)[:nlist]
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(centroids, offsets, order[: offsets[-1]], n)
+
+    def candidates(self, q_unit: np.ndarray, nprobe: int, size: int) -> np.ndarray:
+        """
+        Row ids to rescore: the members of the `nprobe` nearest cells plus
+        every row appended since the index was built.
+        """
+        nprobe = max(1, min(nprobe, self.nlist))
+        sims = self.centroids @ q_unit
+        cells = np.argpartition(-sims, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        parts = [self.rows[self.offsets[c]:self.offsets[c + 1]] for c in cells]
+        if size > self.built_size:
+            parts.append(np.arange(self.built_size, size, dtype=np.int64))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def stale(self, size: int, rebuild_ratio: float) -> bool:
+        return size - self.built_size > rebuild_ratio * max(1, self.built_size)
+
+
+def ann_settings(conf: Optional[dict]) -> dict:
+    conf = dict(conf or {})
+    return {
+        "enabled": bool(conf.get("enabled", False)),
+        "min_vectors": int(conf.get("min_vectors", 50000)),
+        "nlist": int(conf.get("nlist", 0)),
+        "nprobe": int(conf.get("nprobe", 32)),
+        "train_sample": int(conf.get("train_sample", 50000)),
+        "train_iters": int(conf.get("train_iters", 10)),
+        "rebuild_ratio": float(conf.get("rebuild_ratio", 0.2)),
+    }
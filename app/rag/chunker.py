@@ -1,5 +1,19 @@
 # app/rag/chunker.py
-from typing import List
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.rag.utils.config_loader import load_config
+
+# No tokenizer is loaded while indexing; ~4 characters per token is the usual
+# estimate for English text and is what the token budgets below assume.
+CHARS_PER_TOKEN = 4
+
+# A sentence ends at . ! ? followed by whitespace, or at a line break.
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+_WHITESPACE = re.compile(r"\s")
+
 
 def simple_chunk(text: str, max_chars: int = 1000, overlap: int = 200) -> List[str]:
     if not text:
@@ -16,3 +30,238 @@ def simple_chunk(text: str, max_chars: int = 1000, overlap: int = 200) -> List[s
             break
         start = max(0, end - overlap)
     return chunks
+
+
+def chunk_settings(conf: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    RowPacker keyword arguments from the `indexing` section of config.yaml.
+    """
+    if conf is None:
+        conf = load_config().get("indexing", {}) or {}
+    return {
+        "max_tokens": int(conf.get("chunk_max_tokens", 128)),
+        "overlap_tokens": int(conf.get("chunk_overlap_tokens", 0)),
+        "pack_rows": bool(conf.get("pack_rows", True)),
+        "dedup": bool(conf.get("dedup_chunks", True)),
+        "dedup_window": int(conf.get("dedup_window", 100_000)),
+    }
+
+
+def _break_at(text: str, start: int, limit: int) -> int:
+    """
+    End of a piece starting at `start` and no longer than `limit`: the last
+    sentence end in the second half of the window, else the last whitespace,
+    else a hard cut.
+    """
+    if limit >= len(text):
+        return len(text)
+    window = text[start:limit]
+    cut = 0
+    for m in _SENTENCE_END.finditer(window):
+        cut = m.end()
+    if cut < len(window) // 2:
+        spaces = [m.start() for m in _WHITESPACE.finditer(window)]
+        cut = spaces[-1] if spaces and spaces[-1] > 0 else cut
+    return start + (cut if cut > 0 else len(window))
+
+
+def split_text(text: str, max_chars: int, overlap_chars: int = 0) -> List[Tuple[int, int]]:
+    """
+    (start, end) spans of `text` no longer than `max_chars`, cut on sentence
+    or whitespace boundaries. With `overlap_chars`, each span starts up to
+    that far before the previous one ended, at a word boundary.
+    """
+    if len(text) <= max_chars:
+        return [(0, len(text))]
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while start < len(text):
+        end = _break_at(text, start, start + max_chars)
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        nxt = end
+        if overlap_chars:
+            space = text.rfind(" ", max(start + 1, end - overlap_chars), end)
+            if space > start:
+                nxt = space + 1
+        while nxt < len(text) and text[nxt].isspace():
+            nxt += 1
+        start = nxt
+    return spans
+
+
+@dataclass
+class Chunk:
+    """
+    One text to embed and the rows it covers.
+
+    `key` is the chunk group's `doc_id` in the vector store (None when the
+    rows have no `doc_id`). Each `rows` entry is the caller's row reference
+    plus `start`/`end`, the row's span in `text`; pieces of a row too long
+    for one chunk also carry `offset` (the piece's position in the row
+    text), `part` and `parts`.
+    """
+    key: Optional[str]
+    text: str
+    rows: List[Dict[str, Any]]
+
+
+def _text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class RowPacker:
+    """
+    Turns a stream of row texts into chunks for one table.
+
+    Short rows are packed together up to `max_tokens`; longer rows are
+    split (see `split_text`) into chunks of their own. With `dedup`, a
+    text seen among the last `dedup_window` is not packed again: it joins
+    the open chunk's rows, or goes to `aliases` as (row, chunk key).
+    """
+
+    SEPARATOR = "\n\n"
+
+    def __init__(
+        self,
+        max_tokens: int = 128,
+        overlap_tokens: int = 0,
+        pack_rows: bool = True,
+        dedup: bool = True,
+        dedup_window: int = 100_000,
+    ):
+        self.max_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+        self.overlap_chars = max(0, overlap_tokens) * CHARS_PER_TOKEN
+        self.pack_rows = pack_rows
+        self.dedup = dedup
+        self.dedup_window = max(0, dedup_window)
+        self.aliases: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        self.deduped = 0
+
+        self._parts: List[str] = []
+        self._rows: List[Dict[str, Any]] = []
+        self._chars = 0
+        self._open: Dict[bytes, Tuple[int, int]] = {}
+        # digest -> (chunk key, start, end) of texts in emitted chunks
+        self._emitted: Dict[bytes, Tuple[Optional[str], int, int]] = {}
+
+    def add(self, ref: Dict[str, Any], text: str) -> List[Chunk]:
+        """
+        Queue one row; returns the chunks completed by it (often none).
+        """
+        if not text:
+            return []
+        if len(text) > self.max_chars:
+            return self._split(ref, text)
+
+        digest = _text_digest(text) if self.dedup else None
+        if digest is not None:
+            span = self._open.get(digest)
+            if span is not None:
+                self._rows.append({**ref, "start": span[0], "end": span[1]})
+                self.deduped += 1
+                return []
+            seen = self._emitted.get(digest)
+            if seen is not None:
+                key, start, end = seen
+                self.aliases.append(({**ref, "start": start, "end": end}, key))
+                self.deduped += 1
+                return []
+
+        out: List[Chunk] = []
+        if self._parts and (
+            not self.pack_rows or self._chars + len(self.SEPARATOR) + len(text) > self.max_chars
+        ):
+            out.append(self._close())
+        start = self._chars + (len(self.SEPARATOR) if self._parts else 0)
+        end = start + len(text)
+        self._parts.append(text)
+        self._rows.append({**ref, "start": start, "end": end})
+        self._chars = end
+        if digest is not None:
+            self._open[digest] = (start, end)
+        return out
+
+    def flush(self) -> List[Chunk]:
+        """
+        Emit the open chunk, if any.
+        """
+        return [self._close()] if self._parts else []
+
+    def _close(self) -> Chunk:
+        chunk = Chunk(key=self._group_key(self._rows), text=self.SEPARATOR.join(self._parts), rows=self._rows)
+        if self.dedup_window:
+            for digest, (start, end) in self._open.items():
+                self._emitted[digest] = (chunk.key, start, end)
+            while len(self._emitted) > self.dedup_window:
+                del self._emitted[next(iter(self._emitted))]
+        self._parts, self._rows, self._chars, self._open = [], [], 0, {}
+        return chunk
+
+    def _split(self, ref: Dict[str, Any], text: str) -> List[Chunk]:
+        spans = split_text(text, self.max_chars, self.overlap_chars)
+        key = ref.get("doc_id")
+        return [
+            Chunk(
+                key=key,
+                text=text[start:end],
+                rows=[{**ref, "start": 0, "end": end - start, "offset": start, "part": i, "parts": len(spans)}],
+            )
+            for i, (start, end) in enumerate(spans)
+        ]
+
+    @staticmethod
+    def _group_key(rows: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        A single row keeps its own doc_id; a packed chunk is named after its
+        first row and its size. Rows belong to one live chunk at a time, so
+        the name is unique among live chunks.
+        """
+        first = rows[0].get("doc_id")
+        if first is None or len(rows) == 1:
+            return first
+        return f"{first}+{len(rows) - 1}"
+
+
+_SPAN_KEYS = ("start", "end", "offset", "part", "parts")
+
+
+def _row_ref(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in row.items() if k not in _SPAN_KEYS}
+
+
+def rows_from_chunks(records: List[Dict[str, Any]]) -> Dict[str, Tuple[Dict[str, Any], str]]:
+    """
+    Rebuild row texts from stored chunks ({"text", "metadata"} records, e.g.
+    from `vector_store.pop`): {doc_id: (row reference, full row text)}.
+    Pieces of a split row are stitched back together by `offset`.
+    """
+    pieces: Dict[str, Tuple[Dict[str, Any], Dict[int, str]]] = {}
+    for rec in records:
+        text = rec["text"]
+        for row in rec["metadata"].get("rows") or []:
+            doc_id = row.get("doc_id")
+            if doc_id is None:
+                continue
+            entry = pieces.setdefault(doc_id, (_row_ref(row), {}))
+            entry[1][int(row.get("offset", 0))] = text[row["start"]:row["end"]]
+
+    out: Dict[str, Tuple[Dict[str, Any], str]] = {}
+    for doc_id, (ref, parts) in pieces.items():
+        body = ""
+        for offset in sorted(parts):
+            body = body[:offset] + parts[offset]
+        out[doc_id] = (ref, body)
+    return out
+
+
+def hit_rows(hit: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The rows a search hit covers, each with its own slice of the hit text.
+    """
+    text = hit.get("text", "")
+    return [
+        {**_row_ref(row), "text": text[row["start"]:row["end"]]}
+        for row in (hit.get("metadata") or {}).get("rows") or []
+    ]
@@ -1,8 +1,16 @@
 # app/rag/embedder.py
 
-from typing import List
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
 
-from app.rag.utils.model_loader import ModelLoader
+import numpy as np
+
+from app.rag.embedding_cache import cache_key, get_embedding_cache
+from app.rag.metrics import timed
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.model_loader import ModelLoader, embedding_model_id
+from app.rag.utils.singleton import lazy_singleton
 
 
 class Embedder:
@@ -11,25 +19,144 @@ class Embedder:
 
     It uses ModelLoader to load the embeddings object that you already
     tested via `python -m RAG_Sql.utils.model_loader` (or your new one in app.rag.utils).
+
+    Vectors are looked up in the shared embedding cache first, so text that
+    was embedded before (by the indexer or the retriever) is never sent to
+    the provider again.
+
+    The provider model is loaded on first use (or by `warm_up`), so building
+    an Embedder is cheap and does not need the API key yet.
     """
 
     def __init__(self) -> None:
-        loader = ModelLoader()
-        self._embeddings = loader.load_embeddings()
+        self.model_name = embedding_model_id(load_config())
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = get_embedding_cache()
+        self.remote_calls = 0
+        self._count_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _embeddings(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = ModelLoader().load_embeddings()
+        return self._model
+
+    def warm_up(self) -> None:
+        self._embeddings
+
+    def _count_remote_call(self) -> None:
+        with self._count_lock:
+            self.remote_calls += 1
+        self._local.calls = getattr(self._local, "calls", 0) + 1
+
+    def thread_remote_calls(self) -> int:
+        """
+        Remote calls made from the calling thread, so parallel indexing
+        workers sharing one Embedder can attribute their own requests.
+        """
+        return getattr(self._local, "calls", 0)
 
+    def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        self._count_remote_call()
+        if hasattr(self._embeddings, "embed_documents"):
+            return self._embeddings.embed_documents(texts)
+        return [self._embeddings.embed_query(t) for t in texts]
+
+    @timed("embed_query")
     def embed_query(self, text: str) -> List[float]:
         """
         Embed a single string into a vector.
         """
-        return self._embeddings.embed_query(text)
+        if self._cache is None:
+            self._count_remote_call()
+            return self._embeddings.embed_query(text)
+
+        key = cache_key(self.model_name, text)
+        cached = self._cache.get_many([key])[0]
+        if cached is not None:
+            return cached.tolist()
+
+        self._count_remote_call()
+        vec = self._embeddings.embed_query(text)
+        self._cache.put_many({key: np.asarray(vec, dtype=np.float32)})
+        return vec
+
+    @timed("embed_query")
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Async `embed_query`: awaits the provider's native async call when it
+        has one (langchain `aembed_query`) instead of blocking a thread.
+        """
+        key = cache_key(self.model_name, text)
+        if self._cache is not None:
+            cached = self._cache.get_many([key])[0]
+            if cached is not None:
+                return cached.tolist()
 
+        self._count_remote_call()
+        if hasattr(self._embeddings, "aembed_query"):
+            vec = await self._embeddings.aembed_query(text)
+        else:
+            vec = await asyncio.to_thread(self._embeddings.embed_query, text)
+        if self._cache is not None:
+            self._cache.put_many({key: np.asarray(vec, dtype=np.float32)})
+        return vec
+
+    @timed("embed_documents")
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed multiple strings into vectors.
+
+        Only cache misses are sent to the provider, de-duplicated, in one call.
         """
-        if hasattr(self._embeddings, "embed_documents"):
-            return self._embeddings.embed_documents(texts)
-        return [self.embed_query(t) for t in texts]
+        if self._cache is None:
+            return self._embed_remote(texts)
+
+        keys = [cache_key(self.model_name, t) for t in texts]
+        cached = self._cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text, vec in zip(keys, texts, cached):
+            if vec is None:
+                missing.setdefault(key, text)
+
+        fresh: Dict[str, np.ndarray] = {}
+        if missing:
+            vecs = self._embed_remote(list(missing.values()))
+            fresh = {
+                key: np.asarray(vec, dtype=np.float32)
+                for key, vec in zip(missing.keys(), vecs)
+            }
+            self._cache.put_many(fresh)
+
+        return [
+            (vec if vec is not None else fresh[key]).tolist()
+            for key, vec in zip(keys, cached)
+        ]
+
+    def cache_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = self._cache.stats() if self._cache is not None else {"enabled": False}
+        stats["remote_calls"] = self.remote_calls
+        return stats
+
+    def batching_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Dynamic query batching counters of the local backend, if loaded.
+        """
+        batcher = getattr(self._model, "batcher", None)
+        return batcher.stats() if batcher is not None else None
+
+
+@lazy_singleton
+def get_embedder() -> Embedder:
+    """
+    Process-wide Embedder for the request path (orchestrator, schema index).
+    """
+    return Embedder()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+# app/rag/embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+
+
+def cache_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class _SqliteTier:
+    """
+    On-disk tier: one row per key, vector stored as a raw float32 blob.
+    Survives restarts and can be shared by several processes on one node.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(k, v.astype(np.float32).tobytes()) for k, v in items.items()],
+            )
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache (model name + sha256 of the text).
+
+    Lookups go through an in-process LRU first, then the optional SQLite
+    tier; disk hits are promoted into the LRU.
+    """
+
+    def __init__(self, max_items: int = 50000, disk_path: Optional[str] = None):
+        self.max_items = max_items
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SqliteTier(disk_path) if disk_path else None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+        pending: List[int] = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._lru.get(key)
+                if vec is None:
+                    pending.append(i)
+                else:
+                    self._lru.move_to_end(key)
+                    out[i] = vec
+                    self.memory_hits += 1
+
+        if pending and self._disk is not None:
+            found = self._disk.get_many([keys[i] for i in pending])
+            with self._lock:
+                still: List[int] = []
+                for i in pending:
+                    vec = found.get(keys[i])
+                    if vec is None:
+                        still.append(i)
+                    else:
+                        out[i] = vec
+                        self._remember(keys[i], vec)
+                        self.disk_hits += 1
+                pending = still
+
+        with self._lock:
+            self.misses += len(pending)
+        return out
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._remember(key, vec)
+        if self._disk is not None:
+            self._disk.put_many(items)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._lru),
+            "disk_enabled": self._disk is not None,
+        }
+
+
+@lazy_singleton
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache shared by every Embedder (indexer and retriever).
+    Returns None when `embedding_cache.enabled` is false.
+    """
+    conf = load_config().get("embedding_cache", {}) or {}
+    if not conf.get("enabled", True):
+        return None
+    return EmbeddingCache(
+        max_items=int(conf.get("memory_items", 50000)),
+        disk_path=conf.get("disk_path") or None,
+    )
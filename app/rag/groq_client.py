@@ -2,25 +2,82 @@
 from __future__ import annotations
 
 import os
+import threading
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
-from groq import Groq
+
+from app.rag.metrics import record_llm_usage
+
+if TYPE_CHECKING:  # the groq SDK takes ~0.3s to import; loaded on first use
+    from groq import AsyncGroq, Groq
 
 load_dotenv()
 
 class GroqLLM:
+    """
+    Groq chat client. The SDK clients are created on first use (thread-safe),
+    so constructing a GroqLLM is free and a missing GROQ_API_KEY surfaces on
+    the first request instead of crashing the import.
+    """
+
     def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._client: Optional[Groq] = None
+        self._async_client: Optional[AsyncGroq] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _api_key() -> str:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise RuntimeError("GROQ_API_KEY is not set")
-        self.model_name = model_name
-        self.client = Groq(api_key=api_key)
+        return api_key
+
+    @property
+    def client(self) -> Groq:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from groq import Groq
+
+                    self._client = Groq(api_key=self._api_key())
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    from groq import AsyncGroq
 
-    def generate(self, prompt: str) -> str:
+                    self._async_client = AsyncGroq(api_key=self._api_key())
+        return self._async_client
+
+    def warm_up(self) -> None:
+        self.client
+        self.async_client
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
         resp = self.client.chat.completions.create(
             model=self.model_name,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
+            timeout=timeout,
         )
+        record_llm_usage(self.model_name, getattr(resp, "usage", None))
 
         # ✅ IMPORTANT: use attribute access
         return resp.choices[0].message.content.strip()
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Same as `generate`, but awaits the request instead of holding a thread.
+        """
+        resp = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            timeout=timeout,
+        )
+        record_llm_usage(self.model_name, getattr(resp, "usage", None))
+        return resp.choices[0].message.content.strip()
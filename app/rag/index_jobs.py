@@ -0,0 +1,162 @@
+# app/rag/index_jobs.py
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from app.rag.indexer import IndexProgress, index_all_text, indexable_tables
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+from app.schema.schema_loader import estimate_table_rows
+from app.session.session_registry import DBSession
+
+
+@dataclass
+class IndexJob:
+    job_id: str
+    session_id: str
+    max_rows: Optional[int]
+    # queued | running | completed | completed_with_errors | failed | cancelled
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    rows_estimate: Optional[int] = None
+    stats: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    failed_tables: int = 0
+    progress: IndexProgress = field(default_factory=IndexProgress)
+
+    @property
+    def done(self) -> bool:
+        return self.status in {"completed", "completed_with_errors", "failed", "cancelled"}
+
+    def to_dict(self) -> Dict[str, Any]:
+        snap = self.progress.snapshot()
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rows_per_second = snap["rows_read"] / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if self.status == "running" and self.rows_estimate and rows_per_second > 0:
+            eta = max(0.0, (self.rows_estimate - snap["rows_read"]) / rows_per_second)
+
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "status": self.status,
+            **snap,
+            "rows_estimate": self.rows_estimate,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_per_second, 1),
+            "chunks_per_second": round(snap["chunks_embedded"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "stats": self.stats,
+            "error": self.error,
+            "failed_tables": self.failed_tables,
+        }
+
+
+class IndexJobRegistry:
+    """
+    Runs `index_all_text` on a small background pool so the HTTP request
+    returns immediately. At most one active job per session: submitting
+    again while one is queued/running returns the existing job.
+    """
+
+    _MAX_FINISHED = 100
+
+    def __init__(self, max_workers: int = 1):
+        self._jobs: Dict[str, IndexJob] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-job")
+
+    def submit(self, session_id: str, session: DBSession, max_rows: Optional[int]) -> IndexJob:
+        with self._lock:
+            for job in self._jobs.values():
+                if job.session_id == session_id and not job.done:
+                    return job
+            job = IndexJob(job_id=uuid4().hex, session_id=session_id, max_rows=max_rows)
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._pool.submit(self._run, job, session)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        return self._jobs.get(job_id)
+
+    def active_sessions(self) -> set:
+        with self._lock:
+            return {j.session_id for j in self._jobs.values() if not j.done}
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.progress.cancelled.set()
+        with self._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.done]
+        finished.sort(key=lambda j: j.finished_at or 0.0)
+        for job in finished[: max(0, len(finished) - self._MAX_FINISHED)]:
+            del self._jobs[job.job_id]
+
+    def _run(self, job: IndexJob, session: DBSession) -> None:
+        with self._lock:
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+
+        try:
+            job.rows_estimate = self._estimate_rows(session, job.max_rows)
+        except Exception:
+            job.rows_estimate = None  # ETA is best-effort
+
+        try:
+            job.stats = index_all_text(
+                session_id=job.session_id,
+                engine=session.engine,
+                schema=session.schema,
+                max_rows=job.max_rows,
+                progress=job.progress,
+            )
+            # A failing table is reported in its stats entry, not raised.
+            failed = {t: s for t, s in job.stats.items() if s.get("status") == "failed"}
+            job.failed_tables = len(failed)
+            if job.progress.cancelled.is_set():
+                job.status = "cancelled"
+            elif failed and len(failed) == len(job.stats):
+                job.status = "failed"
+                job.error = f"all {len(failed)} tables failed; first: {next(iter(failed.values())).get('error')}"
+            else:
+                job.status = "completed_with_errors" if failed else "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = time.time()
+
+    @staticmethod
+    def _estimate_rows(session: DBSession, max_rows: Optional[int]) -> int:
+        estimates = session.row_estimates or estimate_table_rows(session.engine, session.database)
+        total = 0
+        for table, _, _ in indexable_tables(session.schema):
+            n = estimates.get(table, 0)
+            total += min(n, max_rows) if max_rows is not None else n
+        return total
+
+
+@lazy_singleton
+def get_index_jobs() -> IndexJobRegistry:
+    conf = load_config().get("indexing", {}) or {}
+    return IndexJobRegistry(max_workers=int(conf.get("job_workers", 1)))
@@ -0,0 +1,45 @@
+# app/rag/index_state.py
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class TableIndexState:
+    """
+    What the last indexing pass saw for one table: the `updated_at`
+    watermark (if the table has such a column) and a content hash per
+    row, keyed by the row's `doc_id`.
+
+    Rows are packed several to a chunk (see `chunker.RowPacker`):
+    `row_groups` maps a row to the `doc_id` of the chunk group holding its
+    text when that differs from its own, and `group_aliases` lists rows
+    that were deduplicated into a group without appearing in its metadata.
+
+    Kept in process memory only: after a restart the first pass of each
+    table is a full scan.
+    """
+    watermark: Optional[Any] = None
+    watermark_column: Optional[str] = None
+    row_hashes: Dict[str, str] = field(default_factory=dict)
+    row_groups: Dict[str, str] = field(default_factory=dict)
+    group_aliases: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+
+class IndexStateRegistry:
+    def __init__(self):
+        self._state: Dict[str, Dict[str, TableIndexState]] = {}
+        self._lock = threading.Lock()
+
+    def table(self, session_id: str, table: str) -> TableIndexState:
+        with self._lock:
+            return self._state.setdefault(session_id, {}).setdefault(table, TableIndexState())
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            self._state.pop(session_id, None)
+
+
+index_state = IndexStateRegistry()
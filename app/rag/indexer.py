@@ -1,61 +1,557 @@
-from sqlalchemy import text
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from dataclasses import dataclass
 from sqlalchemy.engine import Engine
-from typing import Dict, Any
+from typing import Dict, Any, ContextManager, Iterable, Iterator, List, Optional, Set, Tuple
 
 from app.rag.embedder import Embedder
-from app.rag.chunker import simple_chunk
+from app.rag.chunker import Chunk, RowPacker, chunk_settings, rows_from_chunks
 from app.rag.vector_store import vector_store
+from app.rag.row_reader import iter_rows, quote_ident
+from app.rag.index_state import index_state
+from app.rag.metrics import timed
+from app.schema.schema_loader import get_primary_key
+from app.rag.utils.config_loader import load_config
 
 
+def _is_rate_limited(exc: Exception) -> bool:
+    """
+    Best-effort detection of provider throttling (HTTP 429 / quota errors).
+    """
+    name = type(exc).__name__.lower()
+    msg = str(exc).lower()
+    return (
+        "ratelimit" in name
+        or "resourceexhausted" in name
+        or "429" in msg
+        or "rate limit" in msg
+        or "quota" in msg
+    )
+
+
+class IndexingCancelled(Exception):
+    """Raised inside a table worker once its run has been cancelled."""
+
+
+class IndexProgress:
+    """
+    Thread-safe counters shared by all table workers of one run, read by
+    the background job API while indexing is in flight. Setting `cancelled`
+    makes the workers stop at the next row or batch.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.tables_total = 0
+        self.tables_done = 0
+        self.rows_read = 0
+        self.chunks_embedded = 0
+
+    def add(self, rows: int = 0, chunks: int = 0, tables: int = 0) -> None:
+        with self._lock:
+            self.rows_read += rows
+            self.chunks_embedded += chunks
+            self.tables_done += tables
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise IndexingCancelled("indexing cancelled")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tables_total": self.tables_total,
+                "tables_done": self.tables_done,
+                "rows_read": self.rows_read,
+                "chunks_embedded": self.chunks_embedded,
+            }
+
+
+class _EmbeddingBatcher:
+    """
+    Collects chunks until a count or character budget is reached, then
+    embeds them with a single `embed_documents` call and pushes the
+    vectors into `vector_store` in bulk.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        session_id: str,
+        settings: Dict[str, Any],
+        embed_gate: Optional[ContextManager[Any]] = None,
+        progress: Optional[IndexProgress] = None,
+    ):
+        self.embedder = embedder
+        self.session_id = session_id
+        self.max_items = int(settings.get("embed_batch_size", 64))
+        self.max_chars = int(settings.get("embed_batch_max_chars", 60000))
+        self.max_retries = int(settings.get("embed_max_retries", 5))
+        self.backoff = float(settings.get("embed_backoff_seconds", 1.0))
+        self.backoff_max = float(settings.get("embed_backoff_max_seconds", 30.0))
+        self.embed_gate = embed_gate if embed_gate is not None else nullcontext()
+        self.embed_seconds = 0.0
+        self.progress = progress
+
+        # Must be created on the thread that uses it (see Embedder.thread_remote_calls).
+        self._calls_at_start = embedder.thread_remote_calls()
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._chars = 0
+
+    @property
+    def requests(self) -> int:
+        """Remote embedding calls made by this batcher (cache hits are free)."""
+        return self.embedder.thread_remote_calls() - self._calls_at_start
+
+    def add(self, chunk: str, metadata: Dict[str, Any]) -> None:
+        if self._texts and (
+            len(self._texts) >= self.max_items or self._chars + len(chunk) > self.max_chars
+        ):
+            self.flush()
+        self._texts.append(chunk)
+        self._metadatas.append(metadata)
+        self._chars += len(chunk)
+
+    def flush(self) -> None:
+        if not self._texts:
+            return
+        if self.progress is not None:
+            self.progress.check()
+        embeddings = self._embed_with_retry(self._texts)
+        vector_store.add_many(
+            session_id=self.session_id,
+            embeddings=embeddings,
+            texts=self._texts,
+            metadatas=self._metadatas,
+        )
+        if self.progress is not None:
+            self.progress.add(chunks=len(self._texts))
+        self._texts, self._metadatas, self._chars = [], [], 0
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                started = time.perf_counter()
+                try:
+                    with self.embed_gate:
+                        return self.embedder.embed_documents(texts)
+                finally:
+                    self.embed_seconds += time.perf_counter() - started
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_rate_limited(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+                time.sleep(delay + random.uniform(0, delay / 2))
+                attempt += 1
+
+
+@dataclass
+class _IndexRun:
+    """
+    Everything one `index_all_text` call shares across its table workers.
+    `read_gate` / `embed_gate` cap concurrent MySQL reads and embedding
+    requests independently of the number of table workers.
+    """
+    session_id: str
+    engine: Engine
+    embedder: Embedder
+    settings: Dict[str, Any]
+    max_rows: Optional[int]
+    read_gate: threading.Semaphore
+    embed_gate: threading.Semaphore
+    progress: IndexProgress
+
+    @property
+    def page_size(self) -> int:
+        return int(self.settings.get("read_page_size", 1000))
+
+    def read(self, table: str, columns: List[str], key_cols: List[str], timings: Dict[str, float], **kw):
+        rows = iter_rows(
+            self.engine, table, columns, key_cols,
+            page_size=self.page_size, read_gate=self.read_gate, **kw,
+        )
+        return _timed(rows, timings, self.progress)
+
+
+def _timed(
+    rows: Iterable[Dict[str, Any]],
+    timings: Dict[str, float],
+    progress: IndexProgress,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Accumulate time spent waiting on the row source into
+    timings["read_seconds"], count rows into `progress` and stop on cancel.
+    """
+    it = iter(rows)
+    while True:
+        started = time.perf_counter()
+        try:
+            row = next(it)
+        except StopIteration:
+            return
+        finally:
+            timings["read_seconds"] += time.perf_counter() - started
+        progress.check()
+        progress.add(rows=1)
+        yield row
+
+
+def _row_text(row_dict: Dict[str, Any], text_cols: List[str]) -> str:
+    return "\n".join(
+        f"{col}: {row_dict[col]}"
+        for col in text_cols
+        if row_dict.get(col)
+    )
+
+
+def _content_hash(body: str) -> str:
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _doc_id(table: str, pk: Dict[str, Any]) -> str:
+    return f"{table}:" + json.dumps(list(pk.values()), default=str, separators=(",", ":"))
+
+
+def _pick_updated_at(cols: List[Dict[str, Any]], candidates: List[str]) -> Optional[str]:
+    by_name = {c["name"].lower(): c for c in cols}
+    for name in candidates:
+        col = by_name.get(name.lower())
+        if col and col["type"].lower() in {"datetime", "timestamp", "date"}:
+            return col["name"]
+    return None
+
+
+def _index_table_full(
+    run: _IndexRun,
+    table: str,
+    text_cols: List[str],
+    batcher: _EmbeddingBatcher,
+    timings: Dict[str, float],
+) -> Dict[str, Any]:
+    """
+    Tables without a primary key have no stable row identity, so their
+    vectors are dropped and rebuilt on every pass.
+    """
+    deleted = vector_store.delete_table(run.session_id, table)
+    index_state.table(run.session_id, table).row_hashes.clear()
+
+    packer = RowPacker(**chunk_settings(run.settings))
+    rows = chunks = 0
+    for row_idx, row_dict in enumerate(
+        run.read(table, text_cols, [], timings, max_rows=run.max_rows)
+    ):
+        rows += 1
+        body = _row_text(row_dict, text_cols)
+        ref = {"row": row_idx, "content_hash": _content_hash(body)}
+        chunks += _queue_chunks(batcher, table, text_cols, packer.add(ref, body))
+        # Rows without a doc_id cannot be re-packed later, so duplicates are
+        # only counted here.
+        packer.aliases.clear()
+    chunks += _queue_chunks(batcher, table, text_cols, packer.flush())
+    batcher.flush()
+
+    return {
+        "mode": "full", "rows": rows, "changed": rows, "unchanged": 0,
+        "deleted": deleted, "chunks": chunks, "deduped": packer.deduped,
+    }
+
+
+def _queue_chunks(batcher: _EmbeddingBatcher, table: str, text_cols: List[str], chunks: List[Chunk]) -> int:
+    for chunk in chunks:
+        meta: Dict[str, Any] = {"table": table, "columns": text_cols, "rows": chunk.rows}
+        if chunk.key is not None:
+            meta["doc_id"] = chunk.key
+        batcher.add(chunk.text, meta)
+    return len(chunks)
+
+
+class _PackedRows:
+    """
+    Packs the changed rows of one keyed table and keeps the table's
+    `row_groups` / `group_aliases` in step with the chunks it emits.
+
+    Replacing a row removes its whole chunk; the other rows in it are
+    recovered from the chunk text (`chunker.rows_from_chunks`) and packed
+    again in `finish`, unless the pass reads them afresh first.
+    """
+
+    def __init__(self, run: _IndexRun, table: str, text_cols: List[str], batcher: _EmbeddingBatcher):
+        self.session_id = run.session_id
+        self.table = table
+        self.text_cols = text_cols
+        self.batcher = batcher
+        self.state = index_state.table(run.session_id, table)
+        self.packer = RowPacker(**chunk_settings(run.settings))
+        self.recovered: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        self.pending_hashes: Dict[str, str] = {}
+        self.chunks = 0
+        self.evicted = 0
+
+    def evict(self, doc_ids: Iterable[str]) -> int:
+        """
+        Remove the chunks holding `doc_ids` and keep the text of every other
+        row they covered for re-packing. Returns the number of chunks removed.
+        """
+        doc_ids = set(doc_ids)
+        state = self.state
+        groups = {state.row_groups.pop(d, d) for d in doc_ids}
+        records = vector_store.pop(self.session_id, groups)
+        removed = len(records)
+        texts = {rec["metadata"].get("doc_id"): rec["text"] for rec in records}
+        for group in groups:
+            for alias in state.group_aliases.pop(group, []):
+                if group in texts:
+                    records.append({"text": texts[group], "metadata": {"rows": [alias]}})
+
+        for doc_id, (ref, body) in rows_from_chunks(records).items():
+            state.row_groups.pop(doc_id, None)
+            if doc_id in doc_ids or doc_id in self.pending_hashes:
+                continue
+            # Until it is stored again the row must not look indexed: a pass
+            # that fails before then re-embeds it next time.
+            state.row_hashes.pop(doc_id, None)
+            self.recovered[doc_id] = (ref, body)
+        self.evicted += removed
+        return removed
+
+    def replace(self, ref: Dict[str, Any], body: str) -> None:
+        self.recovered.pop(ref["doc_id"], None)
+        self.evict([ref["doc_id"]])
+        self._add(ref, body)
+
+    def finish(self, seen: Optional[Set[str]]) -> None:
+        """
+        Pack the recovered rows that still exist and flush the open chunk.
+        """
+        for doc_id, (ref, body) in self.recovered.items():
+            if seen is None or doc_id in seen:
+                self._add(ref, body)
+        self.recovered.clear()
+        self._emit(self.packer.flush())
+
+    def _add(self, ref: Dict[str, Any], body: str) -> None:
+        self.pending_hashes[ref["doc_id"]] = ref["content_hash"]
+        self._emit(self.packer.add(ref, body))
+        for alias, group in self.packer.aliases:
+            self.state.row_groups[alias["doc_id"]] = group
+            self.state.group_aliases.setdefault(group, []).append(alias)
+        self.packer.aliases.clear()
+
+    def _emit(self, chunks: List[Chunk]) -> None:
+        for chunk in chunks:
+            for row in chunk.rows:
+                if row["doc_id"] == chunk.key:
+                    self.state.row_groups.pop(row["doc_id"], None)
+                else:
+                    self.state.row_groups[row["doc_id"]] = chunk.key
+        self.chunks += _queue_chunks(self.batcher, self.table, self.text_cols, chunks)
+
+
+def _index_table_incremental(
+    run: _IndexRun,
+    table: str,
+    cols: List[Dict[str, Any]],
+    text_cols: List[str],
+    key_cols: List[str],
+    batcher: _EmbeddingBatcher,
+    timings: Dict[str, float],
+) -> Dict[str, Any]:
+    """
+    Re-embed only rows whose content hash changed since the last pass.
+
+    If the table has an `updated_at`-style column and a watermark from the
+    previous pass, only rows at or after the watermark are read; otherwise
+    the whole table is scanned and compared hash by hash. Rows that
+    disappeared are removed from the vector store.
+    """
+    session_id, settings = run.session_id, run.settings
+    state = index_state.table(session_id, table)
+    ts_col = _pick_updated_at(
+        cols, settings.get("updated_at_columns") or ["updated_at", "modified_at", "last_modified"]
+    )
+
+    deleted = 0
+    if not state.row_hashes and not state.row_groups:
+        # No record of what is stored (first pass, or a persistent store
+        # after a restart): chunks cannot be matched to rows, start over.
+        deleted = vector_store.delete_table(session_id, table)
+
+    where, where_params = None, None
+    if ts_col and state.watermark is not None and state.watermark_column == ts_col:
+        where, where_params = f"{quote_ident(ts_col)} >= :watermark", {"watermark": state.watermark}
+    mode = "incremental" if where else "scan"
+
+    columns = text_cols + ([ts_col] if ts_col and ts_col not in text_cols else [])
+    seen: Optional[Set[str]] = set() if where is None else None
+    packed = _PackedRows(run, table, text_cols, batcher)
+    watermark = state.watermark
+    rows = unchanged = 0
+
+    try:
+        for row_dict in run.read(
+            table, columns, key_cols, timings,
+            max_rows=run.max_rows, where=where, where_params=where_params,
+        ):
+            rows += 1
+            pk = {c: row_dict[c] for c in key_cols}
+            doc_id = _doc_id(table, pk)
+            if seen is not None:
+                seen.add(doc_id)
+            if ts_col and row_dict.get(ts_col) is not None:
+                if watermark is None or row_dict[ts_col] > watermark:
+                    watermark = row_dict[ts_col]
+
+            body = _row_text(row_dict, text_cols)
+            digest = _content_hash(body)
+            if state.row_hashes.get(doc_id) == digest:
+                unchanged += 1
+                continue
+            held = packed.recovered.get(doc_id)
+            if held is not None and held[0]["content_hash"] == digest:
+                unchanged += 1  # only re-packed, its chunk-mate changed
+
+            # Upsert: drop whatever chunk held this row before (also cleans
+            # up after a pass that failed half-way), then queue the new text.
+            packed.replace({"doc_id": doc_id, "pk": pk, "content_hash": digest}, body)
+
+        if run.max_rows is None:
+            if seen is None and settings.get("detect_deletes", True):
+                # Watermark reads don't see deleted rows; a key-only scan does.
+                seen = {
+                    _doc_id(table, {c: r[c] for c in key_cols})
+                    for r in iter_rows(
+                        run.engine, table, [], key_cols,
+                        page_size=run.page_size, read_gate=run.read_gate,
+                    )
+                }
+            if seen is not None:
+                gone = [d for d in state.row_hashes if d not in seen]
+                deleted += packed.evict(gone)
+                for d in gone:
+                    del state.row_hashes[d]
+        else:
+            seen = None
+
+        packed.finish(seen)
+        batcher.flush()
+    except BaseException:
+        if packed.evicted and where is not None:
+            # Recovered rows may not have been stored again; only a full
+            # scan reads them back.
+            state.watermark = None
+        raise
+    state.row_hashes.update(packed.pending_hashes)
+    if run.max_rows is None or rows < run.max_rows:
+        # Rows come in key order, not timestamp order: a pass cut short by
+        # max_rows may have skipped older rows, so it keeps the old watermark.
+        state.watermark, state.watermark_column = watermark, ts_col
+
+    return {
+        "mode": mode,
+        "rows": rows,
+        "changed": rows - unchanged,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "chunks": packed.chunks,
+        "repacked": len(packed.pending_hashes) - (rows - unchanged),
+        "deduped": packed.packer.deduped,
+    }
+
+
+@timed("index_table")
+def _index_one_table(run: _IndexRun, table: str, cols: List[Dict[str, Any]], text_cols: List[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    timings = {"read_seconds": 0.0}
+    key_cols = get_primary_key(cols)
+    batcher = _EmbeddingBatcher(
+        run.embedder, run.session_id, run.settings, run.embed_gate, run.progress
+    )
+
+    try:
+        if key_cols:
+            table_stats = _index_table_incremental(run, table, cols, text_cols, key_cols, batcher, timings)
+        else:
+            table_stats = _index_table_full(run, table, text_cols, batcher, timings)
+        table_stats["status"] = "ok"
+    except IndexingCancelled:
+        table_stats = {"status": "cancelled"}
+    except Exception as e:
+        table_stats = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    run.progress.add(tables=1)
+
+    elapsed = time.perf_counter() - started
+    table_stats.update(
+        columns=text_cols,
+        embed_requests=batcher.requests,
+        seconds=round(elapsed, 3),
+        read_seconds=round(timings["read_seconds"], 3),
+        embed_seconds=round(batcher.embed_seconds, 3),
+        rows_per_second=round(table_stats.get("rows", 0) / elapsed, 1) if elapsed > 0 else 0.0,
+    )
+    return table_stats
+
+
+def indexable_tables(schema: Dict[str, Any]) -> List[Tuple[str, List[Dict[str, Any]], List[str]]]:
+    """
+    (table, columns, text column names) for every table with text to index.
+    """
+    text_types = {"varchar", "text", "mediumtext", "longtext"}
+    work = []
+    for table, cols in schema.items():
+        text_cols = [c["name"] for c in cols if c["type"].lower() in text_types]
+        if text_cols:
+            work.append((table, cols, text_cols))
+    return work
+
+
+@timed("index_all")
 def index_all_text(
     session_id: str,
     engine: Engine,
     schema: Dict[str, Any],
-    max_rows: int = 500,
+    max_rows: Optional[int] = None,
+    progress: Optional[IndexProgress] = None,
 ):
-    embedder = Embedder()
-    stats = {}
+    """
+    Stream every table's text columns through chunking and batched embedding.
 
-    text_types = {"varchar", "text", "mediumtext", "longtext"}
+    Rows are read page by page; `max_rows` is an optional per-table cap.
+    Re-runs only re-embed changed rows (see `_index_table_incremental`).
+    Tables run on `indexing.table_workers` threads; a failing table is
+    reported in its stats entry. `progress` reports and cancels the run.
+    """
+    settings = load_config().get("indexing", {}) or {}
+    run = _IndexRun(
+        session_id=session_id,
+        engine=engine,
+        embedder=Embedder(),
+        settings=settings,
+        max_rows=max_rows,
+        read_gate=threading.Semaphore(int(settings.get("db_concurrency", 2))),
+        embed_gate=threading.Semaphore(int(settings.get("embed_concurrency", 4))),
+        progress=progress if progress is not None else IndexProgress(),
+    )
 
-    for table, cols in schema.items():
-        text_cols = [c["name"] for c in cols if c["type"].lower() in text_types]
-        if not text_cols:
-            continue
-
-        rows = engine.execute(
-            text(f"SELECT * FROM `{table}` LIMIT :limit"),
-            {"limit": max_rows}
-        ).fetchall()
-
-        chunk_count = 0
-
-        for row_idx, row in enumerate(rows):
-            row_dict = dict(row._mapping)
-            combined = "\n".join(
-                f"{col}: {row_dict[col]}"
-                for col in text_cols
-                if row_dict.get(col)
-            )
-
-            for chunk in simple_chunk(combined):
-                emb = embedder.embed_query(chunk)
-                vector_store.add(
-                    session_id=session_id,
-                    embedding=emb,
-                    text=chunk,
-                    metadata={
-                        "table": table,
-                        "row": row_idx,
-                        "columns": text_cols,
-                    },
-                )
-                chunk_count += 1
-
-        stats[table] = {
-            "rows": len(rows),
-            "chunks": chunk_count,
-            "columns": text_cols,
+    work = indexable_tables(schema)
+    run.progress.tables_total = len(work)
+
+    stats: Dict[str, Any] = {}
+    workers = max(1, min(int(settings.get("table_workers", 4)), len(work) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index") as pool:
+        futures = {
+            pool.submit(_index_one_table, run, table, cols, text_cols): table
+            for table, cols, text_cols in work
         }
+        for future in as_completed(futures):
+            stats[futures[future]] = future.result()
 
-    return stats
+    # Keep the schema's table order in the response.
+    return {table: stats[table] for table, _, _ in work}
@@ -0,0 +1,142 @@
+# app/rag/local_embeddings.py
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.utils.config_loader import load_config
+
+
+def local_embedding_settings() -> Dict[str, Any]:
+    conf = (load_config().get("embedding_model", {}) or {}).get("local", {}) or {}
+    return {
+        "model_name": conf.get("model_name") or "sentence-transformers/all-MiniLM-L6-v2",
+        "device": conf.get("device") or "cpu",
+        "threads": int(conf.get("threads", 0)),
+        "batch_size": int(conf.get("batch_size", 64)),
+        "max_batch_size": int(conf.get("max_batch_size", 32)),
+        "max_wait_ms": float(conf.get("max_wait_ms", 5)),
+        "normalize": bool(conf.get("normalize", True)),
+    }
+
+
+class QueryBatcher:
+    """
+    Dynamic batching for single-text embeds: concurrent `embed_query` calls
+    from different requests are queued, and one worker thread encodes
+    whatever has arrived, up to `max_batch_size` texts, in one forward
+    pass. The worker waits at most `max_wait_ms` after the first text for
+    more to arrive, so a lone query pays that much extra latency and a
+    burst of N queries costs about one batch instead of N passes.
+    """
+
+    def __init__(self, encode, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(t, f) for t, f in self._collect() if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self._encode([t for t, _ in batch])
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), vec in zip(batch, vectors):
+                future.set_result(vec)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+class LocalEmbeddings:
+    """
+    CPU sentence-transformers model behind the same interface the app uses
+    for the Google embeddings (`embed_query`, `aembed_query`,
+    `embed_documents`). Needs no network or API key, so indexing keeps
+    working when the remote provider is unreachable.
+
+    `embed_documents` (indexing) encodes its list directly in `batch_size`
+    chunks; single queries go through the QueryBatcher. `threads` caps the
+    intra-op threads torch uses (0 = torch default, one per core).
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = settings or local_embedding_settings()
+        from sentence_transformers import SentenceTransformer  # optional; heavy (torch)
+
+        if self.settings["threads"] > 0:
+            import torch
+
+            torch.set_num_threads(self.settings["threads"])
+        self.model = SentenceTransformer(self.settings["model_name"], device=self.settings["device"])
+        self.batcher = QueryBatcher(
+            self._encode,
+            max_batch_size=self.settings["max_batch_size"],
+            max_wait_ms=self.settings["max_wait_ms"],
+        )
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.settings["batch_size"],
+            convert_to_numpy=True,
+            normalize_embeddings=self.settings["normalize"],
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.batcher.submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)) if texts else []
@@ -0,0 +1,237 @@
+# app/rag/metrics.py
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PREFIX = "ragmysql"
+
+# Seconds; covers a cached lookup (sub-ms) up to a slow LLM call / index run.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms kept in process, rendered in the Prometheus text
+    exposition format by `/metrics`. Each uvicorn worker has its own
+    registry; Prometheus scrapes (and sums) them per instance.
+
+    `collectors` are called at render time for values other components
+    already track (cache hit counts, pool usage), so they are not counted
+    twice.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help.setdefault(name, (kind, help_text))
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def add_collector(self, fn: Callable[[], List[Tuple[str, str, str, Dict[str, Any], float]]]) -> None:
+        """
+        `fn()` returns (name, type, help, labels, value) samples.
+        """
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {
+                n: {k: (h.buckets, list(h.counts), h.count, h.sum) for k, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            header(name, "counter", self._help.get(name, ("", name))[1])
+            for labels, value in sorted(series.items()):
+                lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, series in sorted(histograms.items()):
+            header(name, "histogram", self._help.get(name, ("", name))[1])
+            for labels, (buckets, counts, count, total) in sorted(series.items()):
+                cumulative = 0
+                for bound, n in zip(buckets, counts):
+                    cumulative += n
+                    le = _format_labels(labels, ("le", _format_value(bound)))
+                    lines.append(f"{PREFIX}_{name}_bucket{le} {cumulative}")
+                lines.append(f"{PREFIX}_{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{PREFIX}_{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{PREFIX}_{name}_count{_format_labels(labels)} {count}")
+
+        collected: Dict[str, Tuple[str, str, List[Tuple[Labels, float]]]] = {}
+        for fn in self._collectors:
+            try:
+                samples = fn()
+            except Exception:
+                continue  # a broken collector must not take /metrics down
+            for name, kind, help_text, labels, value in samples:
+                collected.setdefault(name, (kind, help_text, []))[2].append((_labels(labels), value))
+        for name, (kind, help_text, samples) in sorted(collected.items()):
+            header(name, kind, help_text)
+            for labels, value in samples:
+                lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("stage_seconds", "histogram", "Wall time per pipeline stage.")
+metrics.describe("stage_errors_total", "counter", "Stages that raised, by stage.")
+metrics.describe("llm_tokens_total", "counter", "LLM tokens by model and kind (prompt / completion).")
+
+
+class Timings:
+    """
+    Per-request timing breakdown: milliseconds per stage, summed when a
+    stage runs more than once.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ms: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._ms[stage] = self._ms.get(stage, 0.0) + 1000 * seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(ms, 2) for stage, ms in self._ms.items()}
+
+
+# The breakdown of the request being served, if it asked for one. Context
+# variables follow asyncio tasks and asyncio.to_thread; plain executor
+# submits need `contextvars.copy_context().run` (see Orchestrator.answer).
+_current_timings: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar("timings", default=None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a block into the `stage_seconds` histogram (and the current
+    request's breakdown); a raising block also counts a stage error.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        metrics.inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("stage_seconds", elapsed, stage=stage)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+
+
+def timed(stage: str) -> Callable:
+    """
+    Decorator form of `span` for plain and async functions.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def record_llm_usage(model: str, usage: Any) -> None:
+    """
+    Count prompt / completion tokens from an OpenAI-style `usage` object.
+    """
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        n = getattr(usage, f"{kind}_tokens", None)
+        if n:
+            metrics.inc("llm_tokens_total", n, model=model, kind=kind)
@@ -0,0 +1,480 @@
+# app/rag/mmap_vector_store.py
+from __future__ import annotations
+
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.metrics import timed
+from app.rag.vector_store import cosine_scores, top_k_indices
+
+
+class _MappedSession:
+    """
+    Read-only snapshot of one session directory at one header version.
+
+    Layout (all files inside the generation directory `g<N>/`):
+        vectors.f32   row-major float32 matrix, `dim` columns
+        norms.f32     one float32 L2 norm per row
+        alive.u8      1 = live row, 0 = deleted (tombstone)
+        meta.jsonl    one {"text", "metadata"} JSON line per row
+        offsets.u64   byte offset of each row's line in meta.jsonl
+    `header.json` in the session directory holds dim, count, dead and the
+    current generation; it is replaced atomically after every write, so a
+    snapshot only ever maps rows that are fully written. Snapshots are
+    immutable (a newer header builds a new one) and keep their files
+    mapped, so they stay valid even after a compaction removes them.
+    """
+
+    def __init__(self, root: str, header: Dict[str, Any]):
+        self.generation = header["generation"]
+        self.count = header["count"]
+        self.dim = header["dim"]
+        gen_dir = os.path.join(root, f"g{self.generation}")
+        if self.count == 0:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            self.norms = np.empty(0, dtype=np.float32)
+            self.alive = np.empty(0, dtype=np.uint8)
+            self.offsets = np.empty(0, dtype=np.uint64)
+            self.meta = b""
+            return
+        n, dim = self.count, self.dim
+        self.vectors = np.memmap(os.path.join(gen_dir, "vectors.f32"), np.float32, "r", shape=(n, dim))
+        self.norms = np.memmap(os.path.join(gen_dir, "norms.f32"), np.float32, "r", shape=(n,))
+        self.alive = np.memmap(os.path.join(gen_dir, "alive.u8"), np.uint8, "r", shape=(n,))
+        self.offsets = np.memmap(os.path.join(gen_dir, "offsets.u64"), np.uint64, "r", shape=(n,))
+        with open(os.path.join(gen_dir, "meta.jsonl"), "rb") as f:
+            self.meta = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def matches(self, header: Dict[str, Any]) -> bool:
+        return header["generation"] == self.generation and header["count"] == self.count
+
+    def read_records(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        out = []
+        for i in rows:
+            start = int(self.offsets[i])
+            end = self.meta.find(b"\n", start)
+            out.append(json.loads(self.meta[start:end]))
+        return out
+
+
+class MmapVectorStore:
+    """
+    Persistent vector store with the same add/search interface as
+    `InMemoryVectorStore`.
+
+    Each session is a directory of flat files opened with mmap, so several
+    uvicorn workers (or pods sharing a volume) search the same index
+    zero-copy through the page cache and the index survives restarts.
+    Writers serialize on an flock per session; readers never lock and
+    pick up new rows by re-reading `header.json`.
+    """
+
+    _COMPACT_MIN_DEAD = 1024
+    # Heap cost of one doc_id map entry besides the dict's own table: the
+    # doc_id str (~60 bytes for "table:[pk]") and its row list (~64 bytes).
+    _DOC_ENTRY_BYTES = 120
+    # Sessions survive restarts and are visible to every worker on the volume.
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._sessions: Dict[str, _MappedSession] = {}
+        # doc_id -> rows, valid for the (generation, count) it was built at;
+        # another process writing the same session invalidates it.
+        self._doc_rows: Dict[str, Dict[str, List[int]]] = {}
+        self._doc_rows_at: Dict[str, tuple] = {}
+        # table -> row ids, as (generation, rows covered, map); extended as
+        # rows are appended, rebuilt after a compaction.
+        self._table_rows: Dict[str, Tuple[int, int, Dict[Optional[str], np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # files
+    # ------------------------------------------------------------------
+    def _session_dir(self, session_id: str) -> str:
+        if not session_id or os.sep in session_id or session_id.startswith("."):
+            raise ValueError(f"Invalid session_id for on-disk store: {session_id!r}")
+        return os.path.join(self.path, session_id)
+
+    def _read_header(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._session_dir(session_id), "header.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self, session_id: str, header: Dict[str, Any]) -> None:
+        path = os.path.join(self._session_dir(session_id), "header.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _write_lock(self, session_id: str) -> Iterator[None]:
+        root = self._session_dir(session_id)
+        os.makedirs(root, exist_ok=True)
+        with self._lock, open(os.path.join(root, ".lock"), "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _mapped(self, session_id: str) -> Optional[_MappedSession]:
+        header = self._read_header(session_id)
+        if header is None:
+            return None
+        mapped = self._sessions.get(session_id)
+        if mapped is not None and mapped.matches(header):
+            return mapped
+        try:
+            mapped = _MappedSession(self._session_dir(session_id), header)
+        except FileNotFoundError:
+            # A compaction swapped generations between reading the header
+            # and opening the files; the new header is already in place.
+            mapped = _MappedSession(self._session_dir(session_id), self._read_header(session_id))
+        self._sessions[session_id] = mapped
+        return mapped
+
+    # ------------------------------------------------------------------
+    # writes
+    # ------------------------------------------------------------------
+    def add(self, session_id: str, embedding: List[float], text: str, metadata: Dict[str, Any]):
+        self.add_many(session_id, [embedding], [text], [metadata])
+
+    def add_many(
+        self,
+        session_id: str,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+    ):
+        if not (len(embeddings) == len(texts) == len(metadatas)):
+            raise ValueError("embeddings, texts and metadatas must have the same length")
+        if not texts:
+            return
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if vecs.ndim == 1:
+            vecs = vecs.reshape(1, -1)
+
+        with self._write_lock(session_id):
+            header = self._read_header(session_id) or {
+                "dim": int(vecs.shape[1]), "count": 0, "dead": 0, "generation": 0,
+            }
+            if vecs.shape[1] != header["dim"]:
+                raise ValueError(
+                    f"Embedding dimension {vecs.shape[1]} does not match session dimension {header['dim']}"
+                )
+            gen_dir = os.path.join(self._session_dir(session_id), f"g{header['generation']}")
+            os.makedirs(gen_dir, exist_ok=True)
+            self._trim(gen_dir, header["count"], header["dim"])
+
+            with open(os.path.join(gen_dir, "meta.jsonl"), "ab") as f:
+                offset = f.tell()
+                offsets = np.empty(len(texts), dtype=np.uint64)
+                for i, (text, meta) in enumerate(zip(texts, metadatas)):
+                    line = json.dumps({"text": text, "metadata": meta}, default=str).encode("utf-8") + b"\n"
+                    offsets[i] = offset
+                    f.write(line)
+                    offset += len(line)
+            self._append(gen_dir, "vectors.f32", vecs.tobytes())
+            self._append(gen_dir, "norms.f32", np.linalg.norm(vecs, axis=1).astype(np.float32).tobytes())
+            self._append(gen_dir, "alive.u8", np.ones(len(texts), dtype=np.uint8).tobytes())
+            self._append(gen_dir, "offsets.u64", offsets.tobytes())
+
+            start = header["count"]
+            doc_rows = self._doc_rows.get(session_id)
+            if doc_rows is not None and self._doc_rows_at.get(session_id) == (header["generation"], start):
+                for i, meta in enumerate(metadatas):
+                    if meta.get("doc_id") is not None:
+                        doc_rows.setdefault(meta["doc_id"], []).append(start + i)
+
+            # Publish the rows last: readers only map up to header["count"].
+            header["count"] = start + len(texts)
+            self._write_header(session_id, header)
+            if doc_rows is not None:
+                self._doc_rows_at[session_id] = (header["generation"], header["count"])
+
+    @staticmethod
+    def _append(gen_dir: str, name: str, data: bytes) -> None:
+        with open(os.path.join(gen_dir, name), "ab") as f:
+            f.write(data)
+
+    @staticmethod
+    def _trim(gen_dir: str, count: int, dim: int) -> None:
+        """
+        Cut off rows a write that died before publishing its header left
+        past `count`, so new rows land at the positions readers expect.
+        Called under the write lock.
+        """
+        sizes = {"vectors.f32": 4 * dim, "norms.f32": 4, "alive.u8": 1, "offsets.u64": 8}
+        meta_end = 0
+        if count:
+            with open(os.path.join(gen_dir, "offsets.u64"), "rb") as f:
+                f.seek((count - 1) * 8)
+                last = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            with open(os.path.join(gen_dir, "meta.jsonl"), "rb") as f:
+                f.seek(last)
+                meta_end = last + len(f.readline())
+        ends = {name: count * size for name, size in sizes.items()}
+        ends["meta.jsonl"] = meta_end
+        for name, end in ends.items():
+            path = os.path.join(gen_dir, name)
+            try:
+                if os.path.getsize(path) > end:
+                    os.truncate(path, end)
+            except FileNotFoundError:
+                pass
+
+    def _load_doc_rows(self, session_id: str, mapped: _MappedSession) -> Dict[str, List[int]]:
+        doc_rows = self._doc_rows.get(session_id)
+        if doc_rows is None or self._doc_rows_at.get(session_id) != (mapped.generation, mapped.count):
+            doc_rows = {}
+            for i, rec in enumerate(mapped.read_records(range(mapped.count))):
+                doc_id = rec["metadata"].get("doc_id")
+                if doc_id is not None and mapped.alive[i]:
+                    doc_rows.setdefault(doc_id, []).append(i)
+            self._doc_rows[session_id] = doc_rows
+            self._doc_rows_at[session_id] = (mapped.generation, mapped.count)
+        return doc_rows
+
+    def _tombstone(self, session_id: str, header: Dict[str, Any], rows: List[int]) -> int:
+        if not rows:
+            return 0
+        path = os.path.join(self._session_dir(session_id), f"g{header['generation']}", "alive.u8")
+        alive = np.memmap(path, np.uint8, "r+", shape=(header["count"],))
+        idx = np.asarray(rows, dtype=np.int64)
+        removed = int(alive[idx].sum())
+        alive[idx] = 0
+        alive.flush()
+        del alive
+        header["dead"] += removed
+        return removed
+
+    def delete(self, session_id: str, doc_ids: Iterable[str]) -> int:
+        """
+        Remove every chunk whose metadata `doc_id` is in `doc_ids`.
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids or self._read_header(session_id) is None:
+            return 0
+        with self._write_lock(session_id):
+            header = self._read_header(session_id)
+            mapped = self._mapped(session_id)
+            doc_rows = self._load_doc_rows(session_id, mapped)
+            rows = [i for d in doc_ids for i in doc_rows.pop(d, [])]
+            removed = self._tombstone(session_id, header, rows)
+            self._finish_delete(session_id, header)
+            return removed
+
+    def pop(self, session_id: str, doc_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Like `delete`, but return the removed chunks as {"text", "metadata"}.
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids or self._read_header(session_id) is None:
+            return []
+        with self._write_lock(session_id):
+            header = self._read_header(session_id)
+            mapped = self._mapped(session_id)
+            doc_rows = self._load_doc_rows(session_id, mapped)
+            rows = [i for d in doc_ids for i in doc_rows.pop(d, []) if mapped.alive[i]]
+            records = mapped.read_records(rows)
+            self._tombstone(session_id, header, rows)
+            self._finish_delete(session_id, header)
+            return records
+
+    def delete_table(self, session_id: str, table: str) -> int:
+        """
+        Remove every chunk that came from `table`.
+        """
+        if self._read_header(session_id) is None:
+            return 0
+        with self._write_lock(session_id):
+            header = self._read_header(session_id)
+            mapped = self._mapped(session_id)
+            live = [int(i) for i in np.flatnonzero(mapped.alive)]
+            rows = [
+                i for i, rec in zip(live, mapped.read_records(live))
+                if rec["metadata"].get("table") == table
+            ]
+            doc_rows = self._doc_rows.get(session_id)
+            if doc_rows is not None:
+                dropped = set(rows)
+                for doc_id in [d for d, r in doc_rows.items() if dropped.intersection(r)]:
+                    del doc_rows[doc_id]
+            removed = self._tombstone(session_id, header, rows)
+            self._finish_delete(session_id, header)
+            return removed
+
+    def _finish_delete(self, session_id: str, header: Dict[str, Any]) -> None:
+        if header["dead"] >= max(self._COMPACT_MIN_DEAD, header["count"] // 4):
+            self._compact(session_id, header)
+        else:
+            self._write_header(session_id, header)
+
+    def _compact(self, session_id: str, header: Dict[str, Any]) -> None:
+        """
+        Rewrite live rows into a new generation directory and switch the
+        header to it. Readers still mapping the old generation keep working
+        until they notice the new header.
+        """
+        mapped = self._mapped(session_id)
+        keep = np.flatnonzero(mapped.alive)
+        records = mapped.read_records(int(i) for i in keep)
+        root = self._session_dir(session_id)
+        old_dir = os.path.join(root, f"g{header['generation']}")
+        new_gen = header["generation"] + 1
+        new_dir = os.path.join(root, f"g{new_gen}")
+        shutil.rmtree(new_dir, ignore_errors=True)
+        os.makedirs(new_dir)
+
+        offsets = np.empty(len(keep), dtype=np.uint64)
+        offset = 0
+        doc_rows: Dict[str, List[int]] = {}
+        with open(os.path.join(new_dir, "meta.jsonl"), "wb") as f:
+            for i, rec in enumerate(records):
+                line = json.dumps(rec, default=str).encode("utf-8") + b"\n"
+                offsets[i] = offset
+                f.write(line)
+                offset += len(line)
+                doc_id = rec["metadata"].get("doc_id")
+                if doc_id is not None:
+                    doc_rows.setdefault(doc_id, []).append(i)
+        self._append(new_dir, "vectors.f32", np.ascontiguousarray(mapped.vectors[keep]).tobytes())
+        self._append(new_dir, "norms.f32", np.ascontiguousarray(mapped.norms[keep]).tobytes())
+        self._append(new_dir, "alive.u8", np.ones(len(keep), dtype=np.uint8).tobytes())
+        self._append(new_dir, "offsets.u64", offsets.tobytes())
+
+        header.update(count=int(len(keep)), dead=0, generation=new_gen)
+        self._write_header(session_id, header)
+        self._doc_rows[session_id] = doc_rows
+        self._doc_rows_at[session_id] = (new_gen, header["count"])
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def memory_bytes(self, session_id: str) -> int:
+        """
+        Heap held for the session: only the doc_id map. The vectors are
+        file-backed pages the kernel can reclaim, so they are not counted.
+        """
+        doc_rows = self._doc_rows.get(session_id)
+        if not doc_rows:
+            return 0
+        return sys.getsizeof(doc_rows) + self._DOC_ENTRY_BYTES * len(doc_rows)
+
+    def drop_session(self, session_id: str) -> None:
+        root = self._session_dir(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._doc_rows.pop(session_id, None)
+            self._doc_rows_at.pop(session_id, None)
+            self._table_rows.pop(session_id, None)
+            shutil.rmtree(root, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # reads
+    # ------------------------------------------------------------------
+    def count(self, session_id: str) -> int:
+        header = self._read_header(session_id)
+        return header["count"] - header["dead"] if header else 0
+
+    def _load_table_rows(self, session_id: str, mapped: _MappedSession) -> Dict[Optional[str], np.ndarray]:
+        cached = self._table_rows.get(session_id)
+        if cached is not None and cached[0] == mapped.generation and cached[1] <= mapped.count:
+            _, start, by_table = cached
+        else:
+            start, by_table = 0, {}
+        if start < mapped.count:
+            new: Dict[Optional[str], List[int]] = {}
+            for i, rec in enumerate(mapped.read_records(range(start, mapped.count)), start=start):
+                new.setdefault(rec["metadata"].get("table"), []).append(i)
+            by_table = dict(by_table)
+            for table, rows in new.items():
+                added = np.asarray(rows, dtype=np.int64)
+                by_table[table] = np.concatenate([by_table[table], added]) if table in by_table else added
+            self._table_rows[session_id] = (mapped.generation, mapped.count, by_table)
+        return by_table
+
+    def tables(self, session_id: str) -> List[str]:
+        """
+        Tables with live chunks in the session.
+        """
+        mapped = self._mapped(session_id)
+        if mapped is None:
+            return []
+        by_table = self._load_table_rows(session_id, mapped)
+        return sorted(t for t, rows in by_table.items() if t is not None and mapped.alive[rows].any())
+
+    @timed("vector_search")
+    def search(
+        self,
+        session_id: str,
+        query_emb: List[float],
+        k: int = 5,
+        tables: Optional[Iterable[str]] = None,
+    ):
+        """
+        Top-k chunks by cosine similarity; `tables` restricts the scan to
+        those tables' rows (found through a cached table -> rows map).
+        """
+        mapped = self._mapped(session_id)
+        if mapped is None or mapped.count == 0 or k <= 0:
+            return []
+        vectors, norms, alive = mapped.vectors, mapped.norms, mapped.alive
+
+        q = np.asarray(query_emb, dtype=np.float32).reshape(-1)
+        if q.shape[0] != mapped.dim:
+            raise ValueError(
+                f"Query dimension {q.shape[0]} does not match session dimension {mapped.dim}"
+            )
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0:
+            return []
+
+        if tables is None:
+            scores = cosine_scores(vectors, norms, q, q_norm)
+            scores[alive == 0] = -np.inf
+            hits = [(int(i), float(scores[i])) for i in top_k_indices(scores, k) if alive[i]]
+        else:
+            by_table = self._load_table_rows(session_id, mapped)
+            parts = [by_table[t] for t in dict.fromkeys(tables) if t in by_table]
+            if not parts:
+                return []
+            rows = np.sort(np.concatenate(parts))
+            # A table's rows are mostly contiguous (indexed in batches):
+            # score each run as a slice of the mapping rather than gathering
+            # the rows into a copy, unless they are scattered.
+            cuts = np.flatnonzero(np.diff(rows) != 1) + 1
+            if len(cuts) <= len(rows) // 64:
+                run_scores = []
+                for run in np.split(rows, cuts):
+                    lo, hi = int(run[0]), int(run[-1]) + 1
+                    run_scores.append(cosine_scores(vectors[lo:hi], norms[lo:hi], q, q_norm))
+                scores = np.concatenate(run_scores)
+            else:
+                scores = cosine_scores(vectors[rows], norms[rows], q, q_norm)
+            scores[alive[rows] == 0] = -np.inf
+            hits = [(int(rows[i]), float(scores[i])) for i in top_k_indices(scores, k) if np.isfinite(scores[i])]
+
+        top = [i for i, _ in hits]
+        return [
+            {
+                "text": rec["text"],
+                "metadata": rec["metadata"],
+                "score": score,
+            }
+            for (_, score), rec in zip(hits, mapped.read_records(top))
+        ]
@@ -1,20 +1,55 @@
 # app/rag/orchestrator.py
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.engine import Engine
 
-from app.rag.sql_agent import answer_question_with_sql
-from app.rag.embedder import Embedder
+from app.rag.sql_agent import (
+    aanswer_question_with_sql,
+    agenerate_sql_draft,
+    answer_question_with_sql,
+    arun_sql_cached,
+    generate_sql_draft,
+    remaining_budget,
+    remember_sql,
+    run_sql_cached,
+    summarize_rows,
+)
+from app.rag.embedder import get_embedder
+from app.rag.metrics import span, timed
+from app.rag.result_cache import referenced_tables
+from app.rag.result_pages import EMPTY_PAGE, ResultPage
 from app.rag.retriever import Retriever
+from app.rag.schema_index import SchemaIndex
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+from app.rag.vector_store import vector_store
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+Emit = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Rows sent with the streamed "rows" event; the full page comes with "answer".
+STREAM_PREVIEW_ROWS = 20
+
+
+def _resolve(future, value) -> None:
+    # Works for concurrent and asyncio futures alike; the first value wins.
+    if not future.done():
+        future.set_result(value)
 
 
 @dataclass
 class OrchestratorResult:
     answer: str
     sql_used: Optional[str]
-    rows: List[Dict[str, Any]]
+    result: ResultPage
     semantic_chunks: List[Dict[str, Any]]
 
 
@@ -26,53 +61,120 @@ class Orchestrator:
     - Runs semantic retrieval path via retriever (if indexed)
     - Returns a single payload that the API can send to UI
 
-    NOTE: No module-level side effects (important for uvicorn reload).
+    The paths run concurrently, each with its own timeout; a path that
+    fails or times out degrades to a placeholder. With `semantic_scope:
+    "sql_tables"` the semantic path waits up to `scope_wait_seconds` for
+    the SQL draft and searches only the indexed tables it reads.
+
+    NOTE: No module-level side effects (important for uvicorn reload);
+    use `get_orchestrator()` for the shared instance.
     """
 
     def __init__(self) -> None:
-        self.embedder = Embedder()
+        self.embedder = get_embedder()
         self.retriever = Retriever(self.embedder)
 
-    def answer(
-        self,
-        session_id: str,
-        question: str,
-        engine: Engine,
-        schema: Dict[str, Any],
-        k: int = 5,
-    ) -> Dict[str, Any]:
-        # ---- 1) SQL path ----
-        # Keep this wrapped so SQL/LLM failures don't crash the whole request.
-        sql_answer = ""
-        sql_used: Optional[str] = None
-        rows: List[Dict[str, Any]] = []
+        conf = load_config().get("orchestrator", {}) or {}
+        self.sql_timeout = float(conf.get("sql_timeout_seconds", 30))
+        self.semantic_timeout = float(conf.get("semantic_timeout_seconds", 10))
+        self.scope_to_sql = conf.get("semantic_scope", "all") == "sql_tables"
+        self.scope_wait = float(conf.get("scope_wait_seconds", 5))
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(conf.get("branch_workers", 16)),
+            thread_name_prefix="orchestrator",
+        )
 
+    @staticmethod
+    def _await(future: Future, deadline: float):
         try:
-            sql_answer, sql_used, rows = answer_question_with_sql(
-                question=question,
-                engine=engine,
-                schema=schema,
-            )
-        except Exception as e:
-            sql_answer = f"(SQL path failed: {type(e).__name__}: {e})"
-            sql_used = None
-            rows = []
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()  # no-op if already running; the branch's own timeouts stop it
+            raise
+
+    def _sql_fallback(self, e: BaseException) -> Tuple[str, Optional[str], ResultPage]:
+        if isinstance(e, TimeoutError):
+            return f"(SQL path timed out after {self.sql_timeout:g}s)", None, EMPTY_PAGE
+        return f"(SQL path failed: {type(e).__name__}: {e})", None, EMPTY_PAGE
+
+    def _semantic_fallback(self, e: BaseException) -> List[Dict[str, Any]]:
+        if isinstance(e, TimeoutError):
+            text = f"(Semantic retrieve timed out after {self.semantic_timeout:g}s)"
+        else:
+            text = f"(Semantic retrieve failed: {type(e).__name__}: {e})"
+        return [{"text": text, "score": 0.0, "metadata": {"error": True}}]
 
-        # ---- 2) Semantic path ----
-        semantic_chunks: List[Dict[str, Any]] = []
+    @staticmethod
+    def _scope_tables(session_id: str, sql: Optional[str], schema: Dict[str, Any]) -> Optional[List[str]]:
+        """
+        Indexed tables the draft SQL reads; None (search every table) when
+        there is no draft or it reads none of them.
+        """
+        if not sql:
+            return None
+        indexed = set(vector_store.tables(session_id))
+        tables = [t for t in referenced_tables(sql, schema.keys()) if t in indexed]
+        return tables or None
+
+    @staticmethod
+    def _sql_branch(draft_sql: Optional[Future], **kwargs) -> Tuple[str, str, ResultPage]:
+        if draft_sql is None:
+            return answer_question_with_sql(**kwargs)
         try:
-            semantic_chunks = self.retriever.retrieve(
-                session_id=session_id,
-                query=question,
-                k=k,
-            )
-        except Exception as e:
-            semantic_chunks = [{
-                "text": f"(Semantic retrieve failed: {type(e).__name__}: {e})",
-                "score": 0.0,
-                "metadata": {"error": True},
-            }]
+            return answer_question_with_sql(on_draft=lambda d: _resolve(draft_sql, d.sql), **kwargs)
+        finally:
+            _resolve(draft_sql, None)  # failed before drafting: don't keep the semantic path waiting
 
+    @timed("retrieve")
+    def _retrieve_scoped(
+        self, session_id: str, question: str, k: int, schema: Dict[str, Any], draft_sql: Future,
+    ) -> List[Dict[str, Any]]:
+        q_emb = self.embedder.embed_query(question)
+        with span("scope_wait"):
+            try:
+                sql = draft_sql.result(timeout=self.scope_wait)
+            except FutureTimeoutError:
+                sql = None
+        return self.retriever.search(session_id, q_emb, k, self._scope_tables(session_id, sql, schema))
+
+    @staticmethod
+    async def _asql_branch(draft_sql: Optional[asyncio.Future], **kwargs) -> Tuple[str, str, ResultPage]:
+        if draft_sql is None:
+            return await aanswer_question_with_sql(**kwargs)
+        try:
+            return await aanswer_question_with_sql(on_draft=lambda d: _resolve(draft_sql, d.sql), **kwargs)
+        finally:
+            _resolve(draft_sql, None)
+
+    @timed("retrieve")
+    async def _aretrieve_scoped(
+        self,
+        session_id: str,
+        question: str,
+        k: int,
+        schema: Dict[str, Any],
+        draft_sql: asyncio.Future,
+        in_thread: bool = False,
+    ) -> List[Dict[str, Any]]:
+        if in_thread:
+            q_emb = await asyncio.to_thread(self.embedder.embed_query, question)
+        else:
+            q_emb = await self.embedder.aembed_query(question)
+        with span("scope_wait"):
+            try:
+                sql = await asyncio.wait_for(asyncio.shield(draft_sql), self.scope_wait)
+            except asyncio.TimeoutError:
+                sql = None
+        tables = self._scope_tables(session_id, sql, schema)
+        return await asyncio.to_thread(self.retriever.search, session_id, q_emb, k, tables)
+
+    @staticmethod
+    def _fuse(
+        sql_answer: str,
+        sql_used: Optional[str],
+        page: ResultPage,
+        semantic_chunks: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
         # ---- 3) Simple fusion (safe, deterministic) ----
         if semantic_chunks and semantic_chunks[0].get("metadata", {}).get("error") is not True:
             top_text = semantic_chunks[0].get("text", "")
@@ -85,14 +187,265 @@ class Orchestrator:
         result = OrchestratorResult(
             answer=combined_answer,
             sql_used=sql_used,
-            rows=rows,
+            result=page,
             semantic_chunks=semantic_chunks if semantic_chunks else [],
         )
 
-        # Return dict (easy for FastAPI JSON response)
+        # Return dict (easy for FastAPI JSON response). Rows are columnar:
+        # "columns" once, "rows" as lists; "next_token" fetches the next page.
         return {
             "answer": result.answer,
             "sql_used": result.sql_used,
-            "rows": result.rows,
+            **result.result.to_dict(),
             "semantic_chunks": result.semantic_chunks,
         }
+
+    @timed("ask")
+    def answer(
+        self,
+        session_id: str,
+        question: str,
+        engine: Engine,
+        schema: Dict[str, Any],
+        k: int = 5,
+        schema_index: Optional[SchemaIndex] = None,
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
+
+        # ---- 1) + 2) SQL and semantic paths, concurrently ----
+        # Each branch runs in a copy of this context so its timing spans land
+        # in the request's breakdown (see app.rag.metrics).
+        draft_sql: Optional[Future] = Future() if self.scope_to_sql else None
+        sql_future = self._pool.submit(
+            contextvars.copy_context().run,
+            self._sql_branch,
+            draft_sql,
+            question=question,
+            engine=engine,
+            schema=schema,
+            timeout=self.sql_timeout,
+            embed=self.embedder.embed_query,
+            schema_index=schema_index,
+        )
+        if draft_sql is not None:
+            semantic_future = self._pool.submit(
+                contextvars.copy_context().run,
+                self._retrieve_scoped, session_id, question, k, schema, draft_sql,
+            )
+        else:
+            semantic_future = self._pool.submit(
+                contextvars.copy_context().run,
+                self.retriever.retrieve,
+                session_id=session_id,
+                query=question,
+                k=k,
+            )
+
+        # Keep these wrapped so SQL/LLM failures don't crash the whole request.
+        try:
+            sql_answer, sql_used, page = self._await(sql_future, started + self.sql_timeout)
+        except Exception as e:
+            sql_answer, sql_used, page = self._sql_fallback(e)
+
+        try:
+            semantic_chunks = self._await(semantic_future, started + self.semantic_timeout)
+        except Exception as e:
+            semantic_chunks = self._semantic_fallback(e)
+
+        return self._fuse(sql_answer, sql_used, page, semantic_chunks)
+
+    @timed("ask")
+    async def answer_async(
+        self,
+        session_id: str,
+        question: str,
+        async_engine: AsyncEngine,
+        schema: Dict[str, Any],
+        k: int = 5,
+        schema_index: Optional[SchemaIndex] = None,
+    ) -> Dict[str, Any]:
+        """
+        Native async `answer`: both paths are awaited on the event loop
+        (async Groq client, async embeddings, AsyncEngine), so an in-flight
+        question holds no thread while it waits on the LLM, MySQL or the
+        embedding API. `wait_for` cancels a branch that exceeds its budget.
+        """
+        draft_sql = asyncio.get_running_loop().create_future() if self.scope_to_sql else None
+        if draft_sql is not None:
+            semantic = self._aretrieve_scoped(session_id, question, k, schema, draft_sql)
+        else:
+            semantic = self.retriever.aretrieve(session_id=session_id, query=question, k=k)
+        sql_res, semantic_res = await asyncio.gather(
+            asyncio.wait_for(
+                self._asql_branch(
+                    draft_sql,
+                    question=question,
+                    async_engine=async_engine,
+                    schema=schema,
+                    timeout=self.sql_timeout,
+                    aembed=self.embedder.aembed_query,
+                    schema_index=schema_index,
+                ),
+                timeout=self.sql_timeout,
+            ),
+            asyncio.wait_for(semantic, timeout=self.semantic_timeout),
+            return_exceptions=True,
+        )
+
+        if isinstance(sql_res, BaseException):
+            sql_answer, sql_used, page = self._sql_fallback(sql_res)
+        else:
+            sql_answer, sql_used, page = sql_res
+
+        if isinstance(semantic_res, BaseException):
+            semantic_chunks = self._semantic_fallback(semantic_res)
+        else:
+            semantic_chunks = semantic_res
+
+        return self._fuse(sql_answer, sql_used, page, semantic_chunks)
+
+    # ------------------------------------------------------------------
+    # streaming
+    # ------------------------------------------------------------------
+    async def _sql_stages(
+        self,
+        emit: Emit,
+        question: str,
+        engine: Engine,
+        schema: Dict[str, Any],
+        schema_index: Optional[SchemaIndex],
+        async_engine: Optional[AsyncEngine],
+        draft_sql: Optional[asyncio.Future] = None,
+    ) -> Tuple[str, str, ResultPage]:
+        deadline = time.monotonic() + self.sql_timeout
+        try:
+            if async_engine is not None:
+                draft = await agenerate_sql_draft(
+                    question, schema, timeout=self.sql_timeout,
+                    aembed=self.embedder.aembed_query, schema_index=schema_index,
+                )
+            else:
+                draft = await asyncio.to_thread(
+                    generate_sql_draft, question, schema, self.sql_timeout,
+                    self.embedder.embed_query, schema_index,
+                )
+        except BaseException:
+            if draft_sql is not None:
+                _resolve(draft_sql, None)  # no draft: don't keep the semantic stage waiting
+            raise
+        if draft_sql is not None:
+            _resolve(draft_sql, draft.sql)
+        await emit("sql", {"sql": draft.sql, "cached": draft.from_cache})
+
+        if async_engine is not None:
+            page = await arun_sql_cached(async_engine, draft.sql, schema, timeout=remaining_budget(deadline))
+        else:
+            page = await asyncio.to_thread(run_sql_cached, engine, draft.sql, schema, remaining_budget(deadline))
+        remember_sql(draft)
+        await emit("rows", {
+            "columns": page.columns,
+            "count": len(page.rows),
+            "truncated": page.truncated,
+            "rows": page.rows[:STREAM_PREVIEW_ROWS],
+        })
+        return summarize_rows(page), draft.sql, page
+
+    async def _semantic_stage(
+        self,
+        emit: Emit,
+        session_id: str,
+        question: str,
+        k: int,
+        async_engine: Optional[AsyncEngine],
+        schema: Optional[Dict[str, Any]] = None,
+        draft_sql: Optional[asyncio.Future] = None,
+    ) -> List[Dict[str, Any]]:
+        if draft_sql is not None:
+            chunks = await self._aretrieve_scoped(
+                session_id, question, k, schema or {}, draft_sql, in_thread=async_engine is None,
+            )
+        elif async_engine is not None:
+            chunks = await self.retriever.aretrieve(session_id=session_id, query=question, k=k)
+        else:
+            chunks = await asyncio.to_thread(self.retriever.retrieve, session_id, question, k)
+        await emit("semantic", {"chunks": chunks})
+        return chunks
+
+    async def answer_stream(
+        self,
+        session_id: str,
+        question: str,
+        engine: Engine,
+        schema: Dict[str, Any],
+        k: int = 5,
+        schema_index: Optional[SchemaIndex] = None,
+        async_engine: Optional[AsyncEngine] = None,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        `answer` as a stream of (event, data) pairs, emitted as each stage
+        finishes: "sql" (generated SQL), "rows" (row count + first rows),
+        "semantic" (chunks), "error" (a path failed or timed out), then
+        "answer" (the same payload as `answer`). Uses the native async path
+        when `async_engine` is given, worker threads otherwise. Closing the
+        iterator early (client went away) cancels both paths.
+        """
+        queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+
+        async def emit(event: str, data: Dict[str, Any]) -> None:
+            await queue.put((event, data))
+
+        draft_sql = asyncio.get_running_loop().create_future() if self.scope_to_sql else None
+        sql_task = asyncio.ensure_future(asyncio.wait_for(
+            self._sql_stages(emit, question, engine, schema, schema_index, async_engine, draft_sql),
+            timeout=self.sql_timeout,
+        ))
+        semantic_task = asyncio.ensure_future(asyncio.wait_for(
+            self._semantic_stage(emit, session_id, question, k, async_engine, schema, draft_sql),
+            timeout=self.semantic_timeout,
+        ))
+        tasks = [sql_task, semantic_task]
+        outcomes: Dict[asyncio.Future, Any] = {}
+
+        def finish(task: asyncio.Future) -> None:
+            # Queue a failed path's error behind the events it already sent,
+            # so the client hears about it now rather than after the other path.
+            try:
+                outcomes[task] = task.result()
+                return
+            except Exception as e:
+                if task is sql_task:
+                    outcomes[task] = self._sql_fallback(e)
+                    error = {"stage": "sql", "detail": outcomes[task][0]}
+                else:
+                    outcomes[task] = self._semantic_fallback(e)
+                    error = {"stage": "semantic", "detail": outcomes[task][0]["text"]}
+            queue.put_nowait(("error", error))
+
+        try:
+            pending = set(tasks)
+            while pending or not queue.empty():
+                if queue.empty():
+                    getter = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(pending | {getter}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter in done:
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+                    for task in tasks:
+                        if task in done:
+                            pending.discard(task)
+                            finish(task)
+                    continue
+                yield queue.get_nowait()
+
+            sql_answer, sql_used, page = outcomes[sql_task]
+            semantic_chunks = outcomes[semantic_task]
+            yield "answer", self._fuse(sql_answer, sql_used, page, semantic_chunks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+@lazy_singleton
+def get_orchestrator() -> Orchestrator:
+    return Orchestrator()
@@ -0,0 +1,205 @@
+# app/rag/result_cache.py
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+from app.schema.schema_loader import NO_STATS_EXPIRY_SQL, disable_stats_cache
+
+# Versions are opaque tuples: (table, UPDATE_TIME) or (table, checksum).
+Versions = Tuple[Tuple[str, Any], ...]
+
+_IDENT = re.compile(r"`([^`]+)`|\b([A-Za-z_][A-Za-z0-9_$]*)\b")
+
+_UPDATE_TIME_SQL = text(
+    "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = :db AND TABLE_NAME IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql.strip().rstrip(";")).strip()
+
+
+def referenced_tables(sql: str, known_tables: Iterable[str]) -> List[str]:
+    """
+    Schema tables named anywhere in the query. Over-matching (a column that
+    shares a table's name) only costs an extra version probe, never a stale hit.
+    """
+    by_lower = {t.lower(): t for t in known_tables}
+    found = set()
+    for quoted, bare in _IDENT.findall(sql):
+        table = by_lower.get((quoted or bare).lower())
+        if table is not None:
+            found.add(table)
+    return sorted(found)
+
+
+def _versions_from_rows(tables: List[str], rows) -> Optional[Versions]:
+    """
+    None when a table has no token (a view, a missing table, or UPDATE_TIME
+    not known yet): its changes could not be detected, so don't cache.
+    """
+    seen = {name: value for name, value in rows}
+    if any(seen.get(t) is None for t in tables):
+        return None
+    return tuple((t, str(seen[t])) for t in tables)
+
+
+def _checksum_sql(tables: List[str]) -> str:
+    return "CHECKSUM TABLE " + ", ".join(f"`{t.replace('`', '``')}`" for t in tables)
+
+
+def table_versions(conn, database: str, tables: List[str], mode: str = "update_time") -> Optional[Versions]:
+    """
+    Change tokens for `tables` on an open connection. `update_time` reads
+    INFORMATION_SCHEMA.TABLES.UPDATE_TIME (cheap; NULL for views and until
+    the first write after a server restart); `checksum` runs CHECKSUM TABLE
+    (exact, but scans each table).
+
+    None means the result must not be cached: no schema table was found in
+    the query (`SELECT NOW()`, a view or another database's table), or one
+    of them has no token.
+    """
+    if not tables:
+        return None
+    if mode == "checksum":
+        rows = conn.execute(text(_checksum_sql(tables))).all()
+        return _versions_from_rows(tables, [(name.split(".")[-1], value) for name, value in rows])
+    disable_stats_cache(conn)
+    rows = conn.execute(_UPDATE_TIME_SQL, {"db": database, "tables": tables}).all()
+    return _versions_from_rows(tables, rows)
+
+
+async def atable_versions(conn, database: str, tables: List[str], mode: str = "update_time") -> Optional[Versions]:
+    if not tables:
+        return None
+    if mode == "checksum":
+        rows = (await conn.execute(text(_checksum_sql(tables)))).all()
+        return _versions_from_rows(tables, [(name.split(".")[-1], value) for name, value in rows])
+    try:
+        await conn.execute(NO_STATS_EXPIRY_SQL)
+    except Exception:
+        pass
+    rows = (await conn.execute(_UPDATE_TIME_SQL, {"db": database, "tables": tables})).all()
+    return _versions_from_rows(tables, rows)
+
+
+def estimate_rows_bytes(columns: List[str], rows: List[Tuple[Any, ...]]) -> int:
+    return len(json.dumps(columns)) + len(json.dumps(rows, default=str))
+
+
+@dataclass
+class CachedResult:
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    versions: Versions
+    nbytes: int
+    created_at: float
+
+
+class QueryResultCache:
+    """
+    Complete results of executed SELECTs (columns + row tuples), keyed on
+    (database scope, normalized SQL).
+
+    An entry is served only while it is younger than `ttl_seconds` and the
+    version tokens of every table it read are unchanged. Eviction is LRU,
+    bounded by the estimated size of the cached rows (`max_bytes`); single
+    results above `max_entry_bytes` are never cached.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 4 * 1024 * 1024,
+        ttl_seconds: float = 300.0,
+        mode: str = "update_time",
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self.mode = mode
+        self._lru: "OrderedDict[Tuple[str, str], CachedResult]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        entry = self._lru.pop(key)
+        self._bytes -= entry.nbytes
+
+    def get(self, scope: str, sql: str, versions: Versions) -> Optional[CachedResult]:
+        key = (scope, normalize_sql(sql))
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and (
+                time.monotonic() - entry.created_at > self.ttl_seconds or entry.versions != versions
+            ):
+                self._drop(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, scope: str, sql: str, versions: Versions, columns: List[str], rows: List[Tuple[Any, ...]]) -> None:
+        nbytes = estimate_rows_bytes(columns, rows)
+        if nbytes > self.max_entry_bytes:
+            return
+        key = (scope, normalize_sql(sql))
+        with self._lock:
+            if key in self._lru:
+                self._drop(key)
+            self._lru[key] = CachedResult(
+                columns=columns, rows=rows, versions=versions, nbytes=nbytes, created_at=time.monotonic()
+            )
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._lru:
+                self._drop(next(iter(self._lru)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "items": len(self._lru),
+            "bytes": self._bytes,
+            "mode": self.mode,
+        }
+
+
+@lazy_singleton
+def get_result_cache() -> Optional[QueryResultCache]:
+    """
+    Process-wide result cache. Returns None when `result_cache.enabled` is false.
+    """
+    conf = load_config().get("result_cache", {}) or {}
+    if not conf.get("enabled", True):
+        return None
+    return QueryResultCache(
+        max_bytes=int(conf.get("max_mb", 64)) * 1024 * 1024,
+        max_entry_bytes=int(conf.get("max_entry_mb", 4)) * 1024 * 1024,
+        ttl_seconds=float(conf.get("ttl_seconds", 300)),
+        mode=str(conf.get("validation", "update_time")),
+    )
@@ -0,0 +1,385 @@
+# app/rag/result_pages.py
+from __future__ import annotations
+
+import json
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+
+Row = Tuple[Any, ...]
+
+
+def result_page_settings() -> Dict[str, Any]:
+    conf = load_config().get("result_pages", {}) or {}
+    return {
+        "max_response_kb": int(conf.get("max_response_kb", 1024)),
+        "max_page_rows": int(conf.get("max_page_rows", 1000)),
+        "fetch_batch_rows": int(conf.get("fetch_batch_rows", 200)),
+        "max_open_cursors": int(conf.get("max_open_cursors", 4)),
+        "cursor_idle_seconds": float(conf.get("cursor_idle_seconds", 30)),
+        "token_ttl_seconds": float(conf.get("token_ttl_seconds", 600)),
+        "max_tokens": int(conf.get("max_tokens", 1000)),
+        "page_timeout_seconds": float(conf.get("page_timeout_seconds", 30)),
+    }
+
+
+def with_max_execution_time(sql: str, timeout: Optional[float]) -> str:
+    """
+    Add a MySQL MAX_EXECUTION_TIME optimizer hint so the server aborts the
+    SELECT itself once the caller's budget is spent.
+    """
+    if timeout is None:
+        return sql
+    ms = max(1, int(timeout * 1000))
+    return re.sub(r"^\s*select\b", f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */", sql, count=1, flags=re.IGNORECASE)
+
+
+def row_bytes(row: Sequence[Any]) -> int:
+    # Size of the row in the JSON response (a list, plus the separating comma).
+    return len(json.dumps(list(row), default=str)) + 1
+
+
+def _clip_row(row: Row, budget: int) -> Row:
+    """
+    Shorten the text/bytes cells of a row that alone exceeds the page
+    budget, so even a page of one huge row respects it.
+    """
+    per_cell = max(16, budget // max(1, len(row)) - 8)
+    clipped = []
+    for value in row:
+        if isinstance(value, (bytes, bytearray)):
+            value = value.decode("utf-8", "replace")
+        if isinstance(value, str) and len(value) > per_cell:
+            value = value[:per_cell] + "…"
+        clipped.append(value)
+    return tuple(clipped)
+
+
+@dataclass
+class ResultPage:
+    """
+    One page of a SELECT result in columnar form: column names once, rows as
+    tuples. `next_token` is set when the query has more rows than fit the
+    page's row / byte budget.
+    """
+    columns: List[str]
+    rows: List[Row]
+    nbytes: int = 0
+    next_token: Optional[str] = None
+    clipped: bool = False
+
+    @property
+    def truncated(self) -> bool:
+        return self.next_token is not None
+
+    def first_record(self) -> Optional[Dict[str, Any]]:
+        return dict(zip(self.columns, self.rows[0])) if self.rows else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "columns": self.columns,
+            "rows": self.rows,
+            "row_count": len(self.rows),
+            "bytes": self.nbytes,
+            "truncated": self.truncated,
+            "next_token": self.next_token,
+            "clipped": self.clipped,
+        }
+
+
+EMPTY_PAGE = ResultPage(columns=[], rows=[])
+
+
+class PageBuilder:
+    """
+    Accumulates rows until the next one would push the page over
+    `max_bytes` (estimated JSON size) or `max_rows`.
+    """
+
+    def __init__(self, columns: List[str], max_bytes: int, max_rows: int):
+        self.columns = columns
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.rows: List[Row] = []
+        self.nbytes = len(json.dumps(columns)) + 128  # column header + envelope
+        self.clipped = False
+
+    def add(self, row: Sequence[Any]) -> bool:
+        """
+        Take `row` if it fits; False (row not taken) once the page is full.
+        """
+        if len(self.rows) >= self.max_rows:
+            return False
+        row = tuple(row)
+        size = row_bytes(row)
+        if self.nbytes + size > self.max_bytes:
+            if self.rows:
+                return False
+            row = _clip_row(row, self.max_bytes - self.nbytes)
+            size = row_bytes(row)
+            self.clipped = True
+        self.rows.append(row)
+        self.nbytes += size
+        return True
+
+    def page(self, next_token: Optional[str] = None) -> ResultPage:
+        return ResultPage(self.columns, self.rows, self.nbytes, next_token, self.clipped)
+
+
+@dataclass
+class _Cursor:
+    token: str
+    scope: str
+    sql: str
+    columns: List[str]
+    delivered: int = 0
+    conn: Any = None  # Connection holding an open server-side cursor, or None
+    result: Any = None
+    pending: Deque[Row] = field(default_factory=deque)  # fetched, not yet sent
+    last_used: float = field(default_factory=time.monotonic)
+    created_at: float = field(default_factory=time.monotonic)
+    # When the server's MAX_EXECUTION_TIME stops the open query; reading
+    # past it would fail mid-page, so the cursor is closed (and re-run) first.
+    deadline: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ResultCursors:
+    """
+    Continuation tokens for SELECT results larger than one page.
+
+    Pages are read from a server-side cursor kept open under the token
+    (at most `max_open_cursors`, each for `cursor_idle_seconds`). Once it
+    is closed the token stays valid for `token_ttl_seconds`: the query is
+    re-run, within `page_timeout_seconds`, and delivered rows are skipped.
+    A background thread sweeps idle and expired cursors.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = settings or result_page_settings()
+        self._cursors: "OrderedDict[str, _Cursor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.reopened = 0
+        self.expired = 0
+        self._sweeper: Optional[threading.Thread] = None
+
+    @property
+    def max_bytes(self) -> int:
+        return self.settings["max_response_kb"] * 1024
+
+    def builder(self, columns: List[str]) -> PageBuilder:
+        return PageBuilder(columns, self.max_bytes, self.settings["max_page_rows"])
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _close(cursor: _Cursor, exhausted: bool = False) -> None:
+        conn, cursor.conn, cursor.result = cursor.conn, None, None
+        cursor.pending.clear()
+        if conn is None:
+            return
+        try:
+            if not exhausted:
+                # Closing an unbuffered cursor would first read (and discard)
+                # every remaining row; dropping the connection is cheaper.
+                conn.invalidate()
+            conn.close()
+        except Exception:
+            pass
+
+    def _fill(self, cursor: _Cursor, builder: PageBuilder) -> bool:
+        """
+        Move rows from the open cursor into `builder`; True when the result
+        is exhausted.
+        """
+        batch = self.settings["fetch_batch_rows"]
+        while True:
+            if not cursor.pending:
+                rows = cursor.result.fetchmany(batch)
+                if not rows:
+                    return True
+                cursor.pending.extend(rows)
+            if not builder.add(cursor.pending[0]):
+                return False
+            cursor.pending.popleft()
+
+    def _register(self, cursor: _Cursor) -> None:
+        with self._lock:
+            self._cursors[cursor.token] = cursor
+            self._cursors.move_to_end(cursor.token)
+            while len(self._cursors) > self.settings["max_tokens"]:
+                _, old = self._cursors.popitem(last=False)
+                self._close(old)
+            open_cursors = [c for c in self._cursors.values() if c.conn is not None]
+        # Over the cap: the least recently used cursors fall back to re-running.
+        for old in open_cursors[: max(0, len(open_cursors) - self.settings["max_open_cursors"])]:
+            if old.lock.acquire(blocking=False):
+                try:
+                    self._close(old)
+                finally:
+                    old.lock.release()
+        self._start_sweeper()
+
+    def _start_sweeper(self) -> None:
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, name="result-cursors", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self) -> None:
+        interval = max(1.0, self.settings["cursor_idle_seconds"] / 2)
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception:
+                pass
+
+    def sweep(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            cursors = list(self._cursors.values())
+        for cursor in cursors:
+            expired = now - cursor.created_at > self.settings["token_ttl_seconds"]
+            idle = cursor.conn is not None and (
+                now - cursor.last_used > self.settings["cursor_idle_seconds"]
+                or (cursor.deadline is not None and now >= cursor.deadline)
+            )
+            if not (expired or idle) or not cursor.lock.acquire(blocking=False):
+                continue
+            try:
+                self._close(cursor)
+            finally:
+                cursor.lock.release()
+            if expired:
+                with self._lock:
+                    self._cursors.pop(cursor.token, None)
+                self.expired += 1
+
+    # ------------------------------------------------------------------
+    def first_page(
+        self, scope: str, sql: str, conn, result, timeout: Optional[float] = None,
+    ) -> Tuple[ResultPage, bool]:
+        """
+        First page of an unbuffered `result` on `conn`. Takes ownership of
+        the connection: it is closed here, or kept under the returned
+        page's token. The flag is True when the page holds the whole result.
+        `timeout` is the query's MAX_EXECUTION_TIME, counted from now.
+        """
+        self.sweep()
+        cursor = _Cursor(secrets.token_urlsafe(16), scope, sql, list(result.keys()), conn=conn, result=result)
+        if timeout is not None:
+            cursor.deadline = time.monotonic() + timeout
+        builder = self.builder(cursor.columns)
+        try:
+            exhausted = self._fill(cursor, builder)
+        except Exception:
+            self._close(cursor)
+            raise
+        self.pages += 1
+        if exhausted:
+            self._close(cursor, exhausted=True)
+            return builder.page(), True
+        cursor.delivered = len(builder.rows)
+        if self.settings["max_open_cursors"] <= 0:
+            self._close(cursor)
+        self._register(cursor)
+        return builder.page(cursor.token), False
+
+    def detached_page(self, scope: str, sql: str, builder: PageBuilder, exhausted: bool) -> ResultPage:
+        """
+        Token for a first page read elsewhere (the async engine), without an
+        open cursor: the next page re-runs the query.
+        """
+        self.pages += 1
+        if exhausted:
+            return builder.page()
+        cursor = _Cursor(secrets.token_urlsafe(16), scope, sql, builder.columns, delivered=len(builder.rows))
+        self._register(cursor)
+        return builder.page(cursor.token)
+
+    def _reopen(self, cursor: _Cursor, engine: Engine) -> None:
+        timeout = self.settings["page_timeout_seconds"] or None
+        conn = engine.connect()
+        try:
+            result = conn.execution_options(stream_results=True).execute(
+                text(with_max_execution_time(cursor.sql, timeout))
+            )
+            skip = cursor.delivered
+            batch = self.settings["fetch_batch_rows"]
+            while skip > 0:
+                rows = result.fetchmany(min(batch, skip))
+                if not rows:
+                    break
+                skip -= len(rows)
+        except Exception:
+            conn.invalidate()
+            conn.close()
+            raise
+        cursor.conn, cursor.result = conn, result
+        cursor.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.reopened += 1
+
+    def next_page(self, token: str, scope: str, engine: Engine) -> Optional[ResultPage]:
+        """
+        The page after the last one served for `token`; None when the token
+        is unknown, expired, or was issued for another database scope.
+        """
+        self.sweep()
+        with self._lock:
+            cursor = self._cursors.get(token)
+            if cursor is not None:
+                self._cursors.move_to_end(token)
+        if cursor is None or cursor.scope != scope:
+            return None
+
+        with cursor.lock:
+            if cursor.conn is not None and cursor.deadline is not None and time.monotonic() >= cursor.deadline:
+                self._close(cursor)  # the server would abort it mid-page
+            if cursor.conn is None:
+                self._reopen(cursor, engine)
+            builder = self.builder(cursor.columns)
+            try:
+                exhausted = self._fill(cursor, builder)
+            except Exception:
+                self._close(cursor)
+                raise
+            cursor.delivered += len(builder.rows)
+            cursor.last_used = time.monotonic()
+            self.pages += 1
+            if exhausted:
+                self._close(cursor, exhausted=True)
+                with self._lock:
+                    self._cursors.pop(token, None)
+                return builder.page()
+        self._register(cursor)
+        return builder.page(token)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cursors = list(self._cursors.values())
+        return {
+            "tokens": len(cursors),
+            "open_cursors": sum(1 for c in cursors if c.conn is not None),
+            "pages": self.pages,
+            "reopened": self.reopened,
+            "expired": self.expired,
+            "max_response_kb": self.settings["max_response_kb"],
+            "max_page_rows": self.settings["max_page_rows"],
+        }
+
+
+@lazy_singleton
+def get_result_cursors() -> ResultCursors:
+    return ResultCursors()
@@ -1,12 +1,43 @@
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Iterable, Optional
+from app.rag.chunker import hit_rows
 from app.rag.embedder import Embedder
+from app.rag.metrics import timed
 from app.rag.vector_store import vector_store
 
 
+def _with_rows(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # A chunk may pack several table rows; "rows" maps the hit back to each.
+    return [{**hit, "rows": hit_rows(hit)} for hit in hits]
+
+
 class Retriever:
     def __init__(self, embedder: Embedder):
         self.embedder = embedder
 
-    def retrieve(self, session_id: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def search(
+        session_id: str, q_emb: List[float], k: int = 5, tables: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Vector search for an already embedded query. `tables` limits the
+        scan to those tables' chunks; None searches every table.
+        """
+        if tables is None:
+            return _with_rows(vector_store.search(session_id, q_emb, k))
+        return _with_rows(vector_store.search(session_id, q_emb, k, tables=list(tables)))
+
+    @timed("retrieve")
+    def retrieve(
+        self, session_id: str, query: str, k: int = 5, tables: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
         q_emb = self.embedder.embed_query(query)
-        return vector_store.search(session_id, q_emb, k)
+        return self.search(session_id, q_emb, k, tables)
+
+    @timed("retrieve")
+    async def aretrieve(
+        self, session_id: str, query: str, k: int = 5, tables: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        q_emb = await self.embedder.aembed_query(query)
+        # The scan is short and NumPy releases the GIL; keep it off the event loop.
+        return await asyncio.to_thread(self.search, session_id, q_emb, k, tables)
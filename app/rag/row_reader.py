@@ -0,0 +1,98 @@
+# app/rag/row_reader.py
+from __future__ import annotations
+
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+def quote_ident(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def iter_rows(
+    engine: Engine,
+    table: str,
+    columns: Sequence[str],
+    key_columns: Sequence[str],
+    page_size: int = 1000,
+    max_rows: Optional[int] = None,
+    where: Optional[str] = None,
+    where_params: Optional[Dict[str, Any]] = None,
+    read_gate: Optional[ContextManager[Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream `columns` (plus the key) of `table` without materializing it.
+
+    Keyset pages (`WHERE (pk) > (:last) ORDER BY pk LIMIT :n`) with a
+    primary key, LIMIT/OFFSET pages without one. `where` is an extra
+    predicate ANDed onto every page; `read_gate` is held around each
+    round-trip to cap concurrent connections.
+    """
+    wanted = list(dict.fromkeys([*key_columns, *columns]))
+    select_list = ", ".join(quote_ident(c) for c in wanted)
+    remaining = max_rows
+    base_params: Dict[str, Any] = dict(where_params or {})
+    gate = read_gate if read_gate is not None else nullcontext()
+
+    if not key_columns:
+        # No key to resume from: OFFSET pages. Each page re-skips the rows
+        # before it, but the connection and the read gate are released
+        # between pages like below. InnoDB scans a keyless table in the
+        # order of its hidden row id, so pages don't overlap.
+        sql = f"SELECT {select_list} FROM {quote_ident(table)}"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " LIMIT :limit OFFSET :offset"
+        offset = 0
+        while remaining is None or remaining > 0:
+            limit = page_size if remaining is None else min(page_size, remaining)
+            with gate, engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=page_size).execute(
+                    text(sql), {**base_params, "limit": limit, "offset": offset}
+                )
+                page = [dict(row._mapping) for row in result]
+            yield from page
+            offset += len(page)
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < limit:
+                break
+        return
+
+    order_by = ", ".join(quote_ident(c) for c in key_columns)
+    key_tuple = f"({order_by})"
+    bind_tuple = "(" + ", ".join(f":k{i}" for i in range(len(key_columns))) + ")"
+    last_key: Optional[List[Any]] = None
+
+    while remaining is None or remaining > 0:
+        limit = page_size if remaining is None else min(page_size, remaining)
+        params = {**base_params, "limit": limit}
+        predicates = [f"({where})"] if where else []
+        if last_key is not None:
+            predicates.append(f"{key_tuple} > {bind_tuple}")
+            params.update({f"k{i}": v for i, v in enumerate(last_key)})
+        where_sql = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+        # Hold the connection (and the read gate) only while the page is
+        # fetched, not while the caller chunks and embeds it.
+        with gate, engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=page_size).execute(
+                text(
+                    f"SELECT {select_list} FROM {quote_ident(table)}{where_sql} "
+                    f"ORDER BY {order_by} LIMIT :limit"
+                ),
+                params,
+            )
+            page = [dict(row._mapping) for row in result]
+
+        if page:
+            last_key = [page[-1][c] for c in key_columns]
+        yield from page
+
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < limit:
+            break
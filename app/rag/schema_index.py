@@ -0,0 +1,211 @@
+# app/rag/schema_index.py
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.rag.utils.config_loader import load_config
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for identifier-heavy English; good enough for a budget.
+    return len(text) // 4 + 1
+
+
+def schema_line(table: str, cols: List[Dict[str, Any]]) -> str:
+    cols_formatted = ", ".join(f"{c['name']} ({c['type']})" for c in cols)
+    return f"TABLE {table}: {cols_formatted}"
+
+
+def foreign_key_lines(table: str, foreign_keys: Dict[str, List[Dict[str, str]]], tables: Set[str]) -> List[str]:
+    return [
+        f"FK {table}.{fk['column']} -> {fk['ref_table']}.{fk['ref_column']}"
+        for fk in foreign_keys.get(table, [])
+        if fk["ref_table"] in tables
+    ]
+
+
+def table_description(table: str, cols: List[Dict[str, Any]], fks: List[Dict[str, str]]) -> str:
+    """
+    Text embedded for one table: names with underscores spelled out so
+    `cust_order_items` can match a question about "customer order items".
+    """
+    words = lambda s: s.replace("_", " ")  # noqa: E731
+    parts = [f"table {words(table)}", "columns: " + ", ".join(words(c["name"]) for c in cols)]
+    if fks:
+        parts.append("references: " + ", ".join(words(fk["ref_table"]) for fk in fks))
+    return "; ".join(parts)
+
+
+def schema_pruning_settings() -> Dict[str, Any]:
+    conf = load_config().get("schema_pruning", {}) or {}
+    return {
+        "enabled": bool(conf.get("enabled", True)),
+        "top_k": int(conf.get("top_k", 8)),
+        "fk_hops": int(conf.get("fk_hops", 1)),
+        "prompt_token_budget": int(conf.get("prompt_token_budget", 3000)),
+    }
+
+
+class SchemaIndex:
+    """
+    Table-description embeddings for one session, built once at /api/connect.
+
+    `select` ranks tables against the question embedding, adds the tables
+    reachable through foreign keys (either direction, `fk_hops` deep) so
+    the model can write the joins, and keeps as many as fit the token budget.
+    Schemas whose full prompt already fits the budget are never pruned.
+    """
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        foreign_keys: Dict[str, List[Dict[str, str]]],
+        tables: List[str],
+        matrix: np.ndarray,
+        top_k: int = 8,
+        fk_hops: int = 1,
+        budget_tokens: int = 3000,
+    ):
+        self.tables = tables
+        self.matrix = matrix
+        self.foreign_keys = foreign_keys
+        self.top_k = top_k
+        self.fk_hops = fk_hops
+        self.budget_tokens = budget_tokens
+
+        self._lines = {t: schema_line(t, schema[t]) for t in tables}
+        self._tokens = {t: estimate_tokens(line) for t, line in self._lines.items()}
+        self.full_tokens = sum(self._tokens.values())
+
+        self._neighbors: Dict[str, Set[str]] = {t: set() for t in tables}
+        for table, fks in foreign_keys.items():
+            for fk in fks:
+                if table in self._neighbors and fk["ref_table"] in self._neighbors and fk["ref_table"] != table:
+                    self._neighbors[table].add(fk["ref_table"])
+                    self._neighbors[fk["ref_table"]].add(table)
+
+    @property
+    def prunes(self) -> bool:
+        return self.full_tokens > self.budget_tokens
+
+    def select(self, question_embedding: List[float]) -> List[str]:
+        q = np.asarray(question_embedding, dtype=np.float32)
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0 or q.shape[0] != self.matrix.shape[1]:
+            return list(self.tables)
+        scores = self.matrix @ (q / q_norm)
+        score = dict(zip(self.tables, scores.tolist()))
+        seeds = [self.tables[i] for i in np.argsort(-scores)[: self.top_k]]
+
+        # Each seed is followed by its join partners (best-scoring first), so
+        # the budget cuts low-ranked seeds before it cuts a needed join table.
+        ordered: List[str] = []
+        seen: Set[str] = set()
+        for seed in seeds:
+            frontier = [seed]
+            for hop in range(self.fk_hops + 1):
+                nxt: List[str] = []
+                for table in sorted(frontier, key=lambda t: -score[t]):
+                    if table not in seen:
+                        seen.add(table)
+                        ordered.append(table)
+                    if hop < self.fk_hops:
+                        nxt.extend(n for n in self._neighbors[table] if n not in seen)
+                frontier = nxt
+
+        picked: List[str] = []
+        used = 0
+        for table in ordered:
+            cost = self._tokens[table]
+            if picked and used + cost > self.budget_tokens:
+                continue
+            picked.append(table)
+            used += cost
+        return picked
+
+    def prompt_for(self, tables: List[str]) -> str:
+        keep = set(tables)
+        lines = [self._lines[t] for t in tables]
+        for t in tables:
+            lines.extend(foreign_key_lines(t, self.foreign_keys, keep))
+        return "\n".join(lines)
+
+
+def build_schema_index(
+    embedder,
+    schema: Dict[str, Any],
+    foreign_keys: Optional[Dict[str, List[Dict[str, str]]]] = None,
+) -> Optional[SchemaIndex]:
+    """
+    Embed one description per table (through the embedding cache, so a
+    reconnect to the same database costs nothing). Returns None when pruning
+    is disabled or the whole schema already fits the prompt budget.
+    """
+    settings = schema_pruning_settings()
+    if not settings["enabled"] or not schema:
+        return None
+    tables = list(schema.keys())
+    full_tokens = sum(estimate_tokens(schema_line(t, schema[t])) for t in tables)
+    if full_tokens <= settings["prompt_token_budget"]:
+        return None
+    foreign_keys = foreign_keys or {}
+    texts = [table_description(t, schema[t], foreign_keys.get(t, [])) for t in tables]
+
+    matrix = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    return SchemaIndex(
+        schema,
+        foreign_keys,
+        tables,
+        matrix,
+        top_k=settings["top_k"],
+        fk_hops=settings["fk_hops"],
+        budget_tokens=settings["prompt_token_budget"],
+    )
+
+
+class PromptStats:
+    """
+    Running totals for SQL-generation prompts: estimated prompt tokens vs.
+    the full-schema prompt, time spent picking tables and in the LLM call.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.pruned = 0
+        self.prompt_tokens = 0
+        self.full_schema_tokens = 0
+        self.select_seconds = 0.0
+        self.llm_seconds = 0.0
+
+    def record_prompt(self, prompt_tokens: int, full_schema_tokens: int, pruned: bool, select_seconds: float) -> None:
+        with self._lock:
+            self.prompts += 1
+            self.pruned += int(pruned)
+            self.prompt_tokens += prompt_tokens
+            self.full_schema_tokens += full_schema_tokens
+            self.select_seconds += select_seconds
+
+    def record_llm(self, seconds: float) -> None:
+        with self._lock:
+            self.llm_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        n = max(1, self.prompts)
+        return {
+            "prompts": self.prompts,
+            "pruned": self.pruned,
+            "avg_prompt_tokens": round(self.prompt_tokens / n, 1),
+            "avg_full_schema_tokens": round(self.full_schema_tokens / n, 1),
+            "avg_select_ms": round(1000 * self.select_seconds / n, 2),
+            "avg_llm_ms": round(1000 * self.llm_seconds / n, 1),
+        }
+
+
+prompt_stats = PromptStats()
@@ -1,11 +1,28 @@
 # app/rag/sql_agent.py
-from typing import Dict, Any, List, Tuple
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from sqlalchemy import text
 from fastapi import HTTPException
 
 from app.rag.groq_client import GroqLLM
+from app.rag.metrics import timed
+from app.rag.result_cache import (
+    atable_versions,
+    get_result_cache,
+    referenced_tables,
+    table_versions,
+)
+from app.rag.result_pages import ResultPage, get_result_cursors, with_max_execution_time
+from app.rag.schema_index import SchemaIndex, estimate_tokens, prompt_stats, schema_line
+from app.rag.sql_cache import SemanticSQLCache, get_sql_cache, schema_fingerprint
+
+if TYPE_CHECKING:  # sqlalchemy.ext.asyncio needs greenlet, an optional extra
+    from sqlalchemy.ext.asyncio import AsyncEngine
 
-# Initialize only once
+# Initialize only once; the Groq SDK clients are created on first use.
 _sql_llm = GroqLLM(model_name="llama-3.1-8b-instant")
 
 
@@ -13,17 +30,35 @@ def build_schema_prompt(schema: Dict[str, Any]) -> str:
     """
     Convert schema into readable form for SQL generation.
     """
-    lines = []
-    for table, cols in schema.items():
-        cols_formatted = ", ".join(f"{c['name']} ({c['type']})" for c in cols)
-        lines.append(f"TABLE {table}: {cols_formatted}")
-    return "\n".join(lines)
+    return "\n".join(schema_line(table, cols) for table, cols in schema.items())
 
 
-def generate_sql_with_groq(question: str, schema: Dict[str, Any]) -> str:
-    schema_text = build_schema_prompt(schema)
+def schema_prompt_for(
+    schema: Dict[str, Any],
+    schema_index: Optional[SchemaIndex] = None,
+    q_emb: Optional[List[float]] = None,
+) -> str:
+    """
+    Schema section of the SQL prompt: only the question's relevant tables
+    (and their FK join partners) when the session has a schema index and
+    the full schema is over the token budget, otherwise every table.
+    """
+    started = time.perf_counter()
+    if schema_index is not None and schema_index.prunes and q_emb is not None:
+        schema_text = schema_index.prompt_for(schema_index.select(q_emb))
+        full_tokens, pruned = schema_index.full_tokens, True
+    else:
+        schema_text = build_schema_prompt(schema)
+        full_tokens, pruned = estimate_tokens(schema_text), False
+    prompt_stats.record_prompt(estimate_tokens(schema_text), full_tokens, pruned, time.perf_counter() - started)
+    return schema_text
 
-    prompt = f"""
+
+def build_sql_prompt(question: str, schema: Dict[str, Any], schema_text: Optional[str] = None) -> str:
+    if schema_text is None:
+        schema_text = build_schema_prompt(schema)
+
+    return f"""
 You are an expert MySQL SQL generator.
 
 Use only the tables and columns listed below:
@@ -41,7 +76,32 @@ Rules:
 - ALWAYS include LIMIT 50 unless told otherwise.
 """
 
-    sql = _sql_llm.generate(prompt)
+
+@timed("llm")
+def generate_sql_with_groq(
+    question: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    schema_text: Optional[str] = None,
+) -> str:
+    prompt = build_sql_prompt(question, schema, schema_text)
+    started = time.perf_counter()
+    sql = _sql_llm.generate(prompt, timeout=timeout)
+    prompt_stats.record_llm(time.perf_counter() - started)
+    return sql.strip()
+
+
+@timed("llm")
+async def agenerate_sql_with_groq(
+    question: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    schema_text: Optional[str] = None,
+) -> str:
+    prompt = build_sql_prompt(question, schema, schema_text)
+    started = time.perf_counter()
+    sql = await _sql_llm.agenerate(prompt, timeout=timeout)
+    prompt_stats.record_llm(time.perf_counter() - started)
     return sql.strip()
 
 
@@ -62,26 +122,289 @@ def validate_sql(sql: str) -> str:
     return sql
 
 
-def run_sql(engine, sql: str) -> List[Dict[str, Any]]:
+def _stream(conn):
+    # Unbuffered (server-side) cursor: rows are read as the page is filled,
+    # never the whole result at once.
+    return conn.execution_options(stream_results=True)
+
+
+def run_sql(engine, sql: str, timeout: Optional[float] = None) -> ResultPage:
+    return run_sql_cached(engine, sql, {}, timeout=timeout, use_cache=False)
+
+
+def _result_scope(engine) -> str:
+    # Server + user + database: the same SQL on another server (or with other
+    # privileges) must not share cached rows. The driver is left out so the
+    # sync (pymysql) and async (aiomysql) engines of a session share result
+    # cache entries and page tokens.
+    url = engine.url
+    return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=True)
+
+
+@timed("sql_execute")
+def run_sql_cached(
+    engine,
+    sql: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+) -> ResultPage:
+    """
+    First page of the query's result (see ResultCursors), through the query
+    result cache: the version tokens of the tables the query reads are
+    probed on the same connection first, and MySQL is only queried when they
+    changed (or the entry expired). Only results that fit one page are cached.
+    """
+    cache = get_result_cache() if use_cache else None
+    cursors = get_result_cursors()
     sql = validate_sql(sql)
-    
-    with engine.connect() as conn:
-        result = conn.execute(text(sql))
-        return [dict(r._mapping) for r in result]
+    scope = _result_scope(engine)
+
+    conn = engine.connect()
+    try:
+        versions = None
+        if cache is not None:
+            try:
+                versions = table_versions(conn, engine.url.database, referenced_tables(sql, schema.keys()), cache.mode)
+            except Exception:
+                versions = None  # cannot validate (e.g. no privilege): don't cache
+            hit = cache.get(scope, sql, versions) if versions is not None else None
+            if hit is not None:
+                conn.close()
+                return ResultPage(hit.columns, hit.rows, hit.nbytes)
+        result = _stream(conn).execute(text(with_max_execution_time(sql, timeout)))
+    except BaseException:
+        conn.close()
+        raise
+
+    page, complete = cursors.first_page(scope, sql, conn, result, timeout)  # owns conn from here
+    if complete and versions is not None:
+        cache.put(scope, sql, versions, page.columns, page.rows)
+    return page
+
+
+@timed("sql_page")
+def next_result_page(engine, token: str) -> Optional[ResultPage]:
+    return get_result_cursors().next_page(token, _result_scope(engine), engine)
+
+
+def summarize_rows(page: ResultPage) -> str:
+    if page.rows:
+        count = f"{len(page.rows)}+" if page.truncated else str(len(page.rows))
+        return f"Found {count} rows. Showing first row: {page.first_record()}"
+    return "Query ran successfully but returned no rows."
+
+
+def _wants_semantic(cache: Optional[SemanticSQLCache]) -> bool:
+    return cache is not None and cache.semantic
+
+
+def _wants_pruning(schema_index: Optional[SchemaIndex]) -> bool:
+    return schema_index is not None and schema_index.prunes
+
+
+def _similar_cached_sql(
+    cache: SemanticSQLCache,
+    scope: str,
+    question: str,
+    q_emb: Optional[List[float]],
+) -> Optional[str]:
+    if q_emb is None:
+        return None
+    hit = cache.get_similar(scope, question, q_emb)
+    return hit[0] if hit else None
+
+
+@dataclass
+class SqlDraft:
+    """
+    SQL for a question, before it has been executed: where it came from and
+    what `remember_sql` needs to cache it once it ran successfully.
+    """
+    question: str
+    sql: str
+    from_cache: bool
+    scope: str = ""
+    q_emb: Optional[List[float]] = None
+
+
+def _cached_draft(question: str, schema: Dict[str, Any]) -> Tuple[Optional[SemanticSQLCache], str, Optional[str]]:
+    cache = get_sql_cache()
+    scope = schema_fingerprint(schema) if cache is not None else ""
+    sql = cache.get_exact(scope, question) if cache is not None else None
+    return cache, scope, sql
+
+
+@timed("sql_generate")
+def generate_sql_draft(
+    question: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    embed: Optional[Callable[[str], List[float]]] = None,
+    schema_index: Optional[SchemaIndex] = None,
+) -> SqlDraft:
+    """
+    Generated SQL is served from the semantic SQL cache when the same (or,
+    given `embed` and the semantic tier, a near-identical) question was
+    answered before against the same schema. The same question embedding drives schema pruning via
+    `schema_index`.
+    """
+    cache, scope, sql = _cached_draft(question, schema)
+    q_emb = None
+    if sql is None and embed is not None and (_wants_semantic(cache) or _wants_pruning(schema_index)):
+        try:
+            q_emb = embed(question)
+        except Exception:
+            q_emb = None  # cache and pruning are optimisations; fall through to the LLM
+        if cache is not None:
+            sql = _similar_cached_sql(cache, scope, question, q_emb)
+
+    if sql is not None:
+        return SqlDraft(question, sql, True, scope, q_emb)
+    if cache is not None:
+        cache.record_miss()
+    schema_text = schema_prompt_for(schema, schema_index, q_emb)
+    sql = generate_sql_with_groq(question, schema, timeout=timeout, schema_text=schema_text)
+    return SqlDraft(question, sql, False, scope, q_emb)
+
+
+@timed("sql_generate")
+async def agenerate_sql_draft(
+    question: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    aembed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+    schema_index: Optional[SchemaIndex] = None,
+) -> SqlDraft:
+    cache, scope, sql = _cached_draft(question, schema)
+    q_emb = None
+    if sql is None and aembed is not None and (_wants_semantic(cache) or _wants_pruning(schema_index)):
+        try:
+            q_emb = await aembed(question)
+        except Exception:
+            q_emb = None
+        if cache is not None:
+            sql = _similar_cached_sql(cache, scope, question, q_emb)
+
+    if sql is not None:
+        return SqlDraft(question, sql, True, scope, q_emb)
+    if cache is not None:
+        cache.record_miss()
+    schema_text = schema_prompt_for(schema, schema_index, q_emb)
+    sql = await agenerate_sql_with_groq(question, schema, timeout=timeout, schema_text=schema_text)
+    return SqlDraft(question, sql, False, scope, q_emb)
+
+
+def remember_sql(draft: SqlDraft) -> None:
+    """
+    Cache freshly generated SQL; call only after it executed successfully.
+    """
+    cache = get_sql_cache()
+    if cache is not None and not draft.from_cache:
+        cache.put(draft.scope, draft.question, draft.sql, draft.q_emb)
+
 
+def remaining_budget(deadline: Optional[float]) -> Optional[float]:
+    return max(0.001, deadline - time.monotonic()) if deadline is not None else None
 
+
+@timed("sql_path")
 def answer_question_with_sql(
     question: str,
     engine,
     schema: Dict[str, Any],
-) -> Tuple[str, str, List[Dict[str, Any]]]:
+    timeout: Optional[float] = None,
+    embed: Optional[Callable[[str], List[float]]] = None,
+    schema_index: Optional[SchemaIndex] = None,
+    on_draft: Optional[Callable[[SqlDraft], None]] = None,
+) -> Tuple[str, str, ResultPage]:
+    """
+    `timeout` is the budget for the whole path; it bounds the LLM request
+    and whatever is left of it bounds the MySQL query. `on_draft` is called
+    with the SQL draft before it runs (the orchestrator scopes semantic
+    search to the tables it reads).
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
 
-    sql = generate_sql_with_groq(question, schema)
-    rows = run_sql(engine, sql)
+    draft = generate_sql_draft(question, schema, timeout=timeout, embed=embed, schema_index=schema_index)
+    if on_draft is not None:
+        on_draft(draft)
+    page = run_sql_cached(engine, draft.sql, schema, timeout=remaining_budget(deadline))
+    remember_sql(draft)
+    return summarize_rows(page), draft.sql, page
 
-    if rows:
-        answer = f"Found {len(rows)} rows. Showing first row: {rows[0]}"
-    else:
-        answer = "Query ran successfully but returned no rows."
 
-    return answer, sql, rows
+async def arun_sql(async_engine: AsyncEngine, sql: str, timeout: Optional[float] = None) -> ResultPage:
+    return await arun_sql_cached(async_engine, sql, {}, timeout=timeout, use_cache=False)
+
+
+@timed("sql_execute")
+async def arun_sql_cached(
+    async_engine: AsyncEngine,
+    sql: str,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+) -> ResultPage:
+    """
+    Async twin of `run_sql_cached`. The async cursor is not kept between
+    pages: the page token re-runs the query on the sync engine.
+    """
+    cache = get_result_cache() if use_cache else None
+    cursors = get_result_cursors()
+    sql = validate_sql(sql)
+    scope = _result_scope(async_engine)
+
+    async with async_engine.connect() as conn:
+        versions = None
+        if cache is not None:
+            try:
+                versions = await atable_versions(
+                    conn, async_engine.url.database, referenced_tables(sql, schema.keys()), cache.mode
+                )
+            except Exception:
+                versions = None
+            hit = cache.get(scope, sql, versions) if versions is not None else None
+            if hit is not None:
+                return ResultPage(hit.columns, hit.rows, hit.nbytes)
+
+        result = await _stream(conn).stream(text(with_max_execution_time(sql, timeout)))
+        builder = cursors.builder(list(result.keys()))
+        batch = cursors.settings["fetch_batch_rows"]
+        full = False
+        while not full:
+            rows = await result.fetchmany(batch)
+            if not rows:
+                break
+            full = not all(builder.add(row) for row in rows)  # stops at the first row that doesn't fit
+        complete = not full
+        if full:
+            await conn.invalidate()  # don't drain the rest of an unbuffered result
+
+    page = cursors.detached_page(scope, sql, builder, complete)
+    if complete and versions is not None:
+        cache.put(scope, sql, versions, page.columns, page.rows)
+    return page
+
+
+@timed("sql_path")
+async def aanswer_question_with_sql(
+    question: str,
+    async_engine: AsyncEngine,
+    schema: Dict[str, Any],
+    timeout: Optional[float] = None,
+    aembed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+    schema_index: Optional[SchemaIndex] = None,
+    on_draft: Optional[Callable[[SqlDraft], None]] = None,
+) -> Tuple[str, str, ResultPage]:
+    """
+    Async twin of `answer_question_with_sql` for an `AsyncEngine`.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    draft = await agenerate_sql_draft(question, schema, timeout=timeout, aembed=aembed, schema_index=schema_index)
+    if on_draft is not None:
+        on_draft(draft)
+    page = await arun_sql_cached(async_engine, draft.sql, schema, timeout=remaining_budget(deadline))
+    remember_sql(draft)
+    return summarize_rows(page), draft.sql, page
@@ -0,0 +1,191 @@
+# app/rag/sql_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+
+
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """
+    Stable hash of a session schema: two sessions on the same database
+    layout share cached SQL, and any DDL change starts a fresh scope.
+    """
+    canonical = json.dumps(schema, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip(" ?.!")
+
+
+_LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:\.\d+)?")
+
+
+def question_literals(question: str) -> Tuple[str, ...]:
+    """
+    Numbers and quoted strings in a question, in order: "top 5 ..." and
+    "top 10 ..." embed almost identically but must not share SQL.
+    """
+    return tuple(_LITERAL_RE.findall(normalize_question(question)))
+
+
+@dataclass
+class _Entry:
+    sql: str
+    vec: Optional[np.ndarray]  # unit-norm question embedding
+    created_at: float
+    literals: Tuple[str, ...] = ()
+
+
+class SemanticSQLCache:
+    """
+    Question -> generated SQL, scoped by `schema_fingerprint`.
+
+    Two tiers share one LRU:
+    - exact: the normalized question text;
+    - semantic (opt-in, `semantic=True`): nearest cached question embedding
+      in the same schema scope, accepted when its cosine similarity is
+      >= `similarity_threshold` and both questions hold the same literals.
+    Entries expire after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 2000,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.97,
+        semantic: bool = False,
+    ):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic
+        self._lru: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # schema hash -> (keys, stacked unit vectors), rebuilt lazily after writes
+        self._matrices: Dict[str, Tuple[List[Tuple[str, str]], np.ndarray]] = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        del self._lru[key]
+        self._matrices.pop(key[0], None)
+
+    def _matrix(self, scope: str) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        cached = self._matrices.get(scope)
+        if cached is None:
+            keys = [k for k, e in self._lru.items() if k[0] == scope and e.vec is not None]
+            mat = np.stack([self._lru[k].vec for k in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+            cached = self._matrices[scope] = (keys, mat)
+        return cached
+
+    def get_exact(self, scope: str, question: str) -> Optional[str]:
+        key = (scope, normalize_question(question))
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and self._expired(entry, time.monotonic()):
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                return None
+            self._lru.move_to_end(key)
+            self.exact_hits += 1
+            return entry.sql
+
+    def get_similar(self, scope: str, question: str, question_embedding: List[float]) -> Optional[Tuple[str, float]]:
+        if not self.semantic:
+            return None
+        literals = question_literals(question)
+        q = np.asarray(question_embedding, dtype=np.float32)
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0:
+            return None
+        q = q / q_norm
+
+        with self._lock:
+            keys, mat = self._matrix(scope)
+            if not keys or mat.shape[1] != q.shape[0]:
+                return None
+            scores = mat @ q
+            now = time.monotonic()
+            for i in np.argsort(-scores):
+                if scores[i] < self.similarity_threshold:
+                    break
+                entry = self._lru.get(keys[i])
+                if entry is None or self._expired(entry, now) or entry.literals != literals:
+                    continue
+                self._lru.move_to_end(keys[i])
+                self.semantic_hits += 1
+                return entry.sql, float(scores[i])
+        return None
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, scope: str, question: str, sql: str, question_embedding: Optional[List[float]] = None) -> None:
+        vec = None
+        if self.semantic and question_embedding is not None:
+            vec = np.asarray(question_embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(vec))
+            vec = vec / norm if norm > 0 else None
+
+        key = (scope, normalize_question(question))
+        with self._lock:
+            if key in self._lru:
+                self._drop(key)
+            self._lru[key] = _Entry(sql=sql, vec=vec, created_at=time.monotonic(), literals=question_literals(question))
+            self._matrices.pop(scope, None)
+            while len(self._lru) > self.max_items:
+                old, _ = self._lru.popitem(last=False)
+                self._matrices.pop(old[0], None)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "items": len(self._lru),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+@lazy_singleton
+def get_sql_cache() -> Optional[SemanticSQLCache]:
+    """
+    Process-wide SQL cache. Returns None when `sql_cache.enabled` is false.
+    """
+    conf = load_config().get("sql_cache", {}) or {}
+    if not conf.get("enabled", True):
+        return None
+    return SemanticSQLCache(
+        max_items=int(conf.get("max_items", 2000)),
+        ttl_seconds=float(conf.get("ttl_seconds", 3600)),
+        similarity_threshold=float(conf.get("similarity_threshold", 0.97)),
+        semantic=bool(conf.get("semantic", False)),
+    )
@@ -8,11 +8,9 @@ from app.rag.logger.custom_logger import CustomLogger
 from app.rag.utils.config_loader import load_config
 from app.rag.exception.custom_exception import ProductAssistantException
 
-
 # --- External dependencies ---
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
+# The langchain provider packages take ~1.5s to import together, so each is
+# imported inside the loader method that needs it, not at module import.
 
 # -----------------------------------------------------------------------------
 # SETUP
@@ -41,6 +39,19 @@ class ApiKeyManager:
         return self.api_keys.get(key)
 
 
+def embedding_model_id(config) -> str:
+    """
+    Name of the configured embedding model, prefixed with the backend when
+    it is not the Google API, so cached vectors of different models never mix.
+    """
+    emb_conf = config.get("embedding_model", {}) or {}
+    if emb_conf.get("backend", "google") == "local":
+        from app.rag.local_embeddings import local_embedding_settings
+
+        return "local:" + local_embedding_settings()["model_name"]
+    return emb_conf.get("model_name", "")
+
+
 # -----------------------------------------------------------------------------
 # MODEL LOADER
 # -----------------------------------------------------------------------------
@@ -58,6 +69,13 @@ class ModelLoader:
     def load_embeddings(self):
         try:
             emb_conf = self.config.get("embedding_model", {})
+            if emb_conf.get("backend", "google") == "local":
+                from app.rag.local_embeddings import LocalEmbeddings, local_embedding_settings
+
+                settings = local_embedding_settings()
+                log.info(f"Loading local Embedding Model: {settings['model_name']} on {settings['device']}")
+                return LocalEmbeddings(settings)
+
             model_name = emb_conf.get("model_name")
 
             if not model_name:
@@ -74,6 +92,8 @@ class ModelLoader:
             if not google_key:
                 raise ProductAssistantException("GOOGLE_API_KEY not found", sys)
 
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
             return GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=google_key)
 
         except Exception as e:
@@ -93,6 +113,8 @@ class ModelLoader:
             if not openai_key:
                 raise ProductAssistantException("OPENAI_API_KEY not found", sys)
 
+            from langchain_openai import ChatOpenAI
+
             return ChatOpenAI(model=model_name, api_key=openai_key, temperature=temperature)
 
         except Exception as e:
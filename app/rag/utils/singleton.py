@@ -0,0 +1,26 @@
+# app/rag/utils/singleton.py
+import functools
+import threading
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def lazy_singleton(factory: Callable[[], Optional[T]]) -> Callable[[], Optional[T]]:
+    """
+    Turn `factory` into a process-wide getter: it runs on the first call,
+    once, under a lock. A None result (feature disabled) is not kept.
+    """
+    lock = threading.Lock()
+    instance: Optional[T] = None
+
+    @functools.wraps(factory)
+    def get() -> Optional[T]:
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+
+    return get
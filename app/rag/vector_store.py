@@ -1,27 +1,555 @@
 # app/rag/vector_store.py
-from typing import Dict, Any, List
-import math
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import json
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from app.rag.ann_index import IVFIndex, ann_settings
+from app.rag.metrics import timed
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Rows scored per block when the matrix is not float32, so a query never
+# materializes a float32 copy of the whole matrix.
+_SCORE_BLOCK = 2048
+
+
+def storage_settings(conf: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    conf = dict(conf or {})
+    quantization = str(conf.get("quantization", "int8")).lower()
+    if quantization not in _DTYPES:
+        raise ValueError(f"vector_store.quantization must be one of {sorted(_DTYPES)}, got {quantization!r}")
+    return {
+        "quantization": quantization,
+        "rescore": bool(conf.get("rescore", True)),
+        "rescore_candidates": max(1, int(conf.get("rescore_candidates", 4))),
+        "spill_path": conf.get("spill_path") or "",
+    }
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> np.ndarray:
+    """
+    float32 `vectors` in the storage dtype. int8 scales each row by its own
+    max |x|; cosine similarity ignores a row's scale, so none is kept.
+    """
+    if quantization == "int8":
+        peak = np.abs(vectors).max(axis=1, keepdims=True)
+        scale = np.divide(127.0, peak, out=np.zeros_like(peak), where=peak > 0)
+        return np.rint(vectors * scale).astype(np.int8)
+    return vectors.astype(_DTYPES[quantization], copy=False)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first (argpartition + sort of k).
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k < n:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(n)
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def cosine_scores(matrix: np.ndarray, norms: np.ndarray, q: np.ndarray, q_norm: float) -> np.ndarray:
+    if matrix.dtype == np.float32:
+        dots = matrix @ q
+    else:
+        dots = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], _SCORE_BLOCK):
+            dots[start:start + _SCORE_BLOCK] = matrix[start:start + _SCORE_BLOCK].astype(np.float32) @ q
+    denom = norms * q_norm
+    return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Spill:
+    """
+    float32 copies of a quantized session's vectors in an append-only
+    scratch file, read back only for the candidates being rescored.
+    `view` maps the rows written so far; a compaction writes a new file.
+    """
+
+    def __init__(self, directory: str, dim: int):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="vectors-", suffix=".f32", dir=directory or None)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+        self.dim = dim
+        self.count = 0
+        self.view = np.empty((0, dim), dtype=np.float32)
+
+    def append(self, vectors: np.ndarray) -> None:
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.count += vectors.shape[0]
+        self.view = np.memmap(self.path, np.float32, "r", shape=(self.count, self.dim))
+
+    def copy_rows(self, keep: np.ndarray) -> "_Spill":
+        directory = os.path.dirname(self.path)
+        spill = _Spill(directory, self.dim)
+        for start in range(0, len(keep), _SCORE_BLOCK):
+            spill.append(np.asarray(self.view[keep[start:start + _SCORE_BLOCK]]))
+        return spill
+
+    def close(self) -> None:
+        # Open views keep the unlinked file readable for in-flight searches.
+        self._finalizer()
+
+
+# Metadata keys shared by every chunk of a table; stored once per session.
+_SHARED_KEYS = ("table", "columns")
+
+
+def _frozen(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _decode_metadata(shared: List[Dict[str, Any]], meta_ids: np.ndarray, blobs: List[bytes], i: int) -> Dict[str, Any]:
+    meta = {k: list(v) if isinstance(v, list) else v for k, v in shared[meta_ids[i]].items()}
+    if blobs[i]:
+        meta.update(json.loads(blobs[i]))
+    return meta
+
+
+class _Partition:
+    """
+    Columnar store for one table's chunks in one session.
+
+    Vectors sit in one growable matrix (float32, float16 or int8) with
+    precomputed norms; `spill` keeps float32 originals for rescoring.
+    `table` / `columns` metadata is interned, the rest stored as JSON per
+    row. Deletes clear `alive` and the matrix is compacted later.
+    """
+
+    # Small: a session has one partition per indexed table.
+    _INITIAL_CAPACITY = 64
+    _COMPACT_MIN_DEAD = 1024
+    # Heap cost of one row's Python objects besides their payload bytes:
+    # the text str and metadata bytes headers plus two list slots.
+    _ROW_OVERHEAD_BYTES = 100
+
+    def __init__(self, dim: int, quantization: str = "float32", spill_path: Optional[str] = None):
+        self.dim = dim
+        self.quantization = quantization
+        self.size = 0
+        self.dead = 0
+        self.matrix = np.empty((self._INITIAL_CAPACITY, dim), dtype=_DTYPES[quantization])
+        self.norms = np.empty(self._INITIAL_CAPACITY, dtype=np.float32)
+        self.alive = np.zeros(self._INITIAL_CAPACITY, dtype=bool)
+        self.meta_ids = np.empty(self._INITIAL_CAPACITY, dtype=np.int32)
+        self.shared: List[Dict[str, Any]] = []
+        self._shared_ids: Dict[Tuple[Any, ...], int] = {}
+        self.texts: List[str] = []
+        self.blobs: List[bytes] = []
+        self.doc_rows: Dict[str, List[int]] = {}
+        self.payload_bytes = 0
+        self.spill = _Spill(spill_path, dim) if spill_path is not None and quantization != "float32" else None
+        # Optional ANN index over rows [0, ann.built_size); row ids are only
+        # valid within one `epoch` (compaction renumbers rows).
+        self.ann: Optional[IVFIndex] = None
+        self.ann_building = False
+        self.epoch = 0
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.size + extra
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._resize(capacity, slice(0, self.size), self.size)
+
+    def _resize(self, capacity: int, keep: Any, n: int) -> None:
+        """
+        Copy rows `keep` (n of them) into fresh arrays of `capacity` rows.
+        Whole arrays are swapped so in-flight searches keep a consistent
+        snapshot.
+        """
+        matrix = np.empty((capacity, self.dim), dtype=self.matrix.dtype)
+        norms = np.empty(capacity, dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        meta_ids = np.empty(capacity, dtype=np.int32)
+        matrix[:n] = self.matrix[keep]
+        norms[:n] = self.norms[keep]
+        alive[:n] = self.alive[keep]
+        meta_ids[:n] = self.meta_ids[keep]
+        self.matrix, self.norms, self.alive, self.meta_ids = matrix, norms, alive, meta_ids
+
+    def _intern(self, meta: Dict[str, Any]) -> Tuple[int, bytes]:
+        shared = {k: meta[k] for k in _SHARED_KEYS if k in meta}
+        key = tuple((k, _frozen(v)) for k, v in shared.items())
+        shared_id = self._shared_ids.get(key)
+        if shared_id is None:
+            shared_id = self._shared_ids[key] = len(self.shared)
+            self.shared.append(shared)
+        rest = {k: v for k, v in meta.items() if k not in _SHARED_KEYS}
+        blob = json.dumps(rest, separators=(",", ":"), default=str).encode("utf-8") if rest else b""
+        return shared_id, blob
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return _decode_metadata(self.shared, self.meta_ids, self.blobs, i)
+
+    def append(self, vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        n = vectors.shape[0]
+        self._reserve(n)
+        start, end = self.size, self.size + n
+        stored = quantize(vectors, self.quantization)
+        self.matrix[start:end] = stored
+        self.norms[start:end] = np.linalg.norm(stored.astype(np.float32, copy=False), axis=1)
+        self.alive[start:end] = True
+        if self.spill is not None:
+            self.spill.append(vectors)
+        for offset, meta in enumerate(metadatas):
+            self.meta_ids[start + offset], blob = self._intern(meta)
+            self.blobs.append(blob)
+            self.payload_bytes += len(blob)
+            doc_id = meta.get("doc_id")
+            if doc_id is not None:
+                self.doc_rows.setdefault(doc_id, []).append(start + offset)
+        self.texts.extend(texts)
+        self.payload_bytes += sum(len(t) for t in texts)
+        # Publish the new rows last so concurrent readers never see half-written data.
+        self.size = end
+
+    def delete_rows(self, rows: Iterable[int]) -> int:
+        removed = 0
+        for i in rows:
+            if self.alive[i]:
+                self.alive[i] = False
+                removed += 1
+        self.dead += removed
+        return removed
+
+    def live_count(self) -> int:
+        return self.size - self.dead
+
+    def maybe_compact(self) -> None:
+        if self.dead < max(self._COMPACT_MIN_DEAD, self.size // 4):
+            return
+        keep = np.flatnonzero(self.alive[: self.size])
+        self._resize(max(self._INITIAL_CAPACITY, len(keep) * 2), keep, len(keep))
+        if self.spill is not None:
+            old, self.spill = self.spill, self.spill.copy_rows(keep)
+            old.close()
+
+        texts = [self.texts[i] for i in keep]
+        blobs = [self.blobs[i] for i in keep]
+        doc_rows: Dict[str, List[int]] = {}
+        for doc_id, rows in self.doc_rows.items():
+            new_rows = np.searchsorted(keep, rows)
+            doc_rows[doc_id] = [int(r) for r, old in zip(new_rows, rows) if r < len(keep) and keep[r] == old]
+        self.texts, self.blobs, self.doc_rows = texts, blobs, {d: r for d, r in doc_rows.items() if r}
+        self.size, self.dead = len(keep), 0
+        self.payload_bytes = sum(len(t) for t in texts) + sum(len(b) for b in blobs)
+        self.ann, self.epoch = None, self.epoch + 1
+
+    def close(self) -> None:
+        if self.spill is not None:
+            self.spill.close()
+
+    def memory_bytes(self) -> int:
+        """
+        Estimated heap footprint: the (over-allocated) arrays, row payloads
+        and the ANN index if one is built. The spill file is not counted.
+        """
+        total = self.matrix.nbytes + self.norms.nbytes + self.alive.nbytes + self.meta_ids.nbytes
+        total += self.payload_bytes + self._ROW_OVERHEAD_BYTES * len(self.texts)
+        ann = self.ann
+        if ann is not None:
+            total += ann.centroids.nbytes + ann.offsets.nbytes + ann.rows.nbytes
+        return total
+
 
 class InMemoryVectorStore:
-    def __init__(self):
-        self._store: Dict[str, List[Dict[str, Any]]] = {}
+    """
+    Per-session vector store with one `_Partition` per `metadata["table"]`,
+    so a search with `tables=` only scores those tables' vectors.
+
+    Search is exact unless `ann` enables an IVF index, built in the
+    background once a partition has `min_vectors` live rows. `storage`
+    picks the vector precision (see `storage_settings`).
+    """
+
+    # Vectors live only in this process; dropping a session frees them for good.
+    persistent = False
+
+    def __init__(self, ann: Optional[Dict[str, Any]] = None, storage: Optional[Dict[str, Any]] = None):
+        self._store: Dict[str, Dict[Optional[str], _Partition]] = {}
+        self._lock = threading.Lock()
+        self._ann = ann_settings(ann)
+        self._storage = storage_settings(storage)
+
+    def _as_matrix(self, embeddings: Any) -> np.ndarray:
+        arr = np.asarray(embeddings, dtype=np.float32)
+        if arr.ndim == 1:
+            arr = arr.reshape(1, -1)
+        return arr
+
+    def _partition(self, session_id: str, table: Optional[str], dim: int) -> _Partition:
+        partitions = self._store.setdefault(session_id, {})
+        part = partitions.get(table)
+        if part is None:
+            conf = self._storage
+            part = partitions[table] = _Partition(
+                dim, conf["quantization"], conf["spill_path"] if conf["rescore"] else None,
+            )
+        return part
 
     def add(self, session_id: str, embedding: List[float], text: str, metadata: Dict[str, Any]):
-        self._store.setdefault(session_id, []).append(
-            {"embedding": embedding, "text": text, "metadata": metadata}
-        )
+        self.add_many(session_id, [embedding], [text], [metadata])
+
+    def add_many(
+        self,
+        session_id: str,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+    ):
+        if not (len(embeddings) == len(texts) == len(metadatas)):
+            raise ValueError("embeddings, texts and metadatas must have the same length")
+        if not texts:
+            return
+        vecs = self._as_matrix(embeddings)
+        by_table: Dict[Optional[str], List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            by_table.setdefault(meta.get("table"), []).append(i)
+        with self._lock:
+            first = next(iter(self._store.get(session_id, {}).values()), None)
+            if first is not None and vecs.shape[1] != first.dim:
+                raise ValueError(
+                    f"Embedding dimension {vecs.shape[1]} does not match session dimension {first.dim}"
+                )
+            for table, rows in by_table.items():
+                self._partition(session_id, table, vecs.shape[1]).append(
+                    vecs[rows], [texts[i] for i in rows], [metadatas[i] for i in rows],
+                )
+
+    def delete(self, session_id: str, doc_ids: Iterable[str]) -> int:
+        """
+        Remove every chunk whose metadata `doc_id` is in `doc_ids`.
+        Returns the number of chunks removed.
+        """
+        return self._remove(session_id, doc_ids, None)
+
+    def pop(self, session_id: str, doc_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Like `delete`, but return the removed chunks as {"text", "metadata"}.
+        """
+        records: List[Dict[str, Any]] = []
+        self._remove(session_id, doc_ids, records)
+        return records
+
+    def _remove(self, session_id: str, doc_ids: Iterable[str], records: Optional[List[Dict[str, Any]]]) -> int:
+        doc_ids = list(doc_ids)
+        removed = 0
+        with self._lock:
+            for part in self._store.get(session_id, {}).values():
+                rows = [i for doc_id in doc_ids for i in part.doc_rows.pop(doc_id, [])]
+                if not rows:
+                    continue
+                if records is not None:
+                    records.extend(
+                        {"text": part.texts[i], "metadata": part.metadata(i)} for i in rows if part.alive[i]
+                    )
+                removed += part.delete_rows(rows)
+                part.maybe_compact()
+        return removed
+
+    def delete_table(self, session_id: str, table: str) -> int:
+        """
+        Remove every chunk that came from `table` (drops its partition).
+        """
+        with self._lock:
+            part = self._store.get(session_id, {}).pop(table, None)
+        if part is None:
+            return 0
+        part.close()
+        return part.live_count()
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            partitions = self._store.pop(session_id, {})
+        for part in partitions.values():
+            part.close()
+
+    def tables(self, session_id: str) -> List[str]:
+        """
+        Tables with live chunks in the session (its partitions).
+        """
+        partitions = dict(self._store.get(session_id, {}))
+        return sorted(t for t, part in partitions.items() if t is not None and part.live_count())
+
+    def memory_bytes(self, session_id: str) -> int:
+        return sum(part.memory_bytes() for part in list(self._store.get(session_id, {}).values()))
+
+    def count(self, session_id: str) -> int:
+        return sum(part.live_count() for part in list(self._store.get(session_id, {}).values()))
+
+    def _wants_ann(self, part: _Partition) -> bool:
+        conf = self._ann
+        if not conf["enabled"] or part.ann_building:
+            return False
+        if part.live_count() < conf["min_vectors"]:
+            return False
+        return part.ann is None or part.ann.stale(part.size, conf["rebuild_ratio"])
+
+    def build_ann(self, session_id: str, table: Optional[str] = None) -> Optional[IVFIndex]:
+        """
+        Train the IVF index of one partition synchronously (the search path
+        does this in a background thread). `table=None` is the partition of
+        chunks without a table.
+        """
+        part = self._store.get(session_id, {}).get(table)
+        if part is None:
+            return None
+        with self._lock:
+            if part.ann_building:
+                return part.ann
+            part.ann_building = True
+            n, epoch = part.size, part.epoch
+            matrix, alive = part.matrix[:n], part.alive[:n].copy()
+        ann = None
+        try:
+            conf = self._ann
+            ann = IVFIndex.train(
+                matrix, alive,
+                nlist=conf["nlist"], iters=conf["train_iters"], sample=conf["train_sample"],
+            )
+        finally:
+            with self._lock:
+                part.ann_building = False
+                if ann is not None and part.epoch == epoch:
+                    part.ann = ann
+        return ann
+
+    @timed("vector_search")
+    def search(
+        self,
+        session_id: str,
+        query_emb: List[float],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        tables: Optional[Iterable[str]] = None,
+    ):
+        """
+        Top-k chunks by cosine similarity. `tables` restricts the search to
+        those tables' partitions (unknown names match nothing); None
+        searches them all.
+        """
+        partitions = self._store.get(session_id)
+        if not partitions or k <= 0:
+            return []
+        if tables is None:
+            chosen = list(partitions.items())
+        else:
+            chosen = [(t, partitions[t]) for t in dict.fromkeys(tables) if t in partitions]
+        if not chosen:
+            return []
+
+        q = np.asarray(query_emb, dtype=np.float32).reshape(-1)
+        dim = chosen[0][1].dim
+        if q.shape[0] != dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match session dimension {dim}")
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0:
+            return []
+
+        hits: List[Dict[str, Any]] = []
+        for table, part in chosen:
+            hits.extend(self._search_partition(session_id, table, part, q, q_norm, k, nprobe, exact))
+        if len(chosen) > 1:
+            hits.sort(key=lambda h: h["score"], reverse=True)
+        return hits[:k]
+
+    def _search_partition(
+        self,
+        session_id: str,
+        table: Optional[str],
+        part: _Partition,
+        q: np.ndarray,
+        q_norm: float,
+        k: int,
+        nprobe: Optional[int],
+        exact: bool,
+    ) -> List[Dict[str, Any]]:
+        # Snapshot the visible rows under the lock; appends only write past
+        # `size` and compaction swaps in new objects, so the views stay valid.
+        with self._lock:
+            n = part.size
+            matrix, norms, alive = part.matrix[:n], part.norms[:n], part.alive[:n].copy()
+            texts, blobs, meta_ids, shared = part.texts, part.blobs, part.meta_ids, part.shared
+            originals = part.spill.view if part.spill is not None else None
+            ann = part.ann if self._ann["enabled"] and not exact else None
+            if ann is not None and part.live_count() < self._ann["min_vectors"]:
+                ann = None
+            build = not exact and self._wants_ann(part)
+        if build:
+            threading.Thread(target=self.build_ann, args=(session_id, table), daemon=True).start()
+        if n == 0:
+            return []
+
+        wanted = k * self._storage["rescore_candidates"] if originals is not None else k
+        if ann is not None:
+            rows = ann.candidates(q / q_norm, nprobe or self._ann["nprobe"], n)
+            rows = rows[alive[rows]]
+            scores = cosine_scores(matrix[rows], norms[rows], q, q_norm)
+            top = top_k_indices(scores, wanted)
+            hits = [(int(rows[i]), float(scores[i])) for i in top]
+        else:
+            scores = cosine_scores(matrix, norms, q, q_norm)
+            scores[~alive] = -np.inf
+            hits = [(int(i), float(scores[i])) for i in top_k_indices(scores, wanted) if alive[i]]
+        if originals is not None and hits:
+            hits = self._rescore(originals, [i for i, _ in hits], q, q_norm, k)
+
+        # No embeddings in the results: callers only need text, metadata and score.
+        return [
+            {
+                "text": texts[i],
+                "metadata": _decode_metadata(shared, meta_ids, blobs, i),
+                "score": score,
+            }
+            for i, score in hits
+        ]
 
     @staticmethod
-    def _cosine(a: List[float], b: List[float]) -> float:
-        dot = sum(x * y for x, y in zip(a, b))
-        na = math.sqrt(sum(x * x for x in a))
-        nb = math.sqrt(sum(y * y for y in b))
-        return dot / (na * nb) if na and nb else 0.0
-
-    def search(self, session_id: str, query_emb: List[float], k: int = 5):
-        docs = self._store.get(session_id, [])
-        scored = [{**d, "score": self._cosine(query_emb, d["embedding"])} for d in docs]
-        scored.sort(key=lambda x: x["score"], reverse=True)
-        return scored[:k]
-
-vector_store = InMemoryVectorStore()
+    def _rescore(originals: np.ndarray, rows: List[int], q: np.ndarray, q_norm: float, k: int) -> List[Tuple[int, float]]:
+        """
+        Exact float32 cosine for the quantized search's candidates, best k.
+        """
+        order = np.argsort(rows)  # read the scratch file front to back
+        ids = np.asarray(rows, dtype=np.int64)[order]
+        full = np.asarray(originals[ids])
+        scores = cosine_scores(full, np.linalg.norm(full, axis=1), q, q_norm)
+        return [(int(ids[i]), float(scores[i])) for i in top_k_indices(scores, k)]
+
+def create_vector_store():
+    """
+    Build the process-wide store from `vector_store` in config.yaml:
+    `backend: memory` (default) or `backend: mmap` for the persistent,
+    multi-process `MmapVectorStore` under `path`.
+    """
+    from app.rag.utils.config_loader import load_config
+
+    conf = load_config().get("vector_store", {}) or {}
+    if conf.get("backend", "memory") == "mmap":
+        from app.rag.mmap_vector_store import MmapVectorStore
+
+        return MmapVectorStore(conf.get("path") or "data/vectors")
+    return InMemoryVectorStore(ann=load_config().get("ann"), storage=conf)
+
+
+vector_store = create_vector_store()
@@ -0,0 +1,106 @@
+# app/rag/warmup.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.rag.logger.custom_logger import CustomLogger
+from app.rag.utils.config_loader import load_config
+
+log = CustomLogger().get_logger(__name__)
+
+
+def startup_settings() -> Dict[str, Any]:
+    conf = load_config().get("startup", {}) or {}
+    return {"warmup": str(conf.get("warmup", "background"))}
+
+
+def _load_embedding_model() -> None:
+    from app.rag.embedder import get_embedder
+
+    get_embedder().warm_up()
+
+
+def _create_llm_clients() -> None:
+    from app.rag.sql_agent import _sql_llm
+
+    _sql_llm.warm_up()
+
+
+def _create_orchestrator() -> None:
+    from app.rag.orchestrator import get_orchestrator
+
+    get_orchestrator()
+
+
+def _import_mysql_driver() -> None:
+    import pymysql  # noqa: F401
+
+
+# Cheapest first, so a failing provider does not delay the rest.
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("mysql_driver", _import_mysql_driver),
+    ("orchestrator", _create_orchestrator),
+    ("llm_clients", _create_llm_clients),
+    ("embedding_model", _load_embedding_model),
+]
+
+
+class WarmupState:
+    """
+    Outcome of the startup warm-up, for /readyz: per-step seconds and
+    errors. A failed step (e.g. a missing API key) does not stop the app;
+    that component initializes, or fails, on its first request instead.
+    """
+
+    def __init__(self) -> None:
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self.mode = "off"
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.seconds = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def run(self) -> None:
+        started = time.perf_counter()
+        for name, step in WARMUP_STEPS:
+            step_started = time.perf_counter()
+            try:
+                step()
+                outcome: Dict[str, Any] = {"ok": True}
+            except Exception as e:
+                detail = (str(e).splitlines() or [""])[0]  # some provider errors embed a traceback
+                outcome = {"ok": False, "error": f"{type(e).__name__}: {detail}"}
+                log.error("Warm-up step failed", step=name, error=f"{type(e).__name__}: {detail}")
+            outcome["seconds"] = round(time.perf_counter() - step_started, 3)
+            with self._lock:
+                self.steps[name] = outcome
+        with self._lock:
+            self.seconds = round(time.perf_counter() - started, 3)
+        self._done.set()
+
+    def start(self, mode: str) -> None:
+        """
+        `blocking`: warm up before serving; `background`: serve at once and
+        report ready when done; `off`: everything initializes on first use.
+        """
+        self.mode = mode
+        if mode == "blocking":
+            self.run()
+        elif mode == "background":
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+        else:
+            self._done.set()
+
+    def status(self) -> Dict[str, Any]:
+        # /readyz may serialize this while a background run is adding steps.
+        with self._lock:
+            steps = {k: dict(v) for k, v in self.steps.items()}
+            return {"ready": self.done, "mode": self.mode, "seconds": self.seconds, "steps": steps}
+
+
+warmup_state = WarmupState()
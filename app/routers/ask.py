@@ -1,36 +1,108 @@
 # app/routers/ask.py
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Literal
 
-from app.session.session_registry import DATABASE_SESSIONS
-from app.rag.orchestrator import Orchestrator
+from app.session.session_registry import get_session
+from app.rag.metrics import collect_timings
+from app.rag.orchestrator import get_orchestrator
+from app.rag.result_cache import get_result_cache
+from app.rag.result_pages import get_result_cursors
+from app.rag.schema_index import prompt_stats
+from app.rag.sql_agent import next_result_page
+from app.rag.sql_cache import get_sql_cache
 
 router = APIRouter(prefix="/api", tags=["ask"])
-_orchestrator = Orchestrator()
 
 class AskRequest(BaseModel):
     session_id: str
     question: str
+    timings: bool = False  # add a per-stage "timings" breakdown (ms) to the response
+
+
+class AskStreamRequest(AskRequest):
+    format: Literal["sse", "ndjson"] = "sse"
+
+
+class RowsPageRequest(BaseModel):
+    session_id: str
+    token: str
+
+
+class StreamStats:
+    """
+    Time to first content event (SQL or semantic chunks) and to the final
+    answer, for streamed asks.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.ttfb_seconds = 0.0
+        self.total_seconds = 0.0
+        self.max_ttfb_seconds = 0.0
+
+    def record(self, ttfb: float, total: float) -> None:
+        with self._lock:
+            self.streams += 1
+            self.ttfb_seconds += ttfb
+            self.total_seconds += total
+            self.max_ttfb_seconds = max(self.max_ttfb_seconds, ttfb)
+
+    def stats(self) -> Dict[str, Any]:
+        n = max(1, self.streams)
+        return {
+            "streams": self.streams,
+            "avg_ttfb_ms": round(1000 * self.ttfb_seconds / n, 1),
+            "max_ttfb_ms": round(1000 * self.max_ttfb_seconds, 1),
+            "avg_total_ms": round(1000 * self.total_seconds / n, 1),
+        }
+
+
+_stream_stats = StreamStats()
+
+
+def _encode(fmt: str, event: str, data: Dict[str, Any]) -> str:
+    payload = json.dumps(data, default=str)
+    if fmt == "ndjson":
+        return f'{{"event": {json.dumps(event)}, "data": {payload}}}\n'
+    return f"event: {event}\ndata: {payload}\n\n"
 
 @router.post("/ask")
 async def ask(req: AskRequest):
-    db_session = DATABASE_SESSIONS.get(req.session_id)
+    db_session = get_session(req.session_id)
     if not db_session:
         raise HTTPException(status_code=404, detail="Invalid or expired session_id")
 
     try:
-        # Run sync code safely without blocking the event loop
-        result = await asyncio.wait_for(
-            asyncio.to_thread(
-                _orchestrator.answer,
+        if db_session.async_engine is not None:
+            # Native async path: no worker thread is held while waiting on I/O
+            work = get_orchestrator().answer_async(
+                session_id=req.session_id,
+                question=req.question,
+                async_engine=db_session.async_engine,
+                schema=db_session.schema,
+                schema_index=db_session.schema_index,
+            )
+        else:
+            # Run sync code safely without blocking the event loop
+            work = asyncio.to_thread(
+                get_orchestrator().answer,
                 session_id=req.session_id,
                 question=req.question,
                 engine=db_session.engine,
                 schema=db_session.schema,
-            ),
-            timeout=45,  # seconds
-        )
+                schema_index=db_session.schema_index,
+            )
+        with collect_timings() as timings:
+            result = await asyncio.wait_for(work, timeout=45)  # seconds
+        if req.timings:
+            result["timings"] = timings.as_dict()
         return result
 
     except asyncio.TimeoutError:
@@ -39,3 +111,93 @@ async def ask(req: AskRequest):
     except Exception as e:
         # Always return something instead of hanging
         raise HTTPException(status_code=500, detail=f"Ask failed: {type(e).__name__}: {e}")
+
+
+@router.post("/ask/stream")
+async def ask_stream(req: AskStreamRequest):
+    """
+    Streaming /api/ask: Server-Sent Events (default) or NDJSON, one event per
+    finished stage ("sql", "rows", "semantic", "error", "answer"), then
+    "done" with time-to-first-event and total time in milliseconds.
+    """
+    db_session = get_session(req.session_id)
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Invalid or expired session_id")
+
+    async def events():
+        started = time.perf_counter()
+        ttfb = None
+        stream = get_orchestrator().answer_stream(
+            session_id=req.session_id,
+            question=req.question,
+            engine=db_session.engine,
+            schema=db_session.schema,
+            schema_index=db_session.schema_index,
+            async_engine=db_session.async_engine,
+        )
+        try:
+            async for event, data in stream:
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                data["elapsed_ms"] = round(1000 * (time.perf_counter() - started), 1)
+                yield _encode(req.format, event, data)
+        except Exception as e:
+            yield _encode(req.format, "error", {"stage": "ask", "detail": f"{type(e).__name__}: {e}"})
+        finally:
+            await stream.aclose()
+
+        total = time.perf_counter() - started
+        ttfb = ttfb if ttfb is not None else total
+        _stream_stats.record(ttfb, total)
+        yield _encode(req.format, "done", {"ttfb_ms": round(1000 * ttfb, 1), "total_ms": round(1000 * total, 1)})
+
+    media_type = "application/x-ndjson" if req.format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        # Keep proxies (nginx) from buffering the stream into one response.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ask/rows")
+async def ask_rows(req: RowsPageRequest):
+    """
+    Next page of an /api/ask result whose response carried a `next_token`.
+    """
+    db_session = get_session(req.session_id)
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Invalid or expired session_id")
+
+    try:
+        page = await asyncio.to_thread(next_result_page, db_session.engine, req.token)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fetching rows failed: {type(e).__name__}: {e}")
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result token")
+    return page.to_dict()
+
+
+@router.get("/ask/rows/stats")
+def ask_rows_stats():
+    return get_result_cursors().stats()
+
+
+@router.get("/ask/stream_stats")
+def stream_stats():
+    return _stream_stats.stats()
+
+
+@router.get("/ask/cache")
+def sql_cache_stats():
+    sql_cache = get_sql_cache()
+    result_cache = get_result_cache()
+    return {
+        "sql": sql_cache.stats() if sql_cache is not None else {"enabled": False},
+        "results": result_cache.stats() if result_cache is not None else {"enabled": False},
+    }
+
+
+@router.get("/ask/prompt_stats")
+def sql_prompt_stats():
+    return prompt_stats.stats()
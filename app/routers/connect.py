@@ -1,12 +1,11 @@
 # app/routers/connect.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import uuid4
 
-from app.schema.schema_loader import load_schema, get_text_columns
-from app.session.session_registry import DATABASE_SESSIONS, DBSession
+from app.session.engine_registry import engine_registry
+from app.session.session_registry import SessionConnectError, add_session, open_session, session_manager
 
 router = APIRouter(prefix="/api", tags=["connect"])
 
@@ -33,42 +32,53 @@ def connect_db(req: ConnectRequest):
 @router.post("/connect")
 def connect_mysql(req: ConnectRequest):
     """
-    Creates a SQLAlchemy engine for user-supplied MySQL credentials,
-    introspects schema, stores it in an in-memory session registry,
-    and returns a session_id.
+    Gets the shared, pooled SQLAlchemy engine for user-supplied MySQL
+    credentials (one per DSN, see EngineRegistry), introspects schema,
+    registers the session with the SessionManager, and returns a session_id.
     """
-    url = f"mysql+pymysql://{req.user}:{req.password}@{req.host}:{req.port}/{req.database}"
-
     try:
-        engine = create_engine(
-    url,
-    pool_pre_ping=True,
-    connect_args={"connect_timeout": 5},
-)
-
-
-        # connection smoke test
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-    except SQLAlchemyError as e:
+        session = open_session(req.host, req.port, req.user, req.password, req.database)
+    except SessionConnectError as e:
         raise HTTPException(status_code=400, detail=f"MySQL connection failed: {e}")
-
-    try:
-        schema = load_schema(engine, req.database)
-        text_cols = get_text_columns(schema)
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Schema introspection failed: {e}")
 
     session_id = uuid4().hex
-    DATABASE_SESSIONS[session_id] = DBSession(
-        engine=engine,
-        database=req.database,
-        schema=schema,
-        text_columns=text_cols,
-    )
+    add_session(session_id, session)
+    schema = session.schema
+    schema_index = session.schema_index
 
     return {
         "session_id": session_id,
         "tables": list(schema.keys()),
-        "text_columns": text_cols,
+        "text_columns": session.text_columns,
+        "schema_cache": session.schema_refresh,
+        "schema_index": {
+            "pruning": schema_index is not None,
+            "full_schema_tokens": schema_index.full_tokens if schema_index is not None else None,
+        },
     }
+
+
+@router.get("/pools")
+def pool_status():
+    """
+    Connection pools per DSN: sessions sharing each engine, connections
+    checked out / idle / overflow, and checkout wait times.
+    """
+    return engine_registry.status()
+
+
+@router.get("/sessions")
+def session_status():
+    """
+    Live sessions in this process with their estimated memory (schema +
+    vectors), plus eviction / expiry / rehydration counters.
+    """
+    return session_manager.stats()
+
+
+@router.delete("/sessions/{session_id}")
+def session_close(session_id: str):
+    session_manager.drop(session_id)
+    return {"session_id": session_id, "status": "closed"}
@@ -1,28 +1,49 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 
-from app.session.session_registry import DATABASE_SESSIONS
-from app.rag.indexer import index_all_text
+from app.session.session_registry import get_session
+from app.rag.index_jobs import get_index_jobs
+from app.rag.embedding_cache import get_embedding_cache
 
 router = APIRouter(prefix="/api", tags=["index"])
 
 
 class IndexRequest(BaseModel):
     session_id: str
-    max_rows: int = 500
+    max_rows: Optional[int] = None  # per-table cap; None indexes every row
 
 
-@router.post("/index_all")
+@router.post("/index_all", status_code=202)
 def index_all(req: IndexRequest):
-    session = DATABASE_SESSIONS.get(req.session_id)
+    """
+    Enqueue a background indexing job and return its id immediately.
+    Poll GET /api/index_all/{job_id} for progress.
+    """
+    session = get_session(req.session_id)
     if not session:
         raise HTTPException(404, "Invalid session_id")
 
-    stats = index_all_text(
-        session_id=req.session_id,
-        engine=session.engine,
-        schema=session.schema,
-        max_rows=req.max_rows,
-    )
+    job = get_index_jobs().submit(req.session_id, session, req.max_rows)
+    return {"status": job.status, "job_id": job.job_id}
 
-    return {"status": "ok", "stats": stats}
+
+@router.get("/index_all/{job_id}")
+def index_status(job_id: str):
+    job = get_index_jobs().get(job_id)
+    if not job:
+        raise HTTPException(404, "Unknown job_id")
+
+    cache = get_embedding_cache()
+    return {
+        **job.to_dict(),
+        "embedding_cache": cache.stats() if cache is not None else None,
+    }
+
+
+@router.post("/index_all/{job_id}/cancel")
+def index_cancel(job_id: str):
+    job = get_index_jobs().cancel(job_id)
+    if not job:
+        raise HTTPException(404, "Unknown job_id")
+    return job.to_dict()
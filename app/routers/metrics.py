@@ -0,0 +1,75 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List, Tuple
+
+from app.rag.embedder import get_embedder
+from app.rag.embedding_cache import get_embedding_cache
+from app.rag.metrics import metrics
+from app.rag.result_cache import get_result_cache
+from app.rag.result_pages import get_result_cursors
+from app.rag.sql_cache import get_sql_cache
+from app.session.engine_registry import engine_registry
+from app.session.session_registry import session_manager
+
+router = APIRouter(tags=["metrics"])
+
+Sample = Tuple[str, str, str, Dict[str, Any], float]
+
+_LOOKUPS = "cache_lookups_total"
+_LOOKUPS_HELP = "Cache lookups by cache and outcome."
+
+
+def _cache_samples() -> List[Sample]:
+    samples: List[Sample] = []
+    sql_cache = get_sql_cache()
+    if sql_cache is not None:
+        s = sql_cache.stats()
+        for outcome, key in (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"), ("miss", "misses")):
+            samples.append((_LOOKUPS, "counter", _LOOKUPS_HELP, {"cache": "sql", "outcome": outcome}, s[key]))
+    result_cache = get_result_cache()
+    if result_cache is not None:
+        s = result_cache.stats()
+        for outcome, key in (("hit", "hits"), ("miss", "misses")):
+            samples.append((_LOOKUPS, "counter", _LOOKUPS_HELP, {"cache": "result", "outcome": outcome}, s[key]))
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is not None:
+        s = embedding_cache.stats()
+        for outcome, key in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+            samples.append((_LOOKUPS, "counter", _LOOKUPS_HELP, {"cache": "embedding", "outcome": outcome}, s[key]))
+    return samples
+
+
+def _resource_samples() -> List[Sample]:
+    samples: List[Sample] = [
+        ("sessions", "gauge", "Sessions loaded in this process.", {}, len(session_manager.sessions)),
+        ("result_cursors_open", "gauge", "Server-side result cursors held open between pages.", {},
+         get_result_cursors().stats()["open_cursors"]),
+    ]
+    for pool in engine_registry.status()["pools"]:
+        labels = {"dsn": pool["dsn"]}
+        samples.append(("db_pool_checked_out", "gauge", "Pooled MySQL connections in use.", labels, pool["checked_out"]))
+        samples.append(("db_pool_wait_timeouts_total", "counter", "Pool checkouts that timed out.", labels,
+                        pool["wait"]["timeouts"]))
+    batching = get_embedder().batching_stats()
+    if batching is not None:
+        samples.append(("embed_batches_total", "counter", "Local embedding forward passes for queries.", {},
+                        batching["batches"]))
+        samples.append(("embed_batched_queries_total", "counter", "Queries embedded through the batcher.", {},
+                        batching["texts"]))
+    return samples
+
+
+metrics.add_collector(_cache_samples)
+metrics.add_collector(_resource_samples)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus text exposition: `stage_seconds` histograms per pipeline
+    stage (ask, sql_path, llm, sql_execute, embed_query, retrieve,
+    vector_search, index_all, ...), LLM token and cache lookup counters,
+    and pool / session gauges.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
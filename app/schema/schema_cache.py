@@ -0,0 +1,190 @@
+# app/schema/schema_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from app.rag.utils.config_loader import load_config
+from app.rag.utils.singleton import lazy_singleton
+from app.schema.schema_loader import (
+    load_foreign_keys,
+    load_indexes,
+    load_schema,
+    load_table_status,
+)
+
+
+@dataclass
+class SchemaSnapshot:
+    """
+    Everything introspected for one database: columns (the `schema` dict the
+    rest of the app uses), foreign keys, indexes, and the per-table status
+    (create/update time, row estimate) the snapshot was validated against.
+    """
+    schema: Dict[str, Any]
+    foreign_keys: Dict[str, List[Dict[str, str]]]
+    indexes: Dict[str, List[Dict[str, Any]]]
+    tables: Dict[str, Dict[str, Any]]
+    refreshed_at: float = field(default_factory=time.time)
+    # Last full introspection; 0.0 (files written before this field) is
+    # always due one.
+    full_refresh_at: float = 0.0
+    # How this snapshot was obtained: mode (hit | partial | full), timings.
+    refresh: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def row_estimates(self) -> Dict[str, int]:
+        return {t: s["rows"] for t, s in self.tables.items()}
+
+
+def schema_cache_settings() -> Dict[str, Any]:
+    conf = load_config().get("schema_cache", {}) or {}
+    return {
+        "enabled": bool(conf.get("enabled", True)),
+        "path": conf.get("path") or "cache/schema",
+        "max_age_seconds": float(conf.get("max_age_seconds", 86400)),
+    }
+
+
+class SchemaCache:
+    """
+    Schema snapshots per (host, port, user, database), in memory and as
+    JSON files under `path`.
+
+    On connect, tables that are new or whose CREATE_TIME changed are
+    re-introspected and dropped ones removed. DDL that keeps CREATE_TIME
+    (e.g. INSTANT column adds) waits for the full refresh every
+    `max_age_seconds`. The key includes the user: INFORMATION_SCHEMA only
+    shows what that user may see.
+    """
+
+    def __init__(self, path: str, max_age_seconds: float = 86400.0):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._memory: Dict[str, SchemaSnapshot] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host: str, port: int, user: str, database: str) -> str:
+        raw = "\x00".join([host.lower(), str(port), user, database])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[SchemaSnapshot]:
+        snap = self._memory.get(key)
+        if snap is not None:
+            return snap
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as f:
+                return SchemaSnapshot(**json.load(f))
+        except (FileNotFoundError, ValueError, TypeError):
+            return None
+
+    def _write(self, key: str, snap: SchemaSnapshot) -> None:
+        self._memory[key] = snap
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(snap), f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _introspect(engine: Engine, database: str, tables: Optional[List[str]]) -> SchemaSnapshot:
+        return SchemaSnapshot(
+            schema=load_schema(engine, database, tables),
+            foreign_keys=load_foreign_keys(engine, database, tables),
+            indexes=load_indexes(engine, database, tables),
+            tables={},
+        )
+
+    def load(self, engine: Engine, host: str, port: int, user: str, database: str) -> SchemaSnapshot:
+        started = time.perf_counter()
+        key = self.key(host, port, user, database)
+        status = load_table_status(engine, database)
+
+        with self._lock:
+            snap = self._read(key)
+
+        if snap is None or time.time() - snap.full_refresh_at > self.max_age_seconds:
+            mode = "full"
+            changed = sorted(status)
+            fresh = self._introspect(engine, database, None)
+            new = SchemaSnapshot(fresh.schema, fresh.foreign_keys, fresh.indexes, status)
+            new.full_refresh_at = new.refreshed_at
+        else:
+            changed = sorted(
+                t for t, s in status.items()
+                if t not in snap.tables or snap.tables[t]["create_time"] != s["create_time"]
+            )
+            removed = [t for t in snap.tables if t not in status]
+            mode = "partial" if changed or removed else "hit"
+
+            schema = {t: c for t, c in snap.schema.items() if t in status and t not in changed}
+            foreign_keys = {t: f for t, f in snap.foreign_keys.items() if t in status and t not in changed}
+            indexes = {t: i for t, i in snap.indexes.items() if t in status and t not in changed}
+            if changed:
+                fresh = self._introspect(engine, database, changed)
+                schema.update(fresh.schema)
+                foreign_keys.update(fresh.foreign_keys)
+                indexes.update(fresh.indexes)
+            # FKs pointing at dropped tables are gone with them.
+            foreign_keys = {
+                t: [fk for fk in fks if fk["ref_table"] in status]
+                for t, fks in foreign_keys.items()
+            }
+            new = SchemaSnapshot(
+                schema=dict(sorted(schema.items())),
+                foreign_keys=foreign_keys,
+                indexes=indexes,
+                tables=status,
+                refreshed_at=time.time() if mode == "partial" else snap.refreshed_at,
+                full_refresh_at=snap.full_refresh_at,
+            )
+
+        with self._lock:
+            if mode == "hit":
+                # Only update/row-count drift: keep it in memory, skip the rewrite.
+                self._memory[key] = new
+            else:
+                self._write(key, new)
+        new.refresh = {
+            "mode": mode,
+            "tables": len(status),
+            "refreshed_tables": len(changed) if mode != "hit" else 0,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        return new
+
+
+@lazy_singleton
+def get_schema_cache() -> Optional[SchemaCache]:
+    """
+    Process-wide snapshot cache. Returns None when `schema_cache.enabled` is false.
+    """
+    settings = schema_cache_settings()
+    if not settings["enabled"]:
+        return None
+    return SchemaCache(settings["path"], settings["max_age_seconds"])
+
+
+def load_schema_snapshot(engine: Engine, host: str, port: int, user: str, database: str) -> SchemaSnapshot:
+    """
+    Snapshot through the cache, or a full uncached introspection when the
+    cache is disabled.
+    """
+    cache = get_schema_cache()
+    if cache is not None:
+        return cache.load(engine, host, port, user, database)
+    snap = SchemaCache._introspect(engine, database, None)
+    snap.tables = load_table_status(engine, database)
+    return snap
@@ -1,22 +1,152 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.engine import Engine
 from sqlalchemy import text
 
-def load_schema(engine: Engine, database_name: str) -> Dict[str, Any]:
-    q = text("""
-        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE
+def _table_filter(tables: Optional[List[str]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Optional `AND TABLE_NAME IN (...)` clause, for refreshing only some tables.
+    """
+    if tables is None:
+        return "", {}
+    names = {f"t{i}": t for i, t in enumerate(tables)}
+    marks = ", ".join(f":{k}" for k in names)
+    return f"AND TABLE_NAME IN ({marks})", names
+
+def load_schema(engine: Engine, database_name: str, tables: Optional[List[str]] = None) -> Dict[str, Any]:
+    if tables == []:
+        return {}
+    clause, params = _table_filter(tables)
+    q = text(f"""
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_KEY
         FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_SCHEMA = :db
+        WHERE TABLE_SCHEMA = :db {clause}
         ORDER BY TABLE_NAME, ORDINAL_POSITION
     """)
     with engine.connect() as conn:
-        rows = conn.execute(q, {"db": database_name}).fetchall()
+        rows = conn.execute(q, {"db": database_name, **params}).fetchall()
 
     schema: Dict[str, Any] = {}
-    for table, column, dtype in rows:
-        schema.setdefault(table, []).append({"name": column, "type": dtype})
+    for table, column, dtype, key in rows:
+        schema.setdefault(table, []).append({"name": column, "type": dtype, "key": key or ""})
     return schema
 
+def get_primary_key(cols: List[Dict[str, Any]]) -> List[str]:
+    """
+    Primary key column names of one table, in ordinal order (empty if none).
+    """
+    return [c["name"] for c in cols if c.get("key") == "PRI"]
+
+def estimate_table_rows(engine: Engine, database_name: str) -> Dict[str, int]:
+    """
+    Cheap per-table row estimates from INFORMATION_SCHEMA.TABLES (InnoDB
+    statistics, not exact counts).
+    """
+    q = text("""
+        SELECT TABLE_NAME, TABLE_ROWS
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = :db
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(q, {"db": database_name}).fetchall()
+    return {table: int(n or 0) for table, n in rows}
+
+def load_foreign_keys(
+    engine: Engine,
+    database_name: str,
+    tables: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Foreign keys per table: [{"column", "ref_table", "ref_column"}, ...].
+    """
+    if tables == []:
+        return {}
+    clause, params = _table_filter(tables)
+    q = text(f"""
+        SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = :db {clause}
+          AND REFERENCED_TABLE_NAME IS NOT NULL
+          AND REFERENCED_TABLE_SCHEMA = :db
+        ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(q, {"db": database_name, **params}).fetchall()
+
+    fks: Dict[str, List[Dict[str, str]]] = {}
+    for table, column, ref_table, ref_column in rows:
+        fks.setdefault(table, []).append(
+            {"column": column, "ref_table": ref_table, "ref_column": ref_column}
+        )
+    return fks
+
+def load_indexes(
+    engine: Engine,
+    database_name: str,
+    tables: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Indexes per table: [{"name", "unique", "columns": [...]}, ...], columns
+    in index order.
+    """
+    if tables == []:
+        return {}
+    clause, params = _table_filter(tables)
+    q = text(f"""
+        SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = :db {clause}
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(q, {"db": database_name, **params}).fetchall()
+
+    indexes: Dict[str, List[Dict[str, Any]]] = {}
+    by_name: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for table, index, non_unique, column in rows:
+        entry = by_name.get((table, index))
+        if entry is None:
+            entry = {"name": index, "unique": not int(non_unique), "columns": []}
+            by_name[(table, index)] = entry
+            indexes.setdefault(table, []).append(entry)
+        entry["columns"].append(column)
+    return indexes
+
+# MySQL 8 serves INFORMATION_SCHEMA.TABLES from a stats cache that is only
+# refreshed every `information_schema_stats_expiry` seconds (default 24h).
+NO_STATS_EXPIRY_SQL = text("SET SESSION information_schema_stats_expiry = 0")
+
+def disable_stats_cache(conn) -> None:
+    """
+    Make this connection's INFORMATION_SCHEMA.TABLES reads current.
+    """
+    try:
+        conn.execute(NO_STATS_EXPIRY_SQL)
+    except Exception:
+        pass  # MySQL < 8 / MariaDB: no stats cache to bypass
+
+def load_table_status(engine: Engine, database_name: str) -> Dict[str, Dict[str, Any]]:
+    """
+    One cheap INFORMATION_SCHEMA.TABLES read: per base table, CREATE_TIME
+    (changes on most DDL), UPDATE_TIME and the InnoDB row estimate.
+    Views are listed too, with NULL times.
+    """
+    q = text("""
+        SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME, TABLE_ROWS
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = :db
+    """)
+    with engine.connect() as conn:
+        disable_stats_cache(conn)
+        rows = conn.execute(q, {"db": database_name}).fetchall()
+    return {
+        table: {
+            "create_time": str(created) if created is not None else None,
+            "update_time": str(updated) if updated is not None else None,
+            "rows": int(n or 0),
+        }
+        for table, created, updated, n in rows
+    }
+
 def get_text_columns(schema: Dict[str, Any]) -> List[Tuple[str, str]]:
     text_types = {"varchar", "text", "mediumtext", "longtext", "char"}
     out: List[Tuple[str, str]] = []
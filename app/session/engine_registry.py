@@ -0,0 +1,252 @@
+# app/session/engine_registry.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.rag.utils.config_loader import load_config
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class PoolWaitStats:
+    """
+    Time spent inside pool checkout: waiting for a free connection once the
+    pool and overflow are exhausted, or opening a new one below the cap.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.timeouts += int(timed_out)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(1000 * self.total_seconds / self.checkouts, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(1000 * self.max_seconds, 2),
+            "timeouts": self.timeouts,
+        }
+
+
+class _TimedCheckout:
+    # `_do_get` is where QueuePool blocks on its queue / opens connections.
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            stats = getattr(self, "wait_stats", None)
+            if stats is not None:
+                stats.record(time.perf_counter() - started, timed_out)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_settings() -> Dict[str, Any]:
+    conf = load_config().get("db_pool", {}) or {}
+    return {
+        "pool_size": int(conf.get("pool_size", 5)),
+        "max_overflow": int(conf.get("max_overflow", 10)),
+        "pool_timeout": float(conf.get("pool_timeout_seconds", 30)),
+        "pool_recycle": int(conf.get("pool_recycle_seconds", 1800)),
+        "pool_pre_ping": bool(conf.get("pool_pre_ping", True)),
+        "connect_timeout": int(conf.get("connect_timeout_seconds", 5)),
+    }
+
+
+def dsn_key(user: str, password: str, host: str, port: int, database: str) -> str:
+    # The password is part of the key: a connect with wrong credentials must
+    # get its own engine (and fail its smoke test), never reuse a good one.
+    raw = "\x00".join([user, password, host.lower(), str(port), database])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SharedEngine:
+    key: str
+    label: str  # user@host:port/db, no password
+    engine: Engine
+    async_engine: Optional["AsyncEngine"] = None
+    refs: int = 0
+    created_at: float = field(default_factory=time.time)
+    wait_stats: PoolWaitStats = field(default_factory=PoolWaitStats)
+    async_wait_stats: PoolWaitStats = field(default_factory=PoolWaitStats)
+
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        status = {
+            "dsn": self.label,
+            "sessions": self.refs,
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "wait": self.wait_stats.snapshot(),
+        }
+        if self.async_engine is not None:
+            apool = self.async_engine.pool
+            status["async"] = {
+                "pool_size": apool.size(),
+                "checked_out": apool.checkedout(),
+                "checked_in": apool.checkedin(),
+                "overflow": apool.overflow(),
+                "wait": self.async_wait_stats.snapshot(),
+            }
+        return status
+
+
+class EngineRegistry:
+    """
+    One pooled Engine (and optional AsyncEngine) per DSN, shared by every
+    session connected with the same credentials. Sessions hold a reference;
+    the engine is disposed when the last session using it is released.
+
+    Every process needs up to pool_size + max_overflow connections per DSN
+    (twice that with the async engine); size MySQL `max_connections` from
+    the `/api/pools` numbers times the number of workers.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = settings or pool_settings()
+        self._engines: Dict[str, SharedEngine] = {}
+        self._lock = threading.Lock()
+        # The event loop async engines run on (set by the app lifespan), and
+        # dispose tasks scheduled on it, kept referenced until they finish.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._disposals: Set["asyncio.Task[None]"] = set()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        s = self.settings
+        return {
+            "pool_size": s["pool_size"],
+            "max_overflow": s["max_overflow"],
+            "pool_timeout": s["pool_timeout"],
+            "pool_recycle": s["pool_recycle"],
+            "pool_pre_ping": s["pool_pre_ping"],
+            "connect_args": {"connect_timeout": s["connect_timeout"]},
+        }
+
+    def _create_async_engine(self, url: URL) -> Optional["AsyncEngine"]:
+        """
+        aiomysql (and greenlet, which sqlalchemy.ext.asyncio needs) are
+        optional: without them the session only has the sync engine and
+        /api/ask falls back to running the sync pipeline in a thread.
+        """
+        try:
+            import aiomysql  # noqa: F401
+            from sqlalchemy.ext.asyncio import create_async_engine
+        except ImportError:
+            return None
+        return create_async_engine(
+            url.set(drivername="mysql+aiomysql"),
+            poolclass=TimedAsyncQueuePool,
+            **self._pool_kwargs(),
+        )
+
+    def acquire(self, user: str, password: str, host: str, port: int, database: str) -> SharedEngine:
+        key = dsn_key(user, password, host, port, database)
+        with self._lock:
+            shared = self._engines.get(key)
+            if shared is None:
+                url = URL.create(
+                    "mysql+pymysql", username=user, password=password,
+                    host=host, port=port, database=database,
+                )
+                engine = create_engine(url, poolclass=TimedQueuePool, **self._pool_kwargs())
+                shared = SharedEngine(
+                    key=key,
+                    label=f"{user}@{host}:{port}/{database}",
+                    engine=engine,
+                    async_engine=self._create_async_engine(url),
+                )
+                engine.pool.wait_stats = shared.wait_stats
+                if shared.async_engine is not None:
+                    shared.async_engine.pool.wait_stats = shared.async_wait_stats
+                self._engines[key] = shared
+            shared.refs += 1
+            return shared
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            shared = self._engines.get(key)
+            if shared is None:
+                return
+            shared.refs -= 1
+            if shared.refs > 0:
+                return
+            del self._engines[key]
+        shared.engine.dispose()
+        if shared.async_engine is not None:
+            self._dispose_async(shared.async_engine)
+
+    def _dispose_async(self, async_engine: "AsyncEngine") -> None:
+        """
+        AsyncEngine.dispose is a coroutine, and aiomysql connections belong
+        to the loop that opened them, so the close runs on that loop: as a
+        task when called from it, via run_coroutine_threadsafe from a
+        worker thread.
+        """
+        try:
+            running: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        loop = self._loop or running
+        if loop is None or loop.is_closed():
+            # No loop ever served this engine: nothing async to close, just
+            # drop the pool's references.
+            async_engine.sync_engine.dispose(close=False)
+            return
+        if loop is running:
+            task = loop.create_task(async_engine.dispose())
+            self._disposals.add(task)
+            task.add_done_callback(self._disposals.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(async_engine.dispose(), loop)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            engines = list(self._engines.values())
+        pools = [e.pool_status() for e in engines]
+        per_process_max = self.settings["pool_size"] + self.settings["max_overflow"]
+        return {
+            "engines": len(pools),
+            "max_connections_per_engine": per_process_max,
+            "checked_out": sum(p["checked_out"] for p in pools),
+            "pools": pools,
+        }
+
+
+engine_registry = EngineRegistry()
@@ -1,12 +1,343 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
+from app.rag.logger.custom_logger import CustomLogger
+from app.rag.utils.config_loader import load_config
+from app.session.engine_registry import engine_registry
+from app.session.session_store import SessionStore, create_session_store
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from app.rag.schema_index import SchemaIndex
+
+log = CustomLogger().get_logger(__name__)
+
 @dataclass
 class DBSession:
     engine: Engine
     database: str
     schema: Dict[str, Any]
     text_columns: list[tuple[str, str]] = field(default_factory=list)
+    foreign_keys: Dict[str, list] = field(default_factory=dict)
+    indexes: Dict[str, list] = field(default_factory=dict)
+    row_estimates: Dict[str, int] = field(default_factory=dict)
+    schema_refresh: Dict[str, Any] = field(default_factory=dict)  # how the schema snapshot was obtained
+    schema_index: Optional[SchemaIndex] = None  # built at /api/connect for SQL prompt pruning
+    async_engine: Optional[AsyncEngine] = None  # set when aiomysql + greenlet are installed
+    engine_key: Optional[str] = None  # EngineRegistry reference, released on eviction
+    conn_info: Dict[str, Any] = field(default_factory=dict)  # host/port/user/password/database
+    session_id: str = ""
+    last_used: float = field(default_factory=time.time)
+    schema_bytes: int = 0
+
+    def memory_bytes(self) -> int:
+        """
+        Estimated heap held by this session: schema metadata, the schema
+        index embeddings and the session's vectors in the vector store.
+        """
+        from app.rag.vector_store import vector_store
+
+        total = self.schema_bytes
+        if self.schema_index is not None:
+            total += self.schema_index.matrix.nbytes
+        return total + vector_store.memory_bytes(self.session_id)
+
+
+class SessionConnectError(Exception):
+    """The MySQL connection smoke test failed."""
+
+
+def _build_schema_index(schema, foreign_keys) -> Optional[SchemaIndex]:
+    """
+    Embed the table descriptions for SQL prompt pruning. Best-effort: if the
+    embedding provider fails, the session simply sends the full schema.
+    """
+    from app.rag.embedder import get_embedder
+    from app.rag.schema_index import build_schema_index
+
+    try:
+        return build_schema_index(get_embedder(), schema, foreign_keys)
+    except Exception as e:
+        log.warning("Schema index skipped", error=f"{type(e).__name__}: {e}")
+        return None
+
+
+def open_session(host: str, port: int, user: str, password: str, database: str) -> DBSession:
+    """
+    Get the shared engine for the DSN, smoke-test it and load the schema
+    snapshot (cached, refreshed incrementally; see SchemaCache). Raises SessionConnectError if MySQL is unreachable and
+    SQLAlchemyError if introspection fails.
+    """
+    from sqlalchemy.exc import SQLAlchemyError
+    from app.schema.schema_cache import load_schema_snapshot
+    from app.schema.schema_loader import get_text_columns
+
+    shared = engine_registry.acquire(user, password, host, port, database)
+    try:
+        try:
+            # connection smoke test
+            with shared.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except SQLAlchemyError as e:
+            raise SessionConnectError(str(e)) from e
+
+        snap = load_schema_snapshot(shared.engine, host, port, user, database)
+    except Exception:
+        engine_registry.release(shared.key)
+        raise
+
+    schema, foreign_keys = snap.schema, snap.foreign_keys
+    return DBSession(
+        engine=shared.engine,
+        database=database,
+        schema=schema,
+        text_columns=get_text_columns(schema),
+        foreign_keys=foreign_keys,
+        indexes=snap.indexes,
+        row_estimates=snap.row_estimates,
+        schema_refresh=snap.refresh,
+        schema_index=_build_schema_index(schema, foreign_keys),
+        async_engine=shared.async_engine,
+        engine_key=shared.key,
+        conn_info={"host": host, "port": port, "user": user, "password": password, "database": database},
+        schema_bytes=len(json.dumps(schema)) + len(json.dumps(foreign_keys)),
+    )
+
+
+def session_settings() -> Dict[str, Any]:
+    conf = load_config().get("sessions", {}) or {}
+    return {
+        "idle_ttl_seconds": float(conf.get("idle_ttl_seconds", 3600)),
+        "max_sessions": int(conf.get("max_sessions", 200)),
+        "max_memory_mb": float(conf.get("max_memory_mb", 0)),
+        "store": conf.get("store", "none"),
+        "store_path": conf.get("store_path", "data/sessions.sqlite"),
+    }
+
+
+class SessionManager:
+    """
+    Live sessions of this process, in LRU order, backed by a SessionStore.
+
+    Sessions idle for `idle_ttl_seconds` are expired everywhere. Over
+    `max_sessions` / `max_memory_mb`, the least recently used are unloaded
+    from this process only and rehydrated from the store on next use
+    (in-memory vectors are lost). Sessions being indexed are never evicted.
+    """
+
+    _SWEEP_INTERVAL_SECONDS = 60.0
+    _TOUCH_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, settings: Dict[str, Any], store: SessionStore):
+        self.settings = settings
+        self.store = store
+        self.sessions: "OrderedDict[str, DBSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._last_touch: Dict[str, float] = {}
+        self.evictions = 0
+        self.expirations = 0
+        self.rehydrations = 0
+
+    # ------------------------------------------------------------------
+    def add(self, session_id: str, session: DBSession) -> None:
+        session.session_id = session_id
+        session.last_used = time.time()
+        with self._lock:
+            self.sessions[session_id] = session
+            self._last_touch[session_id] = session.last_used
+        self.store.save(session_id, session.conn_info)
+        self._enforce_caps(keep=session_id)
+        self.maybe_sweep()
+
+    def get(self, session_id: str) -> Optional[DBSession]:
+        """
+        Look up a session and mark it as used, rehydrating it from the
+        backing store if this process does not hold it.
+        """
+        self.maybe_sweep()
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+        if session is None:
+            session = self._rehydrate(session_id)
+            if session is None:
+                return None
+
+        now = time.time()
+        session.last_used = now
+        with self._lock:
+            due = now - self._last_touch.get(session_id, 0.0) >= self._TOUCH_INTERVAL_SECONDS
+            if due:
+                self._last_touch[session_id] = now
+        if due:
+            self.store.touch(session_id, now)
+        return session
+
+    def _rehydrate(self, session_id: str) -> Optional[DBSession]:
+        info = self.store.load(session_id)
+        if info is None:
+            return None
+        if time.time() - info.pop("last_used", 0.0) > self.settings["idle_ttl_seconds"]:
+            self.store.delete(session_id)
+            return None
+        try:
+            session = open_session(**info)
+        except Exception as e:
+            log.error("Session rehydration failed", session_id=session_id, error=f"{type(e).__name__}: {e}")
+            return None
+        with self._lock:
+            existing = self.sessions.get(session_id)
+            if existing is not None:  # another request rehydrated it meanwhile
+                engine_registry.release(session.engine_key)
+                return existing
+            session.session_id = session_id
+            self.sessions[session_id] = session
+            self.rehydrations += 1
+        self._enforce_caps(keep=session_id)
+        return session
+
+    # ------------------------------------------------------------------
+    def _unload(self, session_id: str, forget: bool) -> None:
+        """
+        Free what this process holds for the session; `forget` also removes
+        it from the backing store and deletes persistent vectors.
+        """
+        from app.rag.index_state import index_state
+        from app.rag.vector_store import vector_store
+
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+            self._last_touch.pop(session_id, None)
+        if session is not None and session.engine_key is not None:
+            engine_registry.release(session.engine_key)
+        index_state.drop_session(session_id)
+        if forget or not vector_store.persistent:
+            vector_store.drop_session(session_id)
+        if forget:
+            self.store.delete(session_id)
+
+    def drop(self, session_id: str) -> None:
+        self._unload(session_id, forget=True)
+
+    @staticmethod
+    def _busy() -> set:
+        from app.rag.index_jobs import get_index_jobs
+
+        return get_index_jobs().active_sessions()
+
+    def _enforce_caps(self, keep: Optional[str] = None) -> None:
+        max_sessions = self.settings["max_sessions"]
+        max_bytes = self.settings["max_memory_mb"] * 1024 * 1024
+        busy = self._busy()
+        with self._lock:
+            order = [sid for sid in self.sessions if sid != keep and sid not in busy]
+            sizes = {sid: s.memory_bytes() for sid, s in self.sessions.items()} if max_bytes > 0 else {}
+        count = len(self.sessions)
+        total = sum(sizes.values())
+        victims: List[str] = []
+        for sid in order:  # least recently used first
+            over_count = max_sessions > 0 and count > max_sessions
+            over_memory = max_bytes > 0 and total > max_bytes
+            if not (over_count or over_memory):
+                break
+            victims.append(sid)
+            count -= 1
+            total -= sizes.get(sid, 0)
+        for sid in victims:
+            self._unload(sid, forget=False)
+            self.evictions += 1
+
+    def evict_idle(self, max_idle_seconds: Optional[float] = None) -> List[str]:
+        if max_idle_seconds is None:
+            max_idle_seconds = self.settings["idle_ttl_seconds"]
+        cutoff = time.time() - max_idle_seconds
+        busy = self._busy()
+        with self._lock:
+            idle = [sid for sid, s in self.sessions.items() if s.last_used < cutoff and sid not in busy]
+        for sid in idle:
+            # Another replica may have used it since: then only unload here.
+            info = self.store.load(sid)
+            shared_recently = info is not None and info.get("last_used", 0.0) >= cutoff
+            self._unload(sid, forget=not shared_recently)
+            if shared_recently:
+                self.evictions += 1
+            else:
+                self.expirations += 1
+        # Rows of sessions no replica holds any more. Each replica writes
+        # `last_used` at most every _TOUCH_INTERVAL_SECONDS, so allow that
+        # much lag before treating another replica's session as idle, and
+        # never delete the sessions this process still holds.
+        with self._lock:
+            held = list(self.sessions)
+        self.store.delete_idle(cutoff - self._TOUCH_INTERVAL_SECONDS, keep=held)
+        return idle
+
+    def maybe_sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < self._SWEEP_INTERVAL_SECONDS or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            self.evict_idle()
+            self._enforce_caps()
+        finally:
+            self._sweep_lock.release()
+
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self.sessions.items())
+        now = time.time()
+        sessions = [
+            {
+                "session_id": sid,
+                "database": s.database,
+                "tables": len(s.schema),
+                "idle_seconds": round(now - s.last_used, 1),
+                "memory_bytes": s.memory_bytes(),
+            }
+            for sid, s in items
+        ]
+        return {
+            "sessions": len(sessions),
+            "memory_bytes": sum(s["memory_bytes"] for s in sessions),
+            "max_sessions": self.settings["max_sessions"],
+            "max_memory_mb": self.settings["max_memory_mb"],
+            "idle_ttl_seconds": self.settings["idle_ttl_seconds"],
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rehydrations": self.rehydrations,
+            "items": sessions,
+        }
+
+
+def _create_session_manager() -> SessionManager:
+    settings = session_settings()
+    return SessionManager(settings, create_session_store(settings))
+
+
+session_manager = _create_session_manager()
+DATABASE_SESSIONS = session_manager.sessions
+
+
+def add_session(session_id: str, session: DBSession) -> None:
+    session_manager.add(session_id, session)
+
+
+def get_session(session_id: str) -> Optional[DBSession]:
+    return session_manager.get(session_id)
+
 
-DATABASE_SESSIONS: Dict[str, DBSession] = {}
+def drop_session(session_id: str) -> None:
+    session_manager.drop(session_id)
@@ -0,0 +1,115 @@
+# app/session/session_store.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class SessionStore:
+    """
+    Backing store for session metadata (connection parameters and
+    timestamps), so any replica can rehydrate a session it has not seen.
+    The base class stores nothing: sessions then live in one process only.
+    """
+
+    def save(self, session_id: str, info: Dict[str, Any]) -> None:
+        pass
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def touch(self, session_id: str, last_used: float) -> None:
+        pass
+
+    def delete(self, session_id: str) -> None:
+        pass
+
+    def delete_idle(self, cutoff: float, keep: Iterable[str] = ()) -> int:
+        return 0
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    One row per session in a local SQLite file; replicas sharing the file
+    (same node or a shared volume) share sessions.
+
+    The row holds the MySQL credentials needed to reconnect, so the file is
+    created owner-readable only (0600) and must be treated as a secret.
+    `last_used` is wall-clock time so replicas agree on idle expiry.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path):
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, info TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def save(self, session_id: str, info: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, info, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(info), now, now),
+            )
+            self._conn.commit()
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, last_used FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        info = json.loads(row[0])
+        info["last_used"] = row[1]
+        return info
+
+    def touch(self, session_id: str, last_used: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET last_used = MAX(last_used, ?) WHERE session_id = ?",
+                (last_used, session_id),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def delete_idle(self, cutoff: float, keep: Iterable[str] = ()) -> int:
+        """
+        Delete sessions last used before `cutoff` on every replica sharing
+        the file, except the ids in `keep`.
+        """
+        keep = set(keep)
+        with self._lock:
+            before = self._conn.total_changes
+            idle = self._conn.execute("SELECT session_id FROM sessions WHERE last_used < ?", (cutoff,)).fetchall()
+            victims = [(sid, cutoff) for (sid,) in idle if sid not in keep]
+            # Re-check last_used: another replica may touch a row meanwhile.
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ? AND last_used < ?", victims)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+
+def create_session_store(conf: Dict[str, Any]) -> SessionStore:
+    if conf.get("store", "none") == "sqlite":
+        return SqliteSessionStore(conf.get("store_path") or "data/sessions.sqlite")
+    return SessionStore()
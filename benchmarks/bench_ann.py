@@ -0,0 +1,74 @@
+# benchmarks/bench_ann.py
+"""
+Recall@k vs. QPS of the IVF index against exact search.
+
+Vectors are drawn from a Gaussian mixture so they have the cluster
+structure real embeddings have (uniform noise is a worst case for IVF).
+
+Run from the project root:
+    python -m benchmarks.bench_ann --size 200000 --nprobe 1 4 16 64
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.rag.vector_store import InMemoryVectorStore
+
+
+def _clustered(rng: np.random.Generator, n: int, dim: int, clusters: int) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def _ids(results) -> List[int]:
+    return [r["metadata"]["row"] for r in results]
+
+
+def run(size: int, dim: int, queries: int, k: int, nprobes: List[int], nlist: int) -> None:
+    rng = np.random.default_rng(0)
+    data = _clustered(rng, size + queries, dim, clusters=max(16, size // 2000))
+    base, qs = data[:size], data[size:]
+
+    store = InMemoryVectorStore(ann={"enabled": True, "min_vectors": 0, "nlist": nlist})
+    step = 50_000
+    for start in range(0, size, step):
+        block = base[start:start + step]
+        store.add_many(
+            "bench", block,
+            [f"doc {start + i}" for i in range(len(block))],
+            [{"row": start + i} for i in range(len(block))],
+        )
+
+    started = time.perf_counter()
+    ann = store.build_ann("bench")
+    print(f"N={size} dim={dim} nlist={ann.nlist} build={time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    truth = [set(_ids(store.search("bench", q, k, exact=True))) for q in qs]
+    exact_qps = queries / (time.perf_counter() - started)
+    print(f"{'mode':>12} {'recall@' + str(k):>10} {'QPS':>10}")
+    print(f"{'exact':>12} {1.0:10.3f} {exact_qps:10.1f}")
+
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        found = [_ids(store.search("bench", q, k, nprobe=nprobe)) for q in qs]
+        qps = queries / (time.perf_counter() - started)
+        recall = np.mean([len(t.intersection(f)) / k for t, f in zip(truth, found)])
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:10.3f} {qps:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--nlist", type=int, default=0, help="0 = 4 * sqrt(N)")
+    args = parser.parse_args()
+    run(args.size, args.dim, args.queries, args.k, args.nprobe, args.nlist)
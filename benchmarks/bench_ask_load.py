@@ -0,0 +1,71 @@
+# benchmarks/bench_ask_load.py
+"""
+Load test for /api/ask: throughput and latency percentiles at increasing
+concurrency against a running server.
+
+Connect a session first (POST /api/connect), then run from the project root:
+    python -m benchmarks.bench_ask_load --session-id <id> --concurrency 1 8 32 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+import numpy as np
+
+
+async def _worker(client: httpx.AsyncClient, url: str, payload: dict, todo: List[int],
+                  latencies: List[float], errors: List[int]) -> None:
+    while todo:
+        todo.pop()
+        started = time.perf_counter()
+        try:
+            resp = await client.post(url, json=payload)
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors.append(1)
+
+
+async def run_level(url: str, payload: dict, concurrency: int, requests: int, timeout: float) -> None:
+    todo = list(range(requests))
+    latencies: List[float] = []
+    errors: List[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, url, payload, todo, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    lat = np.asarray(latencies) * 1000
+    print(
+        f"{concurrency:>6} {requests / elapsed:10.2f} "
+        f"{np.percentile(lat, 50):10.1f} {np.percentile(lat, 95):10.1f} {np.percentile(lat, 99):10.1f} "
+        f"{len(errors):>7}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    url = args.url.rstrip("/") + "/api/ask"
+    payload = {"session_id": args.session_id, "question": args.question}
+    print(f"{'conc':>6} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for concurrency in args.concurrency:
+        await run_level(url, payload, concurrency, max(args.requests, concurrency), args.timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--question", default="How many rows are in each table?")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
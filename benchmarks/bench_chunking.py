@@ -0,0 +1,232 @@
+# benchmarks/bench_chunking.py
+"""
+Chunk counts, embedding requests and retrieval quality of the old
+one-chunk-per-row `simple_chunk` against row packing (`RowPacker`) at
+several token budgets, on a synthetic support-ticket table: mostly short
+rows, some long free-text descriptions and a share of duplicate rows.
+
+Embedding requests are counted with the indexer's batching limits
+(`embed_batch_size` / `embed_batch_max_chars`). Retrieval quality is
+recall@k and MRR of the rows behind the top-k chunks for queries built
+from words of a known row (a hit on any row with identical text counts).
+
+`--embeddings hashing` (default) is an offline bag-of-words hashing
+embedder, enough to compare chunking strategies without a model or API
+key; `local` uses the sentence-transformers backend and `app` the
+configured Embedder (remote calls count against the API quota).
+
+Run from the project root:
+    python -m benchmarks.bench_chunking --rows 20000 --max-tokens 64 128 256
+    python -m benchmarks.bench_chunking --rows 2000 --embeddings local
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.rag.chunker import RowPacker, chunk_settings, simple_chunk
+from app.rag.indexer import _row_text
+from app.rag.utils.config_loader import load_config
+from app.rag.vector_store import InMemoryVectorStore
+
+_PRODUCTS = "router modem laptop phone tablet printer monitor headset camera speaker".split()
+_ISSUES = "overheating crash refund delay outage login billing shipping warranty firmware".split()
+_STATUSES = ["open", "closed", "pending", "escalated"]
+_SYLLABLES = "ka lo mi ra tes vin dor sal pe qua zen fi bro nu hal".split()
+_FILLER = (
+    "the customer reported that the device stopped working after the last update "
+    "support asked for logs and a photo of the label while the replacement was prepared "
+    "the issue could not be reproduced in the lab so the ticket stayed open for review"
+).split()
+_TOKEN = re.compile(r"\w+")
+
+Embed = Callable[[List[str]], List[List[float]]]
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(3)).capitalize()
+
+
+def sample_rows(n: int, seed: int, long_share: float, dup_share: float) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    rows: List[Dict[str, Any]] = []
+    for i in range(n):
+        if rows and rng.random() < dup_share:
+            rows.append(dict(rng.choice(rows)))
+            continue
+        row = {
+            "subject": f"{rng.choice(_PRODUCTS)} {rng.choice(_ISSUES)} for {_name(rng)} {_name(rng)} "
+                       f"order {rng.randint(10000, 99999)}",
+            "status": rng.choice(_STATUSES),
+            "description": None,
+        }
+        if rng.random() < long_share:
+            sentences = [
+                " ".join(rng.choice(_FILLER) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                for _ in range(rng.randint(20, 60))
+            ]
+            # One distinctive sentence somewhere in the middle to query for.
+            sentences.insert(len(sentences) // 2, f"Serial {_name(rng)}{rng.randint(100, 999)} was swapped by {_name(rng)}.")
+            row["description"] = " ".join(sentences)
+        rows.append(row)
+    return rows
+
+
+def _queries(bodies: List[str], rows: List[Dict[str, Any]], count: int, seed: int) -> List[Tuple[str, int]]:
+    """
+    (query, row index): the subject's names and order number, or the
+    distinctive sentence of a long description.
+    """
+    rng = random.Random(seed)
+    out = []
+    for i in rng.sample(range(len(rows)), min(count, len(rows))):
+        desc = rows[i]["description"]
+        if desc:
+            query = next(s for s in desc.split(". ") if s.startswith("Serial"))
+        else:
+            words = rows[i]["subject"].split()
+            query = " ".join(words[3:])  # names + "order NNNNN"
+        out.append((query, i))
+    return out
+
+
+def hashing_embeddings(dim: int = 1024) -> Embed:
+    def embed(texts: List[str]) -> List[List[float]]:
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+                out[row, h % dim] += 1.0 if (h >> 63) else -1.0
+        out = np.sign(out) * np.sqrt(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return (out / np.where(norms > 0, norms, 1.0)).tolist()
+    return embed
+
+
+def _embed_requests(texts: Sequence[str], max_items: int, max_chars: int) -> int:
+    """Requests `_EmbeddingBatcher` would make for `texts`."""
+    requests = items = chars = 0
+    for text in texts:
+        if items and (items >= max_items or chars + len(text) > max_chars):
+            requests, items, chars = requests + 1, 0, 0
+        items, chars = items + 1, chars + len(text)
+    return requests + (1 if items else 0)
+
+
+def chunk_baseline(bodies: List[str]) -> Tuple[List[str], List[List[int]]]:
+    texts, rows = [], []
+    for i, body in enumerate(bodies):
+        for chunk in simple_chunk(body):
+            texts.append(chunk)
+            rows.append([i])
+    return texts, rows
+
+
+def chunk_packed(bodies: List[str], settings: Dict[str, Any]) -> Tuple[List[str], List[List[int]], int]:
+    packer = RowPacker(**settings)
+    texts: List[str] = []
+    rows: List[List[int]] = []
+    by_key: Dict[str, int] = {}
+
+    def take(chunks) -> None:
+        for chunk in chunks:
+            by_key[chunk.key] = len(texts)
+            texts.append(chunk.text)
+            rows.append([r["row"] for r in chunk.rows])
+
+    for i, body in enumerate(bodies):
+        take(packer.add({"doc_id": f"t:{i}", "row": i}, body))
+    take(packer.flush())
+    for alias, key in packer.aliases:
+        rows[by_key[key]].append(alias["row"])
+    return texts, rows, packer.deduped
+
+
+def evaluate(
+    name: str,
+    texts: List[str],
+    chunk_rows: List[List[int]],
+    bodies: List[str],
+    queries: List[Tuple[str, int]],
+    embed: Embed,
+    k: int,
+    batching: Tuple[int, int],
+    deduped: int = 0,
+) -> None:
+    started = time.perf_counter()
+    store = InMemoryVectorStore()
+    for i in range(0, len(texts), 256):
+        part = list(range(i, min(i + 256, len(texts))))
+        store.add_many("bench", embed([texts[j] for j in part]), [texts[j] for j in part], [{"chunk": j} for j in part])
+    embed_seconds = time.perf_counter() - started
+
+    same_text: Dict[str, set] = {}
+    for i, body in enumerate(bodies):
+        same_text.setdefault(body, set()).add(i)
+
+    q_vecs = embed([q for q, _ in queries])
+    hits = reciprocal = 0.0
+    for (_, target), q in zip(queries, q_vecs):
+        relevant = same_text[bodies[target]]
+        for rank, hit in enumerate(store.search("bench", q, k, exact=True), start=1):
+            if relevant.intersection(chunk_rows[hit["metadata"]["chunk"]]):
+                hits += 1
+                reciprocal += 1.0 / rank
+                break
+
+    requests = _embed_requests(texts, *batching)
+    chars = sum(len(t) for t in texts)
+    print(f"  {name:<22} {len(texts):>9,} {len(texts) / len(bodies):>9.3f} {requests:>9,} {chars:>13,} "
+          f"{deduped:>7,} {hits / len(queries):>9.3f} {reciprocal / len(queries):>6.3f} {embed_seconds:>8.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--long-share", type=float, default=0.05, help="rows with a long description")
+    parser.add_argument("--dup-share", type=float, default=0.15, help="rows duplicating an earlier row")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embeddings", choices=["hashing", "local", "app"], default="hashing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.embeddings == "local":
+        from app.rag.local_embeddings import LocalEmbeddings
+
+        embed: Embed = LocalEmbeddings().embed_documents
+    elif args.embeddings == "app":
+        from app.rag.embedder import Embedder
+
+        embed = Embedder().embed_documents
+    else:
+        embed = hashing_embeddings()
+
+    rows = sample_rows(args.rows, args.seed, args.long_share, args.dup_share)
+    text_cols = ["subject", "status", "description"]
+    bodies = [_row_text(r, text_cols) for r in rows]
+    queries = _queries(bodies, rows, args.queries, args.seed + 1)
+    conf = load_config().get("indexing", {}) or {}
+    batching = (int(conf.get("embed_batch_size", 64)), int(conf.get("embed_batch_max_chars", 60000)))
+
+    print(f"{len(rows):,} rows ({args.long_share:.0%} long, {args.dup_share:.0%} duplicates), "
+          f"{len(queries)} queries, {args.embeddings} embeddings, recall@{args.k}")
+    print(f"  {'strategy':<22} {'chunks':>9} {'per row':>9} {'requests':>9} {'embedded chars':>13} "
+          f"{'deduped':>7} {'recall':>9} {'MRR':>6} {'embed':>9}")
+    texts, chunk_rows = chunk_baseline(bodies)
+    evaluate("simple_chunk (before)", texts, chunk_rows, bodies, queries, embed, args.k, batching)
+    for max_tokens in args.max_tokens:
+        settings = dict(chunk_settings(conf), max_tokens=max_tokens)
+        texts, chunk_rows, deduped = chunk_packed(bodies, settings)
+        evaluate(f"packed {max_tokens} tokens", texts, chunk_rows, bodies, queries, embed, args.k, batching, deduped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_embeddings.py
+"""
+Embedding throughput of the local CPU backend (sentence-transformers) and
+the remote Google API, bypassing the embedding cache:
+
+- documents: `embed_documents` on --docs texts (the indexing path);
+- queries: --queries single-text `embed_query` calls issued by
+  --concurrency threads, through the dynamic batcher and, for the local
+  backend, once more with batching disabled (max_batch_size=1).
+
+The remote backend runs only with --remote (it needs GOOGLE_API_KEY and
+counts against the API quota; keep --remote-queries small).
+
+Run from the project root:
+    python -m benchmarks.bench_embeddings --concurrency 1 8 32 --threads 4
+    python -m benchmarks.bench_embeddings --remote --remote-queries 20
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from app.rag.local_embeddings import LocalEmbeddings, local_embedding_settings
+
+_WORDS = (
+    "order customer invoice shipped refund product warehouse payment status "
+    "delivery address review rating supplier stock price discount category"
+).split()
+
+
+def _texts(n: int, seed: int, words: int = 24) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(words)) + f" #{i}" for i in range(n)]
+
+
+def _docs_per_second(embed_documents: Callable[[List[str]], list], texts: List[str], batch: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        embed_documents(texts[i:i + batch])
+    return len(texts) / (time.perf_counter() - started)
+
+
+def _queries_per_second(embed_query: Callable[[str], list], texts: List[str], concurrency: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(embed_query, texts))
+    return len(texts) / (time.perf_counter() - started)
+
+
+def bench_local(args) -> None:
+    settings = dict(local_embedding_settings(), threads=args.threads)
+    batched = LocalEmbeddings(settings)
+    unbatched = LocalEmbeddings(dict(settings, max_batch_size=1, max_wait_ms=0))
+    batched.embed_documents(_texts(8, 0))  # load weights / first-pass overhead
+    unbatched.embed_documents(_texts(8, 0))
+
+    print(f"local {settings['model_name']} on {settings['device']}, threads={settings['threads'] or 'default'}")
+    docs = _docs_per_second(batched.embed_documents, _texts(args.docs, 1), settings["batch_size"])
+    print(f"  embed_documents: {docs:,.0f} texts/s")
+    print(f"  {'concurrency':>11} {'batched q/s':>12} {'unbatched q/s':>14} {'avg batch':>10}")
+    for c in args.concurrency:
+        before = batched.batcher.stats()
+        with_batching = _queries_per_second(batched.embed_query, _texts(args.queries, c), c)
+        after = batched.batcher.stats()
+        without = _queries_per_second(unbatched.embed_query, _texts(args.queries, c + 1000), c)
+        batches = after["batches"] - before["batches"]
+        avg = (after["texts"] - before["texts"]) / batches if batches else 0.0
+        print(f"  {c:>11} {with_batching:>12,.1f} {without:>14,.1f} {avg:>10.1f}")
+
+
+def bench_remote(args) -> None:
+    from app.rag.utils.model_loader import ModelLoader
+
+    loader = ModelLoader()
+    loader.config = dict(loader.config, embedding_model=dict(loader.config.get("embedding_model", {}), backend="google"))
+    remote = loader.load_embeddings()
+    model = loader.config["embedding_model"].get("model_name")
+    print(f"remote {model}")
+    docs = _docs_per_second(remote.embed_documents, _texts(args.remote_docs, 2), 64)
+    print(f"  embed_documents: {docs:,.1f} texts/s")
+    for c in args.concurrency:
+        qps = _queries_per_second(remote.embed_query, _texts(args.remote_queries, c + 2000), c)
+        print(f"  concurrency {c:>3}: {qps:,.1f} queries/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    parser.add_argument("--remote", action="store_true", help="also benchmark the Google API backend")
+    parser.add_argument("--remote-docs", type=int, default=128)
+    parser.add_argument("--remote-queries", type=int, default=20)
+    args = parser.parse_args()
+
+    bench_local(args)
+    if args.remote:
+        bench_remote(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_partitions.py
+"""
+Search latency against the number of table partitions scanned: a session
+of --tables tables with --chunks-per-table chunks each, queried with
+`tables=` naming 1, 2, 4, ... of them and with no filter (every table),
+for the in-memory store (exact search) and the mmap store.
+
+The "filtered" column is the recall@k of the scoped search against the
+exact unfiltered top-k restricted to the same tables, i.e. whether the
+filter returns what post-filtering a full search would.
+
+Run from the project root:
+    python -m benchmarks.bench_partitions --tables 16 --chunks-per-table 20000
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+
+from app.rag.mmap_vector_store import MmapVectorStore
+from app.rag.vector_store import InMemoryVectorStore
+
+_BATCH = 10_000
+
+
+def _fill(store: Any, tables: int, per_table: int, dim: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    for t in range(tables):
+        for start in range(0, per_table, _BATCH):
+            n = min(_BATCH, per_table - start)
+            vecs = rng.standard_normal((n, dim), dtype=np.float32)
+            metas = [{"table": f"t{t}", "doc_id": f"t{t}:{start + i}"} for i in range(n)]
+            store.add_many("bench", vecs, [""] * n, metas)
+
+
+def _time(store: Any, qs: np.ndarray, k: int, tables: Optional[List[str]]) -> float:
+    store.search("bench", qs[0], k, tables=tables)  # warm caches / table maps
+    started = time.perf_counter()
+    for q in qs:
+        store.search("bench", q, k, tables=tables)
+    return (time.perf_counter() - started) / len(qs)
+
+
+def _recall(store: Any, qs: np.ndarray, k: int, tables: List[str]) -> float:
+    wanted = set(tables)
+    total = 0.0
+    for q in qs:
+        full = store.search("bench", q, k * len(store.tables("bench")), tables=None)
+        truth = [h["metadata"]["doc_id"] for h in full if h["metadata"]["table"] in wanted][:k]
+        got = {h["metadata"]["doc_id"] for h in store.search("bench", q, k, tables=tables)}
+        total += len(got.intersection(truth)) / max(1, len(truth))
+    return total / len(qs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=16)
+    parser.add_argument("--chunks-per-table", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    qs = np.random.default_rng(args.seed + 1).standard_normal((args.queries, args.dim), dtype=np.float32)
+    scanned = sorted({min(n, args.tables) for n in (1, 2, 4, 8, 16, 32, 64)})
+    root = tempfile.mkdtemp(prefix="bench_partitions_")
+    stores = [
+        ("in-memory", InMemoryVectorStore(ann={"enabled": False}, storage={"quantization": "float32"})),
+        ("mmap", MmapVectorStore(root)),
+    ]
+    try:
+        print(f"{args.tables} tables x {args.chunks_per_table:,} chunks, dim {args.dim}, "
+              f"{args.queries} queries, k={args.k}")
+        for name, store in stores:
+            _fill(store, args.tables, args.chunks_per_table, args.dim, args.seed)
+            everything = _time(store, qs, args.k, None)
+            print(f"\n{name}")
+            print(f"  {'tables':>8} {'chunks':>11} {'ms/query':>9} {'vs all':>8} {'filtered':>9}")
+            for n in scanned:
+                tables = [f"t{t}" for t in range(n)]
+                seconds = _time(store, qs, args.k, tables)
+                recall = _recall(store, qs[:10], args.k, tables)
+                print(f"  {n:>8} {n * args.chunks_per_table:>11,} {seconds * 1e3:>9.2f} "
+                      f"{everything / seconds:>7.1f}x {recall:>9.3f}")
+            print(f"  {'all':>8} {args.tables * args.chunks_per_table:>11,} {everything * 1e3:>9.2f} "
+                  f"{1.0:>7.1f}x {'-':>9}")
+            store.drop_session("bench")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
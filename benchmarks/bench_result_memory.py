@@ -0,0 +1,114 @@
+# benchmarks/bench_result_memory.py
+"""
+Peak Python memory and response size of one SQL result: the previous
+list-of-dicts materialization (`[dict(r._mapping) for r in result]`, whole
+result in one JSON body) against the paged columnar reader (server-side
+cursor, first page within the `result_pages` byte budget).
+
+Runs against a throwaway SQLite table by default; pass --dsn to read a
+MySQL table instead (the query must return at least --rows rows).
+
+Run from the project root:
+    python -m benchmarks.bench_result_memory --rows 10000 100000
+    python -m benchmarks.bench_result_memory --dsn mysql+pymysql://u:p@host/db \
+        --sql "SELECT * FROM orders LIMIT {rows}"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from app.rag.result_pages import ResultCursors
+
+_DEFAULT_SQL = "SELECT id, customer, status, amount, note FROM bench_orders LIMIT {rows}"
+
+
+def _sqlite_engine(rows: int) -> Engine:
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_results_"), "bench.sqlite")
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE bench_orders (id INTEGER PRIMARY KEY, customer TEXT, status TEXT, amount REAL, note TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO bench_orders VALUES (:id, :customer, :status, :amount, :note)"),
+            [
+                {
+                    "id": i,
+                    "customer": f"customer-{i % 997}",
+                    "status": ("paid", "shipped", "refunded")[i % 3],
+                    "amount": i * 1.25,
+                    "note": f"order {i} for customer-{i % 997}, standard shipping",
+                }
+                for i in range(rows)
+            ],
+        )
+    return engine
+
+
+def legacy(engine: Engine, sql: str) -> int:
+    with engine.connect() as conn:
+        rows = [dict(r._mapping) for r in conn.execute(text(sql))]
+    return len(json.dumps({"rows": rows}, default=str))
+
+
+def paged(engine: Engine, sql: str, cursors: ResultCursors) -> int:
+    conn = engine.connect()
+    result = conn.execution_options(stream_results=True).execute(text(sql))
+    page, _ = cursors.first_page("bench", sql, conn, result)
+    return len(json.dumps(page.to_dict(), default=str))
+
+
+def measure(fn: Callable[[], int]) -> Tuple[float, float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    body_bytes = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, elapsed * 1000, body_bytes
+
+
+def run(sizes: List[int], dsn: str, sql: str, max_kb: int) -> None:
+    cursors = ResultCursors({
+        "max_response_kb": max_kb,
+        "max_page_rows": 1_000_000,
+        "fetch_batch_rows": 200,
+        "max_open_cursors": 0,  # don't hold connections between runs
+        "cursor_idle_seconds": 0,
+        "token_ttl_seconds": 0,
+        "max_tokens": 0,
+    })
+    print(f"{'rows':>9} {'legacy peak MB':>15} {'paged peak MB':>14} "
+          f"{'legacy body KB':>15} {'paged body KB':>14} {'legacy ms':>10} {'paged ms':>9}")
+    for n in sizes:
+        engine = create_engine(dsn) if dsn else _sqlite_engine(n)
+        query = sql.format(rows=n)
+        legacy(engine, query)  # warm up connection / caches
+        l_peak, l_ms, l_body = measure(lambda: legacy(engine, query))
+        p_peak, p_ms, p_body = measure(lambda: paged(engine, query, cursors))
+        print(f"{n:>9} {l_peak:>15.2f} {p_peak:>14.2f} {l_body / 1024:>15.0f} {p_body / 1024:>14.0f} "
+              f"{l_ms:>10.1f} {p_ms:>9.1f}")
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dsn", default="", help="SQLAlchemy URL; default: a temporary SQLite table")
+    parser.add_argument("--sql", default=_DEFAULT_SQL, help="query; {rows} is replaced by the row count")
+    parser.add_argument("--max-kb", type=int, default=1024, help="page byte budget (result_pages.max_response_kb)")
+    args = parser.parse_args()
+    run(args.rows, args.dsn, args.sql, args.max_kb)
+
+
+if __name__ == "__main__":
+    main()
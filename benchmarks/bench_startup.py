@@ -0,0 +1,110 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start time of the API: `python -X importtime -c "import app.main"` in
+fresh interpreters, without any API keys in the environment (importing
+must neither need them nor crash), plus the time until the app answers
+GET /healthz (lifespan with the warm-up in the background).
+
+Exits with status 1 when the median import time is over --budget-ms, so it
+can guard CI against a heavy import creeping back in.
+
+Run from the project root:
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+with TestClient(app.main.app) as client:
+    assert client.get("/healthz").status_code == 200
+print(f"{(time.perf_counter() - started) * 1000:.1f}")
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    env["PYTHONPATH"] = str(PROJECT_ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_profile(cwd: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    (cumulative ms of app.main, [(cumulative ms, module)] of its top-level imports).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=cwd, env=_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import app.main failed:\n{proc.stderr[-2000:]}")
+    total, children = 0.0, []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative_ms, depth, name = int(m.group(2)) / 1000, len(m.group(3)), m.group(4)
+        if name == "app.main":
+            total = cumulative_ms
+        elif depth == 3:  # imported directly by app.main
+            children.append((cumulative_ms, name))
+    return total, sorted(children, reverse=True)
+
+
+def first_request_ms(cwd: str) -> float:
+    proc = subprocess.run(
+        [sys.executable, "-c", _FIRST_REQUEST], cwd=cwd, env=_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"first request failed:\n{proc.stderr[-2000:]}")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="median `import app.main` budget")
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports to list")
+    args = parser.parse_args()
+
+    # Importing creates logs/ and the session store relative to the cwd.
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as cwd:
+        profiles = [import_profile(cwd) for _ in range(args.runs)]
+        started = time.perf_counter()
+        ready = [first_request_ms(cwd) for _ in range(max(1, args.runs // 2))]
+        elapsed = time.perf_counter() - started
+
+    totals = [t for t, _ in profiles]
+    median = statistics.median(totals)
+    print(f"import app.main: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms "
+          f"({args.runs} runs, no API keys set)")
+    print(f"import + lifespan + GET /healthz: median {statistics.median(ready):.0f} ms "
+          f"({len(ready)} runs, {elapsed:.1f}s)")
+    print("\nslowest direct imports of app.main (last run):")
+    for ms, name in profiles[-1][1][: args.top]:
+        print(f"  {ms:>8.1f} ms  {name}")
+
+    verdict = "OK" if median <= args.budget_ms else "OVER BUDGET"
+    print(f"\nbudget {args.budget_ms:.0f} ms: {verdict}")
+    if median > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_vector_memory.py
+"""
+Heap bytes per indexed chunk of the in-memory vector store, measured with
+tracemalloc, for the original list-of-dicts layout (embedding as a list of
+floats, metadata dict per chunk) and the columnar store at float32,
+float16 and int8, plus recall@k against exact float32 search and query
+latency, with and without rescoring.
+
+Chunks look like the indexer's: ~1000 characters of text and metadata
+with table, columns, doc_id and per-row provenance for a packed chunk.
+The size of one search response (k hits as JSON) is reported too.
+
+Run from the project root:
+    python -m benchmarks.bench_vector_memory --chunks 5000 --dim 768
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.rag.vector_store import InMemoryVectorStore
+
+_BATCH = 1000
+
+
+class LegacyRecords:
+    """The original layout: one dict per chunk with the embedding as a list."""
+
+    def __init__(self):
+        self._store: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add_many(self, session_id: str, embeddings, texts, metadatas) -> None:
+        self._store.setdefault(session_id, []).extend(
+            {"embedding": list(map(float, e)), "text": t, "metadata": m}
+            for e, t, m in zip(embeddings, texts, metadatas)
+        )
+
+
+def _vectors(rng: np.random.Generator, n: int, dim: int, centers: np.ndarray) -> np.ndarray:
+    labels = rng.integers(0, len(centers), n)
+    return (centers[labels] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)).astype(np.float32)
+
+
+def _batch(rng: np.random.Generator, start: int, n: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+    columns = ["subject", "status", "description"]
+    texts, metas = [], []
+    for i in range(start, start + n):
+        text = f"subject: ticket {i} " + " ".join(f"w{w}" for w in rng.integers(0, 5000, 160))
+        rows = [
+            {"doc_id": f"tickets:[{i * 4 + r}]", "pk": {"id": i * 4 + r}, "content_hash": f"{i * 4 + r:032x}",
+             "start": r * 250, "end": r * 250 + 240}
+            for r in range(4)
+        ]
+        texts.append(text[:1000])
+        metas.append({"table": "tickets", "columns": columns, "rows": rows, "doc_id": f"tickets:[{i * 4}]+3"})
+    return texts, metas
+
+
+def bytes_per_chunk(make: Callable[[], Any], chunks: int, dim: int, seed: int) -> Tuple[float, Any]:
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(seed + 1).standard_normal((64, dim), dtype=np.float32)
+    gc.collect()
+    tracemalloc.start()
+    store = make()
+    base = tracemalloc.get_traced_memory()[0]
+    for start in range(0, chunks, _BATCH):
+        n = min(_BATCH, chunks - start)
+        texts, metas = _batch(rng, start, n)
+        store.add_many("bench", _vectors(rng, n, dim, centers), texts, metas)
+        del texts, metas
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used / chunks, store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000, help="tracemalloc makes large runs slow")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    exact_conf = {"enabled": False}
+    configs = [
+        ("float32", {"quantization": "float32"}),
+        ("float16", {"quantization": "float16", "rescore": False}),
+        ("float16 + rescore", {"quantization": "float16", "rescore": True}),
+        ("int8", {"quantization": "int8", "rescore": False}),
+        ("int8 + rescore", {"quantization": "int8", "rescore": True}),
+    ]
+
+    legacy_bytes, legacy = bytes_per_chunk(LegacyRecords, args.chunks, args.dim, args.seed)
+    del legacy
+    gc.collect()
+    print(f"{args.chunks:,} chunks, dim {args.dim}, recall@{args.k} vs exact float32 over {args.queries} queries")
+    print(f"  {'layout':<20} {'bytes/chunk':>12} {'vs legacy':>10} {'recall':>8} {'ms/query':>9}")
+    print(f"  {'legacy dict records':<20} {legacy_bytes:>12,.0f} {1.0:>9.1f}x {'-':>8} {'-':>9}")
+
+    centers = np.random.default_rng(args.seed + 1).standard_normal((64, args.dim), dtype=np.float32)
+    queries = _vectors(np.random.default_rng(args.seed + 2), args.queries, args.dim, centers)
+    reference: List[set] = []
+    response_bytes = 0
+    for name, storage in configs:
+        per_chunk, store = bytes_per_chunk(
+            lambda: InMemoryVectorStore(ann=exact_conf, storage=storage), args.chunks, args.dim, args.seed,
+        )
+        started = time.perf_counter()
+        results = [store.search("bench", q, args.k) for q in queries]
+        ms = (time.perf_counter() - started) * 1000 / len(queries)
+        ids = [{r["metadata"]["doc_id"] for r in res} for res in results]
+        if not reference:
+            reference = ids
+            response_bytes = len(json.dumps(results[0]))
+        recall = float(np.mean([len(a & b) / max(1, len(b)) for a, b in zip(ids, reference)]))
+        print(f"  {name:<20} {per_chunk:>12,.0f} {legacy_bytes / per_chunk:>9.1f}x {recall:>8.3f} {ms:>9.2f}")
+        store.drop_session("bench")
+
+    embedding_json = len(json.dumps([0.123456789] * args.dim))
+    print(f"\nsearch response, {args.k} hits: {response_bytes:,} bytes "
+          f"(an embedding would add ~{embedding_json:,} bytes per hit)")
+
+
+if __name__ == "__main__":
+    main()
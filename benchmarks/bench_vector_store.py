@@ -0,0 +1,93 @@
+# benchmarks/bench_vector_store.py
+"""
+Compare the NumPy-backed InMemoryVectorStore.search with the previous
+pure-Python cosine loop.
+
+Run from the project root:
+    python -m benchmarks.bench_vector_store --sizes 10000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.rag.vector_store import InMemoryVectorStore
+
+
+class LegacyVectorStore:
+    """The original list-of-dicts store, kept here as the baseline."""
+
+    def __init__(self):
+        self._store: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, session_id: str, embedding: List[float], text: str, metadata: Dict[str, Any]):
+        self._store.setdefault(session_id, []).append(
+            {"embedding": embedding, "text": text, "metadata": metadata}
+        )
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        na = math.sqrt(sum(x * x for x in a))
+        nb = math.sqrt(sum(y * y for y in b))
+        return dot / (na * nb) if na and nb else 0.0
+
+    def search(self, session_id: str, query_emb: List[float], k: int = 5):
+        docs = self._store.get(session_id, [])
+        scored = [{**d, "score": self._cosine(query_emb, d["embedding"])} for d in docs]
+        scored.sort(key=lambda x: x["score"], reverse=True)
+        return scored[:k]
+
+
+def _time_queries(store, queries: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        store.search("bench", q.tolist(), k)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def run(sizes: List[int], dim: int, queries: int, k: int, legacy_limit: int) -> None:
+    rng = np.random.default_rng(0)
+    qs = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    print(f"{'N':>10} {'numpy ms/q':>12} {'legacy ms/q':>12} {'speedup':>9}")
+    for n in sizes:
+        store = InMemoryVectorStore()
+        step = 50_000
+        for start in range(0, n, step):
+            block = rng.standard_normal((min(step, n - start), dim), dtype=np.float32)
+            for i, vec in enumerate(block):
+                store.add("bench", vec, f"doc {start + i}", {"row": start + i})
+        fast = _time_queries(store, qs, k)
+
+        legacy_txt, speedup = "skipped", ""
+        if n <= legacy_limit:
+            legacy = LegacyVectorStore()
+            matrix = store._store["bench"][None].matrix[:n]
+            for i in range(n):
+                legacy.add("bench", matrix[i].tolist(), f"doc {i}", {"row": i})
+            slow = _time_queries(legacy, qs[: max(1, queries // 10)], k)
+            legacy_txt = f"{slow * 1e3:12.2f}"
+            speedup = f"{slow / fast:8.1f}x"
+
+        print(f"{n:>10} {fast * 1e3:12.2f} {legacy_txt:>12} {speedup:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=100_000,
+        help="skip the pure-Python baseline above this many vectors (it takes minutes per query)",
+    )
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.queries, args.k, args.legacy_limit)
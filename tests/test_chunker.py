@@ -0,0 +1,65 @@
+# tests/test_chunker.py
+import unittest
+
+from app.rag.chunker import CHARS_PER_TOKEN, RowPacker, hit_rows, rows_from_chunks, split_text
+
+
+def _pack(packer, rows):
+    chunks = []
+    for doc_id, text in rows:
+        chunks += packer.add({"doc_id": doc_id}, text)
+    return chunks + packer.flush()
+
+
+def _records(chunks):
+    return [{"text": c.text, "metadata": {"rows": c.rows}} for c in chunks]
+
+
+class RowPackerTest(unittest.TestCase):
+    def test_short_rows_share_chunks_within_the_budget(self):
+        rows = [(f"t:{i}", f"name: customer {i}") for i in range(40)]
+        chunks = _pack(RowPacker(max_tokens=32), rows)
+        self.assertLess(len(chunks), len(rows))
+        self.assertTrue(all(len(c.text) <= 32 * CHARS_PER_TOKEN for c in chunks))
+        for c in chunks:
+            for row in c.rows:
+                self.assertEqual(c.text[row["start"]:row["end"]], dict(rows)[row["doc_id"]])
+        self.assertEqual(chunks[1].key, f"{chunks[1].rows[0]['doc_id']}+{len(chunks[1].rows) - 1}")
+
+    def test_pack_rows_off_gives_one_chunk_per_row(self):
+        rows = [("t:1", "a"), ("t:2", "b")]
+        chunks = _pack(RowPacker(pack_rows=False), rows)
+        self.assertEqual([c.key for c in chunks], ["t:1", "t:2"])
+
+    def test_long_row_is_split_and_recovered(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(60))
+        chunks = _pack(RowPacker(max_tokens=32, overlap_tokens=4), [("t:1", "short"), ("t:2", text)])
+        pieces = [c for c in chunks if c.key == "t:2"]
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual({r["parts"] for c in pieces for r in c.rows}, {len(pieces)})
+        self.assertEqual(rows_from_chunks(_records(chunks))["t:2"], ({"doc_id": "t:2"}, text))
+
+    def test_duplicate_rows_are_packed_once(self):
+        packer = RowPacker(max_tokens=8)
+        chunks = _pack(packer, [("t:1", "status: shipped"), ("t:2", "status: shipped"), ("t:3", "x" * 30),
+                                ("t:4", "status: shipped")])
+        self.assertEqual(packer.deduped, 2)
+        self.assertEqual(sum(c.text.count("status: shipped") for c in chunks), 1)
+        self.assertEqual(packer.aliases[0][0]["doc_id"], "t:4")
+        recovered = rows_from_chunks(_records(chunks))
+        self.assertEqual(recovered["t:2"][1], "status: shipped")
+
+    def test_hit_rows_slice_the_hit_text(self):
+        chunks = _pack(RowPacker(), [("t:1", "alpha"), ("t:2", "beta")])
+        rows = hit_rows(_records(chunks)[0])
+        self.assertEqual([(r["doc_id"], r["text"]) for r in rows], [("t:1", "alpha"), ("t:2", "beta")])
+
+    def test_split_text_respects_the_limit(self):
+        text = "word " * 100
+        spans = split_text(text, 50)
+        self.assertTrue(all(end - start <= 50 for start, end in spans))
+        self.assertEqual(spans[-1][1], len(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
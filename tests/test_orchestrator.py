@@ -0,0 +1,42 @@
+# tests/test_orchestrator.py
+import asyncio
+import unittest
+
+from app.rag.orchestrator import Orchestrator
+
+
+class _Orchestrator(Orchestrator):
+    """Stub stages: the SQL path fails fast, the semantic path is slow."""
+
+    def __init__(self) -> None:
+        self.sql_timeout = 5.0
+        self.semantic_timeout = 5.0
+        self.scope_to_sql = False
+
+    async def _sql_stages(self, emit, *args):
+        await emit("sql", {"sql": "SELECT 1", "cached": False})
+        raise RuntimeError("no such table")
+
+    async def _semantic_stage(self, emit, *args):
+        await asyncio.sleep(0.2)
+        chunks = [{"text": "hit", "score": 1.0, "metadata": {}}]
+        await emit("semantic", {"chunks": chunks})
+        return chunks
+
+
+class AnswerStreamTest(unittest.TestCase):
+    def stream(self):
+        async def collect():
+            return [event async for event in _Orchestrator().answer_stream("s", "q", None, {})]
+        return asyncio.run(collect())
+
+    def test_error_is_sent_when_its_path_fails(self):
+        events = self.stream()
+        self.assertEqual([name for name, _ in events], ["sql", "error", "semantic", "answer"])
+        self.assertEqual(events[1][1]["stage"], "sql")
+        self.assertIn("no such table", events[1][1]["detail"])
+        self.assertEqual(events[-1][1]["semantic_chunks"][0]["text"], "hit")
+
+
+if __name__ == "__main__":
+    unittest.main()
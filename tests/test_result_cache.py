@@ -0,0 +1,78 @@
+# tests/test_result_cache.py
+import unittest
+from datetime import datetime
+
+from app.rag.result_cache import QueryResultCache, referenced_tables, table_versions
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _Connection:
+    """Answers the UPDATE_TIME probe from `update_times`; records statements."""
+
+    def __init__(self, update_times):
+        self.update_times = update_times
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        if params is None:
+            return _Result([])
+        return _Result([(t, self.update_times.get(t)) for t in params["tables"] if t in self.update_times])
+
+
+class TableVersionsTest(unittest.TestCase):
+    def test_versions_follow_update_time(self):
+        conn = _Connection({"orders": datetime(2024, 1, 1), "users": datetime(2024, 1, 2)})
+        before = table_versions(conn, "db", ["orders", "users"])
+        self.assertIn("information_schema_stats_expiry = 0", conn.statements[0])
+        conn.update_times["orders"] = datetime(2024, 1, 3)
+        self.assertNotEqual(table_versions(conn, "db", ["orders", "users"]), before)
+
+    def test_no_tables_or_no_token_is_uncacheable(self):
+        conn = _Connection({"orders": datetime(2024, 1, 1), "fresh": None})
+        self.assertIsNone(table_versions(conn, "db", []))
+        self.assertIsNone(table_versions(conn, "db", ["orders", "fresh"]))
+        self.assertIsNone(table_versions(conn, "db", ["orders", "a_view"]))
+
+    def test_referenced_tables(self):
+        sql = "SELECT o.id FROM `Orders` o JOIN users u ON u.id = o.user_id WHERE NOW() > 0"
+        self.assertEqual(referenced_tables(sql, ["orders", "users", "items"]), ["orders", "users"])
+
+
+class QueryResultCacheTest(unittest.TestCase):
+    def test_entry_is_invalidated_when_a_version_changes(self):
+        cache = QueryResultCache()
+        v1 = (("orders", "2024-01-01 00:00:00"),)
+        cache.put("s", "SELECT * FROM orders;", v1, ["id"], [(1,)])
+        self.assertEqual(cache.get("s", "  SELECT *\n FROM orders ", v1).rows, [(1,)])
+        self.assertIsNone(cache.get("s", "SELECT * FROM orders", (("orders", "2024-01-02 00:00:00"),)))
+        self.assertEqual(cache.invalidations, 1)
+        self.assertIsNone(cache.get("s", "SELECT * FROM orders", v1))
+
+    def test_expired_entry_is_dropped(self):
+        cache = QueryResultCache(ttl_seconds=0.0)
+        cache.put("s", "SELECT 1 FROM t", (("t", "1"),), ["x"], [(1,)])
+        self.assertIsNone(cache.get("s", "SELECT 1 FROM t", (("t", "1"),)))
+
+    def test_size_bounds(self):
+        cache = QueryResultCache(max_bytes=50, max_entry_bytes=40)
+        versions = (("t", "1"),)
+        cache.put("s", "big", versions, ["x"], [("y" * 50,)])
+        self.assertEqual(cache.stats()["items"], 0)
+        cache.put("s", "a", versions, ["x"], [(1,)] * 3)
+        cache.put("s", "b", versions, ["x"], [(2,)] * 3)
+        cache.put("s", "c", versions, ["x"], [(3,)] * 3)
+        self.assertIsNone(cache.get("s", "a", versions))
+        self.assertIsNotNone(cache.get("s", "c", versions))
+        self.assertLessEqual(cache.stats()["bytes"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
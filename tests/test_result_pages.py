@@ -0,0 +1,117 @@
+# tests/test_result_pages.py
+"""
+Run from the project root:
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from app.rag.result_pages import get_result_cursors, with_max_execution_time
+from app.rag.sql_agent import arun_sql_cached, next_result_page, run_sql_cached
+
+
+class _AsyncResult:
+    def __init__(self, result):
+        self._result = result
+
+    def keys(self):
+        return self._result.keys()
+
+    async def fetchmany(self, n):
+        return self._result.fetchmany(n)
+
+
+class _AsyncConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execution_options(self, **options):
+        return self
+
+    async def stream(self, statement):
+        return _AsyncResult(self._conn.execute(statement))
+
+    async def invalidate(self):
+        self._conn.invalidate()
+
+
+class _AsyncConnect:
+    def __init__(self, engine):
+        self._engine = engine
+
+    async def __aenter__(self):
+        self._conn = self._engine.connect()
+        return _AsyncConnection(self._conn)
+
+    async def __aexit__(self, *exc):
+        self._conn.close()
+
+
+class _AsyncEngine:
+    """
+    The slice of `AsyncEngine` that `arun_sql_cached` uses, over a sync
+    engine, with an async driver name in its URL (aiomysql is not needed).
+    """
+
+    def __init__(self, engine, drivername):
+        self._engine = engine
+        self.url = engine.url.set(drivername=drivername)
+
+    def connect(self):
+        return _AsyncConnect(self._engine)
+
+
+class AsyncPageTokenTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+            conn.execute(text("INSERT INTO t (id) VALUES " + ", ".join(f"({i})" for i in range(30))))
+        self.cursors = get_result_cursors()
+        self.saved = dict(self.cursors.settings)
+        self.cursors.settings["max_page_rows"] = 10
+
+    def tearDown(self):
+        self.cursors.settings.clear()
+        self.cursors.settings.update(self.saved)
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_page_two_of_an_async_result(self):
+        async_engine = _AsyncEngine(self.engine, "sqlite+aiosqlite")
+        sql = "SELECT id FROM t ORDER BY id LIMIT 30"
+        first = asyncio.run(arun_sql_cached(async_engine, sql, {}, use_cache=False))
+        self.assertEqual([r[0] for r in first.rows], list(range(10)))
+        self.assertIsNotNone(first.next_token)
+
+        # /api/ask/rows reads the next page on the session's sync engine.
+        second = next_result_page(self.engine, first.next_token)
+        self.assertIsNotNone(second)
+        self.assertEqual([r[0] for r in second.rows], list(range(10, 20)))
+
+    def test_open_cursor_past_its_execution_time_is_rerun(self):
+        sql = "SELECT id FROM t ORDER BY id LIMIT 30"
+        first = run_sql_cached(self.engine, sql, {}, timeout=0.05, use_cache=False)
+        reopened = self.cursors.reopened
+        time.sleep(0.1)
+        second = next_result_page(self.engine, first.next_token)
+        self.assertEqual([r[0] for r in second.rows], list(range(10, 20)))
+        self.assertEqual(self.cursors.reopened, reopened + 1)
+
+    def test_execution_time_hint(self):
+        self.assertEqual(
+            with_max_execution_time("select 1", 2.5),
+            "SELECT /*+ MAX_EXECUTION_TIME(2500) */ 1",
+        )
+        self.assertEqual(with_max_execution_time("SELECT 1", None), "SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
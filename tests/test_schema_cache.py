@@ -0,0 +1,71 @@
+# tests/test_schema_cache.py
+import shutil
+import tempfile
+import time
+import unittest
+
+import app.schema.schema_cache as schema_cache
+from app.schema.schema_cache import SchemaCache, SchemaSnapshot
+
+
+class SchemaCacheRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.status = {
+            "a": {"create_time": "2024-01-01 00:00:00", "update_time": None, "rows": 1},
+            "b": {"create_time": "2024-01-01 00:00:00", "update_time": None, "rows": 1},
+        }
+        self.introspected = []
+
+        def introspect(engine, database, tables):
+            names = sorted(self.status) if tables is None else tables
+            self.introspected.append(names)
+            return SchemaSnapshot(
+                schema={t: [{"name": "id", "type": "int", "key": "PRI"}] for t in names},
+                foreign_keys={}, indexes={}, tables={},
+            )
+
+        self.saved = schema_cache.load_table_status, SchemaCache._introspect
+        schema_cache.load_table_status = lambda engine, database: {t: dict(s) for t, s in self.status.items()}
+        SchemaCache._introspect = staticmethod(introspect)
+        self.cache = SchemaCache(self.path, max_age_seconds=3600)
+
+    def tearDown(self):
+        schema_cache.load_table_status, SchemaCache._introspect = self.saved
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def load(self):
+        return self.cache.load(None, "h", 3306, "u", "db")
+
+    def test_unchanged_tables_are_a_hit(self):
+        self.assertEqual(self.load().refresh["mode"], "full")
+        snap = self.load()
+        self.assertEqual(snap.refresh["mode"], "hit")
+        self.assertEqual(self.introspected, [["a", "b"]])
+
+    def test_changed_create_time_refreshes_only_that_table(self):
+        first = self.load()
+        self.status["b"]["create_time"] = "2024-06-01 00:00:00"
+        self.status["c"] = {"create_time": "2024-06-01 00:00:00", "update_time": None, "rows": 0}
+        del self.status["a"]
+        snap = self.load()
+        self.assertEqual(snap.refresh["mode"], "partial")
+        self.assertEqual(self.introspected[-1], ["b", "c"])
+        self.assertEqual(sorted(snap.schema), ["b", "c"])
+        self.assertGreaterEqual(snap.refreshed_at, first.refreshed_at)
+        self.assertEqual(snap.full_refresh_at, first.full_refresh_at)
+
+    def test_full_refresh_after_max_age(self):
+        self.load()
+        snap = self.cache._memory[next(iter(self.cache._memory))]
+        snap.full_refresh_at = time.time() - 7200
+        self.assertEqual(self.load().refresh["mode"], "full")
+
+    def test_snapshot_survives_a_restart(self):
+        self.load()
+        self.cache = SchemaCache(self.path, max_age_seconds=3600)
+        self.assertEqual(self.load().refresh["mode"], "hit")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# tests/test_session_store.py
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from app.session.session_store import SqliteSessionStore
+
+
+class SqliteSessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = SqliteSessionStore(os.path.join(self.dir, "sessions.sqlite"))
+
+    def tearDown(self):
+        self.store._conn.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_delete_idle_spares_held_and_recent_sessions(self):
+        for sid in ("held", "idle", "recent"):
+            self.store.save(sid, {"database": sid})
+        old = time.time() - 7200
+        self.store._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id != 'recent'", (old,))
+        self.store._conn.commit()
+
+        deleted = self.store.delete_idle(time.time() - 3600, keep=["held"])
+        self.assertEqual(deleted, 1)
+        self.assertIsNone(self.store.load("idle"))
+        self.assertIsNotNone(self.store.load("held"))
+        self.assertIsNotNone(self.store.load("recent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
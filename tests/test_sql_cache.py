@@ -0,0 +1,41 @@
+# tests/test_sql_cache.py
+import unittest
+
+from app.rag.sql_cache import SemanticSQLCache, question_literals
+
+VEC = [1.0, 0.0, 0.0]
+NEAR = [0.99, 0.1, 0.0]
+
+
+class SemanticSQLCacheTest(unittest.TestCase):
+    def test_exact_tier_normalizes_the_question(self):
+        cache = SemanticSQLCache()
+        cache.put("s", "How many orders?", "SELECT COUNT(*) FROM orders", VEC)
+        self.assertEqual(cache.get_exact("s", "  how many   ORDERS "), "SELECT COUNT(*) FROM orders")
+        self.assertIsNone(cache.get_exact("other", "how many orders"))
+
+    def test_semantic_tier_is_off_by_default(self):
+        cache = SemanticSQLCache()
+        cache.put("s", "how many orders", "SELECT 1", VEC)
+        self.assertIsNone(cache.get_similar("s", "count the orders", NEAR))
+
+    def test_semantic_tier_reuses_near_questions(self):
+        cache = SemanticSQLCache(semantic=True)
+        cache.put("s", "how many orders", "SELECT 1", VEC)
+        sql, score = cache.get_similar("s", "count the orders", NEAR)
+        self.assertEqual(sql, "SELECT 1")
+        self.assertGreaterEqual(score, cache.similarity_threshold)
+        self.assertIsNone(cache.get_similar("s", "count the orders", [0.0, 1.0, 0.0]))
+
+    def test_semantic_tier_requires_the_same_literals(self):
+        cache = SemanticSQLCache(semantic=True)
+        cache.put("s", "top 5 customers by revenue", "SELECT ... LIMIT 5", VEC)
+        self.assertIsNone(cache.get_similar("s", "top 10 customers by revenue", NEAR))
+        self.assertIsNotNone(cache.get_similar("s", "the top 5 customers by revenue", NEAR))
+
+    def test_question_literals(self):
+        self.assertEqual(question_literals("Orders over 99.5 in 'Paris' since 2024?"), ("99.5", "'paris'", "2024"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# tests/test_vector_store.py
+import unittest
+
+import numpy as np
+
+from app.rag.vector_store import InMemoryVectorStore, quantize, storage_settings
+
+
+def _fill(store, vectors):
+    metas = [{"table": "t", "doc_id": f"t:{i}"} for i in range(len(vectors))]
+    store.add_many("s", vectors, [f"row {i}" for i in range(len(vectors))], metas)
+
+
+class QuantizationTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((500, 64), dtype=np.float32)
+        self.queries = rng.standard_normal((20, 64), dtype=np.float32)
+
+    def store(self, quantization, rescore=True):
+        store = InMemoryVectorStore(
+            ann={"enabled": False}, storage={"quantization": quantization, "rescore": rescore},
+        )
+        _fill(store, self.vectors)
+        return store
+
+    def test_int8_is_the_default(self):
+        self.assertEqual(storage_settings(None)["quantization"], "int8")
+
+    def test_int8_scales_each_row_to_full_range(self):
+        q = quantize(self.vectors, "int8")
+        self.assertEqual(q.dtype, np.int8)
+        self.assertTrue((np.abs(q).max(axis=1) == 127).all())
+        self.assertFalse(quantize(np.zeros((1, 4), dtype=np.float32), "int8").any())
+
+    def test_rescore_matches_exact_float32(self):
+        exact = self.store("float32")
+        for quantization in ("int8", "float16"):
+            store = self.store(quantization)
+            for q in self.queries:
+                want = exact.search("s", q, 5)
+                got = store.search("s", q, 5)
+                self.assertEqual([h["metadata"]["doc_id"] for h in got], [h["metadata"]["doc_id"] for h in want])
+                np.testing.assert_allclose([h["score"] for h in got], [h["score"] for h in want], rtol=1e-5)
+
+    def test_int8_without_rescore_is_close(self):
+        exact, store = self.store("float32"), self.store("int8", rescore=False)
+        overlap = 0
+        for q in self.queries:
+            want = {h["metadata"]["doc_id"] for h in exact.search("s", q, 10)}
+            overlap += len(want.intersection(h["metadata"]["doc_id"] for h in store.search("s", q, 10)))
+        self.assertGreaterEqual(overlap / (10 * len(self.queries)), 0.9)
+
+    def test_hits_leave_out_embeddings(self):
+        hit = self.store("int8").search("s", self.queries[0], 1)[0]
+        self.assertEqual(set(hit), {"text", "score", "metadata"})
+
+
+if __name__ == "__main__":
+    unittest.main()